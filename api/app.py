@@ -1,76 +1,177 @@
+import os
+
+import pandas as pd
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 st.set_page_config(page_title="Prédiction de Scoring Crédit", initial_sidebar_state="collapsed")
 
-# Titre
-st.title('Prédiction de Scoring Crédit')
+# URL de l'API (API_BASE_URL=http://localhost:8000 pour une API locale)
+API_BASE_URL = os.environ.get("API_BASE_URL", "https://credit-scoring-api-8lkh.onrender.com").rstrip("/")
 
-# Message de bienvenue
-st.header('Bonjour, veuillez entrer l\'ID du client recherché')
+# Délais (secondes) d'établissement de la connexion et de lecture de la réponse
+API_TIMEOUT = (3.05, float(os.environ.get("API_TIMEOUT_S", 10)))
+
+# Durée de conservation des prédictions en cache (même client, même version du modèle)
+CACHE_TTL_S = int(os.environ.get("CACHE_TTL_S", 600))
+
+# Durée pendant laquelle la version active du modèle est considérée inchangée
+MODEL_VERSION_TTL_S = 60
+
+# Nombre maximal d'identifiants d'une recherche par liste (MAX_BATCH_SIZE de l'API)
+MAX_BATCH_SIZE = 10000
+
+
+class ApiError(Exception):
+    """Réponse de l'API avec un code d'erreur"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"Code {status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+# Session HTTP partagée par toutes les sessions du tableau de bord: connexions keep-alive réutilisées
+# et nouvelle tentative en cas d'échec de connexion (l'instance Render peut être en veille)
+@st.cache_resource
+def get_session():
+    session = requests.Session()
+    retries = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.5, allowed_methods=None)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({'Content-Type': 'application/json'})
+    return session
+
+
+# Version active du modèle, pour ne pas réutiliser les prédictions d'une version précédente
+@st.cache_data(ttl=MODEL_VERSION_TTL_S, show_spinner=False)
+def get_model_version():
+    try:
+        response = get_session().get(f"{API_BASE_URL}/models", timeout=API_TIMEOUT)
+        if response.status_code == 200:
+            return response.json().get("active")
+    except (requests.exceptions.RequestException, ValueError):
+        pass
+    return None
+
+
+# Prédiction d'un client, en cache par identifiant et version du modèle (les erreurs ne sont pas mises en cache)
+@st.cache_data(ttl=CACHE_TTL_S, max_entries=10000, show_spinner=False)
+def fetch_prediction(sk_id_curr, model_version):
+    response = get_session().post(f"{API_BASE_URL}/predict", json={'SK_ID_CURR': sk_id_curr}, timeout=API_TIMEOUT)
+    if response.status_code != 200:
+        raise ApiError(response.status_code, response.text)
+    prediction = response.json()
+    if 'resultat' not in prediction or 'prediction' not in prediction:
+        raise ValueError("réponse mal formée")
+    return prediction
+
+
+# Prédictions d'une liste de clients en un seul appel à /predict/batch, en cache par liste et version du modèle
+@st.cache_data(ttl=CACHE_TTL_S, max_entries=100, show_spinner=False)
+def fetch_batch(sk_ids, model_version):
+    response = get_session().post(
+        f"{API_BASE_URL}/predict/batch", json={'SK_ID_CURR': list(sk_ids)}, timeout=API_TIMEOUT
+    )
+    if response.status_code != 200:
+        raise ApiError(response.status_code, response.text)
+    return response.json()
 
-# Input ID du client
-sk_id_curr = st.text_input('ID du client', '')
 
 # Fonction pour faire la requête API
 def get_prediction(sk_id_curr):
     if not sk_id_curr:
         return "Erreur : L'ID du client ne peut pas être vide."
-    
+
     try:
         sk_id_curr = int(sk_id_curr)  # Convertir l'entrée en entier
     except ValueError:
         return "Erreur : L'ID du client doit être un entier valide."
-    
-    # URL de l'API (ne changez pas cette URL - elle fonctionne déjà)
-    url = 'https://credit-scoring-api-8lkh.onrender.com/predict'
-    
-    headers = {
-        'Content-Type': 'application/json'
-    }
-    
-    payload = {'SK_ID_CURR': sk_id_curr}
-    
+
     try:
-        # Afficher les détails de la requête pour débogage
-        with st.expander("Détails de la requête"):
-            st.write(f"URL: {url}")
-            st.write(f"Payload: {payload}")
-        
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
-        
-        with st.expander("Détails de la réponse"):
-            st.write(f"Code de statut: {response.status_code}")
-            st.write(f"Réponse brute: {response.text}")
-        
-        if response.status_code != 200:
-            return f"Erreur dans la prédiction : Code {response.status_code} - {response.text}"
-        
-        prediction = response.json()
-        
-        if 'resultat' not in prediction or 'prediction' not in prediction:
-            return "Erreur : La réponse de l'API est mal formée."
-        
-        return prediction
+        return fetch_prediction(sk_id_curr, get_model_version())
+    except ApiError as e:
+        return f"Erreur dans la prédiction : Code {e.status_code} - {e.text}"
+    except ValueError:
+        return "Erreur : La réponse de l'API est mal formée."
     except requests.exceptions.RequestException as e:
         return f"Erreur de connexion à l'API : {str(e)}"
     except Exception as e:
         return f"Erreur inconnue : {str(e)}"
 
+
+# Identifiants d'une saisie libre (séparés par des virgules, des espaces ou des retours à la ligne)
+def parse_ids(text):
+    tokens = text.replace(",", " ").replace(";", " ").split()
+    if not tokens:
+        raise ValueError("Erreur : La liste des ID ne peut pas être vide.")
+    try:
+        sk_ids = [int(token) for token in tokens]
+    except ValueError:
+        raise ValueError("Erreur : Chaque ID client doit être un entier valide.")
+    if len(sk_ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"Erreur : {MAX_BATCH_SIZE} ID au maximum.")
+    # Doublons retirés, ordre de saisie conservé
+    return tuple(dict.fromkeys(sk_ids))
+
+
+# Prédictions d'une liste de clients (un seul appel à l'API)
+def get_predictions(ids_text):
+    try:
+        sk_ids = parse_ids(ids_text)
+    except ValueError as e:
+        return str(e)
+
+    try:
+        return fetch_batch(sk_ids, get_model_version())
+    except ApiError as e:
+        return f"Erreur dans la prédiction : Code {e.status_code} - {e.text}"
+    except requests.exceptions.RequestException as e:
+        return f"Erreur de connexion à l'API : {str(e)}"
+    except Exception as e:
+        return f"Erreur inconnue : {str(e)}"
+
+
+# Titre
+st.title('Prédiction de Scoring Crédit')
+
+# Message de bienvenue
+st.header('Bonjour, veuillez entrer l\'ID du client recherché')
+
+# Input ID du client
+sk_id_curr = st.text_input('ID du client', '')
+
 # Ajout bouton
 if st.button('Obtenir la prédiction'):
     with st.spinner('Récupération de la prédiction...'):
         result = get_prediction(sk_id_curr)
-    
+
     if isinstance(result, dict):
         st.success("Prédiction récupérée avec succès !")
         st.write(f"Résultat de la prédiction : {result['resultat']}")
         st.write(f"Prédiction (0 = Crédit accordé, 1 = Crédit refusé) : {result['prediction']}")
+        if 'proba' in result:
+            st.write(f"Probabilité de défaut : {result['proba']:.3f}")
+        if 'percentile' in result:
+            st.write(f"Rang dans le portefeuille : {result['percentile']:.0f}e centile")
+        if 'model_version' in result:
+            st.caption(f"Version du modèle : {result['model_version']}")
     else:
         st.error(result)
 
+# Recherche de plusieurs clients en un seul appel
+with st.expander("Plusieurs clients"):
+    ids_text = st.text_area('ID des clients (séparés par des virgules ou des retours à la ligne)', '')
+    if st.button('Obtenir les prédictions'):
+        with st.spinner('Récupération des prédictions...'):
+            result = get_predictions(ids_text)
 
-
-
-
-
+        if isinstance(result, dict):
+            results = pd.DataFrame(result['results'])
+            st.success(f"{result['n_found']} clients trouvés, {result['n_not_found']} introuvables")
+            st.dataframe(results, hide_index=True)
+        else:
+            st.error(result)
@@ -45,4 +45,49 @@ def api_response_failure():
     return {
         'prediction': 1,
         'resultat': 'Crédit refusé'
-    }
\ No newline at end of file
+    }
+
+
+@pytest.fixture(scope="session")
+def synthetic_df():
+    """Fixture fournissant un jeu de clients synthétique avec des valeurs manquantes et nulles"""
+    rng = np.random.default_rng(0)
+    n_rows = 400
+    df = pd.DataFrame({
+        'SK_ID_CURR': np.arange(200000, 200000 + n_rows),
+        'EXT_SOURCE_1': rng.uniform(0, 1, n_rows),
+        'EXT_SOURCE_2': rng.uniform(0, 1, n_rows),
+        'AMT_CREDIT': rng.normal(500000, 150000, n_rows),
+        'DAYS_BIRTH': rng.integers(-25000, -7000, n_rows).astype(float),
+        'FLAG_OWN_CAR': rng.integers(0, 2, n_rows).astype(float),
+        'CONSTANT': np.zeros(n_rows),
+    })
+    df.loc[::7, 'EXT_SOURCE_1'] = np.nan
+    df.loc[::11, 'AMT_CREDIT'] = 0.0
+    return df
+
+@pytest.fixture(scope="session")
+def lgbm_model(synthetic_df):
+    """Fixture fournissant un vrai modèle LightGBM entraîné sur le jeu synthétique"""
+    from lightgbm import LGBMClassifier
+    features = synthetic_df.drop('SK_ID_CURR', axis=1)
+    target = ((features['EXT_SOURCE_2'] + features['EXT_SOURCE_1'].fillna(0.5)) < 0.9).astype(int)
+    model = LGBMClassifier(n_estimators=20, num_leaves=8, min_child_samples=5, verbose=-1, random_state=0)
+    model.fit(features.to_numpy(), target)
+    return model
+
+@pytest.fixture
+def registry(synthetic_df, lgbm_model, tmp_path):
+    """Registre local avec deux versions du modèle"""
+    import os
+    import joblib
+    from lightgbm import LGBMClassifier
+    from model_registry import ModelRegistry
+    features = synthetic_df.drop('SK_ID_CURR', axis=1).to_numpy()
+    other = LGBMClassifier(n_estimators=5, num_leaves=4, verbose=-1, random_state=1)
+    other.fit(features, (features[:, 1] > 0.5).astype(int))
+    for version, model, mtime in (("v1", other, 1000), ("v2", lgbm_model, 2000)):
+        os.makedirs(tmp_path / version)
+        joblib.dump(model, tmp_path / version / "model.pkl")
+        os.utime(tmp_path / version / "model.pkl", (mtime, mtime))
+    return ModelRegistry(str(tmp_path))
@@ -0,0 +1,134 @@
+"""
+Politique de décision: seuils de refus versionnés avec le modèle.
+Le fichier JSON (par défaut LGBM_TTS.policy.json, à côté du modèle) définit un seuil par défaut et,
+optionnellement, un seuil par segment de clients selon la valeur d'une feature (ex: NAME_CONTRACT_TYPE):
+
+    {
+        "version": "2024-06-01",
+        "default_threshold": 0.5,
+        "segment_feature": "NAME_CONTRACT_TYPE",
+        "segments": {"0": 0.5, "1": 0.45}
+    }
+
+Au chargement, la politique est compilée en un seuil par ligne du magasin de features: la décision
+d'un client est alors une simple comparaison `proba > seuils[ligne]`, vectorisée pour les lots.
+Le crédit est refusé lorsque la probabilité de défaut dépasse le seuil.
+"""
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.5
+
+
+def _check_threshold(value, name):
+    value = float(value)
+    if not 0.0 <= value <= 1.0:
+        raise ValueError(f"Seuil {name} hors de [0, 1]: {value}")
+    return value
+
+
+@dataclass(frozen=True)
+class DecisionPolicy:
+    """Seuil par défaut et seuils par valeur de la feature de segmentation"""
+
+    default_threshold: float = DEFAULT_THRESHOLD
+    segment_feature: str = None
+    segments: tuple = ()
+    version: str = "default"
+    fingerprint: str = "default"
+
+    @classmethod
+    def from_dict(cls, data):
+        segments = data.get("segments") or {}
+        segment_feature = data.get("segment_feature")
+        if segments and not segment_feature:
+            raise ValueError("`segments` nécessite `segment_feature`.")
+        try:
+            parsed = tuple(sorted(
+                (float(code), _check_threshold(threshold, f"du segment {code}")) for code, threshold in segments.items()
+            ))
+        except ValueError as e:
+            raise ValueError(f"Segments invalides: {e}") from e
+
+        canonical = json.dumps(data, sort_keys=True, separators=(",", ":"))
+        return cls(
+            default_threshold=_check_threshold(data.get("default_threshold", DEFAULT_THRESHOLD), "par défaut"),
+            segment_feature=segment_feature,
+            segments=parsed,
+            version=str(data.get("version", "unversioned")),
+            fingerprint=hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16],
+        )
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def thresholds_for(self, segment_values):
+        """Seuils (vectorisés) pour des valeurs de la feature de segmentation; seuil par défaut hors segments"""
+        values = np.asarray(segment_values, dtype=np.float64)
+        thresholds = np.full(values.shape, self.default_threshold)
+        if self.segments:
+            codes = np.array([code for code, _ in self.segments])
+            code_thresholds = np.array([threshold for _, threshold in self.segments])
+            positions = np.minimum(np.searchsorted(codes, values), len(codes) - 1)
+            matched = codes[positions] == values
+            thresholds[matched] = code_thresholds[positions[matched]]
+        return thresholds
+
+    def thresholds_for_features(self, features, feature_names):
+        """Seuils des lignes d'une matrice de features (colonnes `feature_names`)"""
+        if self.segments and self.segment_feature in feature_names:
+            return self.thresholds_for(features[:, list(feature_names).index(self.segment_feature)])
+        return np.full(features.shape[0], self.default_threshold)
+
+    def compile(self, store):
+        """Politique compilée pour les lignes du magasin de features"""
+        if not self.segments:
+            return CompiledPolicy(self, None)
+        column = store.column_index.get(self.segment_feature)
+        if column is None:
+            logger.warning(
+                "Feature de segmentation %s absente des données: seuil par défaut %.3f pour tous les clients",
+                self.segment_feature, self.default_threshold,
+            )
+            return CompiledPolicy(self, None)
+        return CompiledPolicy(self, self.thresholds_for(store.matrix[:, column]))
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "fingerprint": self.fingerprint,
+            "default_threshold": self.default_threshold,
+            "segment_feature": self.segment_feature,
+            "segments": {format(code, "g"): threshold for code, threshold in self.segments},
+        }
+
+
+@dataclass(frozen=True)
+class CompiledPolicy:
+    """Seuil de chaque ligne du magasin (None: seuil par défaut pour toutes les lignes)"""
+
+    policy: DecisionPolicy
+    row_thresholds: np.ndarray = None
+
+    def threshold_of_row(self, row):
+        if self.row_thresholds is None:
+            return self.policy.default_threshold
+        return float(self.row_thresholds[row])
+
+    def thresholds_of_rows(self, rows):
+        if self.row_thresholds is None:
+            return np.full(len(rows), self.policy.default_threshold)
+        return self.row_thresholds[rows]
+
+    def decide(self, probas, rows):
+        """Décisions (True: crédit refusé) des lignes `rows` ayant les probabilités de défaut `probas`"""
+        return np.asarray(probas) > self.thresholds_of_rows(rows)
@@ -0,0 +1,165 @@
+"""
+Surveillance de la dérive des données sur les clients scorés par /predict.
+La distribution de référence de chaque feature est résumée au chargement des artefacts par des bornes
+de déciles et la proportion de lignes dans chaque intervalle (plus un intervalle pour les valeurs
+manquantes). Chaque requête incrémente ensuite un compteur par feature: mémoire constante
+(features x intervalles), mise à jour en O(features) et aucune ligne conservée.
+
+Deux indicateurs comparent les distributions observées à la référence:
+- PSI (Population Stability Index): < 0.1 stable, 0.1 à 0.25 dérive modérée, > 0.25 dérive importante;
+- KS: écart maximal entre les fonctions de répartition, calculé sur les intervalles.
+"""
+
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+# Au-delà, les bornes de référence sont calculées sur un échantillon régulier de lignes
+QUANTILE_SAMPLE_SIZE = 100000
+
+# Intervalles par feature (hors valeurs manquantes)
+DEFAULT_BINS = 10
+
+# Proportion minimale d'un intervalle dans le calcul du PSI (évite log(0) pour un intervalle vide)
+PSI_EPSILON = 1e-4
+
+# Seuils usuels d'interprétation du PSI
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+# Nombre d'observations en dessous duquel les indicateurs ne sont pas significatifs
+MIN_OBSERVATIONS = 100
+
+
+def sorted_quantiles(ordered, n_valid, levels):
+    """Quantiles (interpolation linéaire, comme np.nanquantile) de chaque ligne de `ordered`, triée avec ses
+    `n_valid` valeurs présentes en tête; NaN pour une ligne sans valeur"""
+    last = np.maximum(n_valid - 1, 0)
+    positions = last[:, np.newaxis] * np.asarray(levels)[np.newaxis, :]
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, last[:, np.newaxis])
+    fraction = positions - lower
+    rows = np.arange(ordered.shape[0])[:, np.newaxis]
+    quantiles = ordered[rows, lower] * (1 - fraction) + ordered[rows, upper] * fraction
+    quantiles[n_valid == 0] = np.nan
+    return quantiles
+
+
+def bin_rows(edges, matrix):
+    """Intervalle de chaque valeur d'une matrice (lignes x features): nombre de bornes inférieures ou égales
+    à la valeur, et n_bins pour une valeur manquante"""
+    bins = np.empty(matrix.shape, dtype=np.int64)
+    for column in range(matrix.shape[1]):
+        bins[:, column] = np.searchsorted(edges[column], matrix[:, column], side='right')
+    bins[np.isnan(matrix)] = edges.shape[1] + 1
+    return bins
+
+
+@dataclass(frozen=True)
+class DriftReference:
+    feature_names: list
+    edges: np.ndarray
+    proportions: np.ndarray
+    n_rows: int
+
+    @property
+    def n_bins(self):
+        return self.edges.shape[1] + 1
+
+    @classmethod
+    def compute(cls, store, n_bins=DEFAULT_BINS):
+        """Bornes (quantiles) et proportions de référence, sur un échantillon régulier des lignes du magasin"""
+        step = max(1, -(-len(store) // QUANTILE_SAMPLE_SIZE))
+        sample = np.asarray(store.matrix[::step], dtype=np.float64)
+        counts = np.zeros((store.n_features, n_bins + 1))
+        if not len(sample):
+            edges = np.full((store.n_features, n_bins - 1), np.inf)
+            return cls(list(store.feature_names), edges, counts, 0)
+
+        # Un seul tri par feature (valeurs manquantes en fin de ligne): bornes et effectifs en découlent
+        ordered = np.sort(sample.T, axis=1)
+        n_valid = len(sample) - np.isnan(ordered).sum(axis=1)
+        edges = sorted_quantiles(ordered, n_valid, np.arange(1, n_bins) / n_bins)
+        # Bornes NaN (colonne vide): toutes les valeurs présentes tombent dans le premier intervalle
+        edges = np.where(np.isnan(edges), np.inf, edges)
+
+        for column in range(store.n_features):
+            # Valeurs strictement inférieures à chaque borne: effectifs cumulés des intervalles
+            below = np.searchsorted(ordered[column, :n_valid[column]], edges[column], side='left')
+            counts[column, :n_bins] = np.diff(below, prepend=0, append=n_valid[column])
+        counts[:, n_bins] = len(sample) - n_valid
+        return cls(list(store.feature_names), edges, counts / len(sample), len(sample))
+
+
+class DriftMonitor:
+    """Histogrammes des features des clients scorés, comparés à la référence"""
+
+    def __init__(self, reference):
+        self.reference = reference
+        self._lock = threading.Lock()
+        n_features = len(reference.feature_names)
+        self._feature_offsets = np.arange(n_features) * (reference.n_bins + 1)
+        self._counts = np.zeros(n_features * (reference.n_bins + 1), dtype=np.int64)
+        self._n_observed = 0
+
+    @property
+    def n_observed(self):
+        return self._n_observed
+
+    def update(self, features):
+        """Compte un vecteur de features (une ligne du magasin)"""
+        features = np.asarray(features)
+        # Nombre de bornes <= valeur, en une comparaison vectorisée sur toutes les features
+        bins = (self.reference.edges <= features[:, np.newaxis]).sum(axis=1)
+        bins[np.isnan(features)] = self.reference.n_bins
+        with self._lock:
+            self._counts[self._feature_offsets + bins] += 1
+            self._n_observed += 1
+
+    def update_many(self, matrix):
+        """Compte plusieurs lignes en une seule opération"""
+        if not len(matrix):
+            return
+        bins = bin_rows(self.reference.edges, np.asarray(matrix)) + self._feature_offsets
+        counts = np.bincount(bins.ravel(), minlength=self._counts.size)
+        with self._lock:
+            self._counts += counts
+            self._n_observed += len(matrix)
+
+    def scores(self):
+        """PSI et KS de chaque feature, proportions observées et nombre d'observations"""
+        with self._lock:
+            counts = self._counts.reshape(-1, self.reference.n_bins + 1).astype(np.float64)
+            n_observed = self._n_observed
+        observed = counts / max(n_observed, 1)
+        expected = self.reference.proportions
+        observed_smoothed = np.maximum(observed, PSI_EPSILON)
+        expected_smoothed = np.maximum(expected, PSI_EPSILON)
+        psi = ((observed_smoothed - expected_smoothed) * np.log(observed_smoothed / expected_smoothed)).sum(axis=1)
+        ks = np.abs(np.cumsum(observed, axis=1) - np.cumsum(expected, axis=1)).max(axis=1)
+        return psi, ks, observed, n_observed
+
+    def report(self, top_k=10):
+        """Features dont la distribution observée s'écarte le plus de la référence (PSI décroissant)"""
+        psi, ks, observed, n_observed = self.scores()
+        order = np.argsort(-psi, kind='stable')[:top_k]
+        features = [
+            {
+                "feature": self.reference.feature_names[i],
+                "psi": float(psi[i]),
+                "ks": float(ks[i]),
+                "missing_rate": float(observed[i, -1]),
+                "reference_missing_rate": float(self.reference.proportions[i, -1]),
+            }
+            for i in order
+        ] if n_observed else []
+        return {
+            "n_observed": n_observed,
+            "reference_rows": self.reference.n_rows,
+            "n_bins": self.reference.n_bins,
+            "significant": n_observed >= MIN_OBSERVATIONS,
+            "n_features_moderate": int(((psi >= PSI_MODERATE) & (psi < PSI_SIGNIFICANT)).sum()) if n_observed else 0,
+            "n_features_significant": int((psi >= PSI_SIGNIFICANT).sum()) if n_observed else 0,
+            "top_features": features,
+        }
@@ -0,0 +1,113 @@
+"""
+Explications locales des prédictions.
+- shap: contributions TreeSHAP exactes de chaque feature, calculées par LightGBM (`pred_contrib=True`)
+  dans le même passage que la probabilité: la somme des contributions et de la valeur de base
+  (espérance du modèle) donne le score brut (log-odds) du client.
+- heuristic: approximation historique (écart à la moyenne x importance globale), utilisée pour
+  les modèles qui ne sont pas des LightGBM binaires.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+from lightgbm import Booster
+
+METHODS = ("shap", "heuristic")
+
+# Forme de l'explication renvoyée: aucune (décision seule), les k principales contributions du client,
+# ou complète (importance globale des features et waterfall du client)
+EXPLAIN_NONE = "none"
+EXPLAIN_TOP_K = "top_k"
+EXPLAIN_FULL = "full"
+EXPLAIN_MODES = (EXPLAIN_NONE, EXPLAIN_TOP_K, EXPLAIN_FULL)
+
+# Anciennes valeurs booléennes du paramètre `explain`
+_BOOLEAN_MODES = {"true": EXPLAIN_FULL, "1": EXPLAIN_FULL, "yes": EXPLAIN_FULL,
+                  "false": EXPLAIN_NONE, "0": EXPLAIN_NONE, "no": EXPLAIN_NONE}
+
+DEFAULT_TOP_K = 10
+
+
+@dataclass(frozen=True)
+class ExplainOptions:
+    """Mode d'explication et nombre de contributions; faux pour le mode `none`"""
+
+    mode: str = EXPLAIN_FULL
+    k: int = DEFAULT_TOP_K
+
+    @classmethod
+    def parse(cls, value, k=DEFAULT_TOP_K):
+        """Options depuis un mode (`none`, `top_k`, `full`) ou un booléen (True: full, False: none)"""
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, bool):
+            mode = EXPLAIN_FULL if value else EXPLAIN_NONE
+        else:
+            mode = str(value).strip().lower()
+            mode = _BOOLEAN_MODES.get(mode, mode)
+        if mode not in EXPLAIN_MODES:
+            raise ValueError(f"Mode d'explication inconnu: {value} (valeurs possibles: {', '.join(EXPLAIN_MODES)})")
+        if int(k) < 1:
+            raise ValueError(f"Nombre de contributions invalide: {k}")
+        return cls(mode, int(k))
+
+    def __bool__(self):
+        return self.mode != EXPLAIN_NONE
+
+
+class ShapExplainer:
+    """Probabilités et contributions TreeSHAP d'un modèle LightGBM binaire"""
+
+    method = "shap"
+
+    def __init__(self, model):
+        self.booster = model.booster_
+        self.sigmoid = float(self.booster.params.get("sigmoid", 1.0))
+
+    def explain(self, X):
+        """Retourne (probabilités, contributions (n x features), valeurs de base) pour les lignes de X"""
+        contributions = self.booster.predict(X, pred_contrib=True)
+        # La dernière colonne est la valeur de base; la somme de la ligne est le score brut
+        raw_scores = contributions.sum(axis=1)
+        probas = 1.0 / (1.0 + np.exp(-self.sigmoid * raw_scores))
+        return probas, contributions[:, :-1], contributions[:, -1]
+
+
+def create_explainer(model, method="shap"):
+    """ShapExplainer si demandé et possible (LightGBM binaire), sinon None: explication heuristique"""
+    if method not in METHODS:
+        raise ValueError(f"Méthode d'explication inconnue: {method} (valeurs possibles: {', '.join(METHODS)})")
+    booster = getattr(model, "booster_", None)
+    if method == "shap" and isinstance(booster, Booster) and str(booster.params.get("objective", "binary")).startswith("binary"):
+        return ShapExplainer(model)
+    return None
+
+
+def top_contributions(contributions, k):
+    """Indices et valeurs des k plus fortes contributions (en valeur absolue) de chaque ligne, triées"""
+    contributions = np.atleast_2d(contributions)
+    k = min(k, contributions.shape[1])
+    magnitudes = np.abs(contributions)
+    # Sélection partielle des k plus grandes, puis tri de ces k seulement
+    indices = np.argpartition(-magnitudes, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(magnitudes, indices, axis=1), axis=1, kind='stable')
+    indices = np.take_along_axis(indices, order, axis=1)
+    return indices, np.take_along_axis(contributions, indices, axis=1)
+
+
+def heuristic_contributions(client_values, mean_values, importances, prediction):
+    """Contributions approchées: écart normalisé à la moyenne du dataset pondéré par l'importance globale"""
+    client_values = np.asarray(client_values, dtype=np.float64)
+
+    # Calculer l'écart normalisé (valeur brute si la moyenne est nulle)
+    safe_means = np.where(mean_values != 0, mean_values, 1.0)
+    deviations = np.where(mean_values != 0, (client_values - mean_values) / safe_means, client_values)
+
+    # Limiter les valeurs extrêmes; une valeur manquante n'a pas de contribution
+    deviations = np.nan_to_num(np.clip(deviations, -2, 2), nan=0.0)
+
+    # Le signe indique si c'est positif ou négatif pour l'acceptation du prêt
+    # Pour les modèles où 1 = défaut, un écart positif par rapport à la moyenne
+    # augmente le risque (donc impact négatif sur l'acceptation)
+    sign = -1 if prediction == 1 else 1
+    return sign * deviations * importances * 0.05  # Facteur d'échelle
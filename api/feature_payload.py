@@ -0,0 +1,142 @@
+"""
+Lecture des features brutes envoyées à /predict/features (nouveaux demandeurs absents du magasin).
+Le corps de la requête est analysé directement, sans modèle pydantic champ par champ: les noms de
+features sont convertis en positions par l'index des colonnes du magasin (calculé une fois au
+chargement), puis les valeurs sont copiées d'un bloc dans une matrice float32 remplie de NaN.
+
+Formats acceptés (JSON):
+- un client, vecteur creux ou complet: {"features": {"EXT_SOURCE_2": 0.6, ...}};
+- un client, vecteur complet dans l'ordre du modèle: {"features": [0.1, 0.0, ...]};
+- plusieurs clients, par ligne: {"features": [{...}, {...}]};
+- plusieurs clients, par colonne: {"columns": {"EXT_SOURCE_2": [0.6, 0.3], ...}}.
+Les lots peuvent aussi être envoyés au format Arrow IPC (Content-Type application/vnd.apache.arrow.stream,
+dépendance optionnelle `pyarrow`). Une colonne ou une clé SK_ID_CURR facultative est renvoyée avec
+chaque résultat. Les features absentes valent NaN (valeur manquante pour LightGBM); une feature
+inconnue est une erreur.
+"""
+
+import numpy as np
+import orjson
+
+from feature_store import ID_COLUMN
+
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class FeaturePayload:
+    """Matrice des features alignée sur l'ordre du modèle, identifiants facultatifs, et indicateur
+    d'une requête pour un seul client (réponse au format de /predict)"""
+
+    def __init__(self, features, ids=None, single=False):
+        self.features = features
+        self.ids = ids
+        self.single = single
+
+    def __len__(self):
+        return self.features.shape[0]
+
+
+def _values(values, what):
+    try:
+        return np.asarray(values, dtype=np.float32)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Valeurs non numériques pour {what}: {e}") from e
+
+
+def _positions(names, column_index):
+    """Positions des features nommées dans la matrice; erreur pour les noms inconnus"""
+    try:
+        return [column_index[name] for name in names]
+    except KeyError:
+        unknown = [name for name in names if name not in column_index]
+        raise ValueError(f"Features inconnues du modèle: {unknown[:10]}") from None
+
+
+def _from_columns(columns, column_index, n_features):
+    ids = columns.pop(ID_COLUMN, None)
+    if not all(isinstance(values, (list, np.ndarray)) for values in columns.values()):
+        raise ValueError("`columns` doit associer chaque feature à la liste de ses valeurs.")
+    lengths = {len(values) for values in columns.values()}
+    if ids is not None:
+        lengths.add(len(ids))
+    if len(lengths) > 1:
+        raise ValueError(f"Colonnes de longueurs différentes: {sorted(lengths)}")
+    n_rows = lengths.pop() if lengths else 0
+
+    features = np.full((n_rows, n_features), np.nan, dtype=np.float32)
+    names = list(columns)
+    for name, position in zip(names, _positions(names, column_index)):
+        features[:, position] = _values(columns[name], f"la feature {name}")
+    return FeaturePayload(features, None if ids is None else list(ids))
+
+
+def _from_records(records, column_index, n_features, single=False):
+    features = np.full((len(records), n_features), np.nan, dtype=np.float32)
+    ids = []
+    for row, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError(f"Client {row}: un objet {{feature: valeur}} est attendu.")
+        sk_id = record.get(ID_COLUMN)
+        ids.append(sk_id)
+        names = [name for name in record if name != ID_COLUMN]
+        # Une seule affectation indexée par client
+        features[row, _positions(names, column_index)] = _values([record[name] for name in names], f"le client {row}")
+    return FeaturePayload(features, ids if any(sk_id is not None for sk_id in ids) else None, single)
+
+
+def parse_json(body, column_index, n_features):
+    try:
+        payload = orjson.loads(body)
+    except ValueError as e:
+        raise ValueError(f"JSON invalide: {e}") from e
+    if not isinstance(payload, dict):
+        raise ValueError("Un objet JSON avec la clé `features` ou `columns` est attendu.")
+
+    if "columns" in payload:
+        if not isinstance(payload["columns"], dict):
+            raise ValueError("`columns` doit associer chaque feature à la liste de ses valeurs.")
+        return _from_columns(dict(payload["columns"]), column_index, n_features)
+
+    features = payload.get("features")
+    if isinstance(features, dict):
+        return _from_records([features], column_index, n_features, single=True)
+    if isinstance(features, list) and features and all(isinstance(record, dict) for record in features):
+        return _from_records(features, column_index, n_features)
+    if isinstance(features, list):
+        # Vecteur complet, dans l'ordre des features du modèle
+        vector = _values(features, "le vecteur de features")
+        if vector.shape != (n_features,):
+            raise ValueError(f"Vecteur de forme {vector.shape} pour {n_features} features.")
+        return FeaturePayload(vector[np.newaxis, :], None, single=True)
+    raise ValueError("Un objet JSON avec la clé `features` ou `columns` est attendu.")
+
+
+def parse_arrow(body, column_index, n_features):
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("Le format Arrow nécessite le paquet `pyarrow` (pip install pyarrow).") from e
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"Flux Arrow invalide: {e}") from e
+
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if name == ID_COLUMN:
+            columns[name] = column.to_pylist()
+        else:
+            # Valeurs nulles converties en NaN
+            try:
+                columns[name] = column.cast(pa.float32()).to_numpy(zero_copy_only=False)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ValueError(f"Valeurs non numériques pour la feature {name}: {e}") from e
+    return _from_columns(columns, column_index, n_features)
+
+
+def parse_payload(body, content_type, column_index, n_features):
+    """Features d'un corps de requête JSON ou Arrow; ValueError si le contenu est invalide"""
+    if content_type and content_type.split(";")[0].strip().lower() == ARROW_CONTENT_TYPE:
+        return parse_arrow(body, column_index, n_features)
+    return parse_json(body, column_index, n_features)
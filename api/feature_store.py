@@ -0,0 +1,286 @@
+"""
+Magasin de features des clients.
+Les features sont stockées dans une matrice float32 contiguë (une ligne par client, colonnes dans
+l'ordre attendu par le modèle) et un index SK_ID_CURR -> numéro de ligne permet de retrouver
+un client en O(1), sans parcourir ni copier le DataFrame.
+
+Le magasin peut être converti une fois pour toutes depuis le CSV vers un format binaire
+(features.npy, ids.npy, columns.json) chargé ensuite par projection mémoire (memmap):
+pas d'analyse du texte au démarrage et des pages partagées entre les processus via le cache du système.
+
+Le magasin peut ne conserver que les features utilisées par le modèle (`FeatureProjection`): les lignes
+sont replacées dans l'ordre complet du modèle au moment de la prédiction, les features absentes valant NaN.
+Avec `--model`, la conversion écrit directement la matrice réduite (model_columns.json garde l'ordre
+complet du modèle): le magasin reste projeté en mémoire au lieu d'être réduit par copie au chargement.
+
+    python feature_store.py ../df_test_reduit.csv ../features_store
+    python feature_store.py ../df_test_reduit.csv ../features_store --model LGBM_TTS.pkl --policy LGBM_TTS.policy.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ID_COLUMN = 'SK_ID_CURR'
+
+# Fichiers du format binaire
+MATRIX_FILE = 'features.npy'
+IDS_FILE = 'ids.npy'
+COLUMNS_FILE = 'columns.json'
+# Ordre complet des features du modèle, pour un magasin réduit à ses features utilisées
+MODEL_COLUMNS_FILE = 'model_columns.json'
+
+# Lignes de la matrice complète réutilisée par `FeatureProjection.expand` (au-delà, allocation à chaque appel)
+EXPAND_BUFFER_ROWS = 1024
+
+
+class FeatureStore:
+    """Matrice de features indexée par SK_ID_CURR. `model_feature_names`: ordre complet des features du
+    modèle si le magasin n'en contient qu'une partie (magasin réduit à la conversion), sinon None."""
+
+    def __init__(self, ids, matrix, feature_names, model_feature_names=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        # Matrice projetée en mémoire (pages lues à la demande et partagées entre les processus)
+        self.mapped = isinstance(matrix, np.memmap)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.feature_names = list(feature_names)
+        self.model_feature_names = list(model_feature_names) if model_feature_names is not None else None
+
+        if self.matrix.ndim != 2 or self.matrix.shape != (len(self.ids), len(self.feature_names)):
+            raise ValueError(
+                f"Dimensions incohérentes: {self.matrix.shape} pour {len(self.ids)} identifiants "
+                f"et {len(self.feature_names)} features."
+            )
+
+        # Position de chaque feature dans une ligne de la matrice
+        self.column_index = {name: i for i, name in enumerate(self.feature_names)}
+
+        # Index de hachage SK_ID_CURR -> ligne; en cas de doublon, la première occurrence est conservée
+        ids_list = self.ids.tolist()
+        self._index = dict(zip(reversed(ids_list), range(len(ids_list) - 1, -1, -1)))
+        if len(self._index) != len(ids_list):
+            logger.warning("%d identifiants %s en double ignorés", len(ids_list) - len(self._index), ID_COLUMN)
+
+    @classmethod
+    def from_dataframe(cls, df, feature_names=None):
+        """Construit le magasin depuis un DataFrame contenant la colonne SK_ID_CURR.
+        `feature_names` impose l'ordre des colonnes (celui du modèle); par défaut l'ordre du DataFrame."""
+        if ID_COLUMN not in df.columns:
+            raise ValueError(f"La colonne '{ID_COLUMN}' est manquante dans df_test_reduit.csv.")
+
+        if feature_names is None:
+            feature_names = [column for column in df.columns if column != ID_COLUMN]
+
+        missing = [name for name in feature_names if name not in df.columns]
+        if missing:
+            raise ValueError(f"Features attendues par le modèle absentes des données: {missing[:10]}")
+
+        matrix = df[feature_names].to_numpy(dtype=np.float32)
+        return cls(df[ID_COLUMN].to_numpy(), matrix, feature_names)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Charge un magasin converti par `convert_csv`; la matrice est projetée en mémoire sans copie"""
+        with open(os.path.join(path, COLUMNS_FILE), encoding='utf-8') as f:
+            feature_names = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        matrix = np.load(os.path.join(path, MATRIX_FILE), mmap_mode=mmap_mode)
+        ids = np.load(os.path.join(path, IDS_FILE))
+        model_feature_names = None
+        if os.path.exists(os.path.join(path, MODEL_COLUMNS_FILE)):
+            with open(os.path.join(path, MODEL_COLUMNS_FILE), encoding='utf-8') as f:
+                model_feature_names = json.load(f)
+        return cls(ids, matrix, feature_names, model_feature_names)
+
+    def save(self, path):
+        """Écrit le magasin au format binaire"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, MATRIX_FILE), self.matrix)
+        np.save(os.path.join(path, IDS_FILE), self.ids)
+        with open(os.path.join(path, COLUMNS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.feature_names, f)
+        if self.model_feature_names is not None:
+            with open(os.path.join(path, MODEL_COLUMNS_FILE), 'w', encoding='utf-8') as f:
+                json.dump(self.model_feature_names, f)
+
+    def reorder(self, feature_names):
+        """Magasin dont les colonnes suivent `feature_names` (copie de la matrice si l'ordre change)"""
+        if list(feature_names) == self.feature_names:
+            return self
+        missing = [name for name in feature_names if name not in self.column_index]
+        if missing:
+            raise ValueError(f"Features attendues par le modèle absentes des données: {missing[:10]}")
+        columns = [self.column_index[name] for name in feature_names]
+        return FeatureStore(self.ids, self.matrix[:, columns], feature_names)
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, sk_id):
+        return sk_id in self._index
+
+    def row_of(self, sk_id):
+        """Numéro de ligne du client, ou None s'il est inconnu"""
+        return self._index.get(sk_id)
+
+    def get(self, sk_id):
+        """Vecteur de features du client (vue sur la matrice, sans copie), ou None s'il est inconnu"""
+        row = self._index.get(sk_id)
+        if row is None:
+            return None
+        return self.matrix[row]
+
+    def rows_of(self, sk_ids):
+        """Numéros de ligne pour une liste d'identifiants (-1 pour les identifiants inconnus)"""
+        index = self._index
+        return np.fromiter((index.get(sk_id, -1) for sk_id in sk_ids), dtype=np.int64, count=len(sk_ids))
+
+    def take(self, sk_ids):
+        """Matrice des clients trouvés (un seul `take` indexé) et masque des identifiants trouvés,
+        dans l'ordre de `sk_ids`"""
+        rows = self.rows_of(sk_ids)
+        found = rows >= 0
+        return self.matrix.take(rows[found], axis=0), found
+
+
+class FeatureProjection:
+    """Correspondance entre les colonnes d'un magasin réduit et les features du modèle.
+    Les colonnes retirées ne sont lues par aucun nœud des arbres: les remplacer par NaN ne change ni les
+    probabilités ni les contributions TreeSHAP des autres features (nulles pour les features retirées)."""
+
+    def __init__(self, model_feature_names, store_feature_names):
+        self.model_feature_names = list(model_feature_names)
+        # Position de chaque feature du modèle (lecture des features brutes de /predict/features)
+        self.column_index = {name: i for i, name in enumerate(self.model_feature_names)}
+        missing = [name for name in store_feature_names if name not in self.column_index]
+        if missing:
+            raise ValueError(f"Features du magasin inconnues du modèle: {missing[:10]}")
+        # Position, dans l'ordre du modèle, de chaque colonne du magasin
+        self.positions = np.array([self.column_index[name] for name in store_feature_names], dtype=np.int64)
+        # Matrice complète de chaque thread, dont seules les colonnes du magasin sont réécrites (les autres
+        # restent NaN): pas d'allocation de n x features du modèle à chaque prédiction
+        self._local = threading.local()
+
+    @property
+    def n_model_features(self):
+        return len(self.model_feature_names)
+
+    def expand(self, features):
+        """Lignes du magasin (n x colonnes du magasin) -> matrice complète dans l'ordre du modèle.
+        Jusqu'à EXPAND_BUFFER_ROWS lignes, le résultat est une vue sur la matrice du thread appelant,
+        valable jusqu'à l'appel suivant dans ce thread."""
+        n_rows = features.shape[0]
+        if n_rows > EXPAND_BUFFER_ROWS:
+            full = np.full((n_rows, self.n_model_features), np.nan, dtype=np.float32)
+            full[:, self.positions] = features
+            return full
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.full((EXPAND_BUFFER_ROWS, self.n_model_features), np.nan, dtype=np.float32)
+        full = buffer[:n_rows]
+        full[:, self.positions] = features
+        return full
+
+    def project(self, values):
+        """Colonnes du magasin d'une matrice dans l'ordre du modèle (features ou contributions)"""
+        return values[:, self.positions]
+
+
+def model_columns(model, columns, segment_feature=None):
+    """Ordre complet des features du modèle parmi `columns` et features à conserver dans le magasin:
+    celles lues par au moins un nœud des arbres, plus la feature de segmentation de la politique de
+    décision (toutes si le modèle n'expose pas de Booster LightGBM)"""
+    from model_loading import model_feature_order
+    from tree_engine import used_feature_indices
+
+    model_feature_names = model_feature_order(model, columns) or list(columns)
+    used = used_feature_indices(model)
+    if used is None:
+        return model_feature_names, model_feature_names
+    kept = set(used.tolist())
+    if segment_feature in model_feature_names:
+        kept.add(model_feature_names.index(segment_feature))
+    return model_feature_names, [model_feature_names[i] for i in sorted(kept)]
+
+
+def convert_csv(csv_path, output_path, chunksize=50000, model=None, segment_feature=None):
+    """Convertit le CSV des clients au format binaire, par blocs de `chunksize` lignes (mémoire bornée).
+    Avec `model`, seules les features lues par le modèle (et `segment_feature`) sont écrites, dans son ordre."""
+    # Premier passage: nombre de lignes, en ne lisant que la colonne des identifiants
+    n_rows = sum(len(chunk) for chunk in pd.read_csv(csv_path, usecols=[ID_COLUMN], chunksize=chunksize))
+    columns = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    feature_names = [column for column in columns if column != ID_COLUMN]
+    model_feature_names = None
+    if model is not None:
+        model_feature_names, feature_names = model_columns(model, feature_names, segment_feature)
+
+    os.makedirs(output_path, exist_ok=True)
+    matrix = np.lib.format.open_memmap(
+        os.path.join(output_path, MATRIX_FILE), mode='w+', dtype=np.float32, shape=(n_rows, len(feature_names))
+    )
+    ids = np.empty(n_rows, dtype=np.int64)
+
+    # Second passage: remplissage bloc par bloc
+    start = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        end = start + len(chunk)
+        matrix[start:end] = chunk[feature_names].to_numpy(dtype=np.float32)
+        ids[start:end] = chunk[ID_COLUMN].to_numpy()
+        start = end
+    matrix.flush()
+    del matrix
+
+    np.save(os.path.join(output_path, IDS_FILE), ids)
+    with open(os.path.join(output_path, COLUMNS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(feature_names, f)
+    # Un magasin complet (re)converti ne garde pas l'ordre du modèle d'une conversion réduite précédente
+    model_columns_path = os.path.join(output_path, MODEL_COLUMNS_FILE)
+    if model_feature_names is not None and model_feature_names != feature_names:
+        with open(model_columns_path, 'w', encoding='utf-8') as f:
+            json.dump(model_feature_names, f)
+    elif os.path.exists(model_columns_path):
+        os.remove(model_columns_path)
+    return n_rows, len(feature_names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversion du CSV des clients en magasin de features binaire")
+    parser.add_argument('csv_path', help="Fichier CSV source (ex: df_test_reduit.csv)")
+    parser.add_argument('output_path', help="Répertoire de sortie du magasin binaire")
+    parser.add_argument('--chunksize', type=int, default=50000, help="Nombre de lignes lues par bloc")
+    parser.add_argument('--model', help="Modèle (.pkl): n'écrit que les features lues par ses arbres")
+    parser.add_argument('--policy', help="Politique de décision dont la feature de segmentation est conservée (avec --model)")
+    args = parser.parse_args()
+
+    model = segment_feature = None
+    if args.model:
+        import joblib
+        model = joblib.load(args.model)
+    if args.policy:
+        from decision_policy import DecisionPolicy
+        segment_feature = DecisionPolicy.load(args.policy).segment_feature
+
+    start_time = time.perf_counter()
+    n_rows, n_features = convert_csv(args.csv_path, args.output_path, args.chunksize, model, segment_feature)
+    csv_size = os.path.getsize(args.csv_path)
+    store_size = sum(
+        os.path.getsize(os.path.join(args.output_path, name))
+        for name in (MATRIX_FILE, IDS_FILE, COLUMNS_FILE, MODEL_COLUMNS_FILE)
+        if os.path.exists(os.path.join(args.output_path, name))
+    )
+    print(
+        f"{n_rows} clients x {n_features} features convertis en {time.perf_counter() - start_time:.2f}s "
+        f"({csv_size / 1e6:.1f} Mo -> {store_size / 1e6:.1f} Mo) dans {args.output_path}"
+    )
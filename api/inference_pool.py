@@ -0,0 +1,104 @@
+"""
+Pool d'inférence borné.
+Les calculs bloquants (recherche des features, prédiction LightGBM, explications) sont exécutés dans un
+pool de threads pour que la boucle d'événements reste réactive. Le nombre de tâches en attente est borné:
+au-delà, la tâche est refusée immédiatement (contre-pression) au lieu d'allonger la file indéfiniment.
+Des threads suffisent: LightGBM libère le GIL pendant la prédiction et le modèle est partagé sans copie.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import LatencyRecorder
+
+
+class PoolSaturatedError(Exception):
+    """Levée lorsque le pool et sa file d'attente sont pleins"""
+
+
+class InferencePool:
+    """Pool de threads avec une file d'attente bornée. `wait_histogram` (metrics.Histogram, optionnel)
+    reçoit le temps d'attente de chaque tâche dans la file, en secondes."""
+
+    def __init__(self, max_workers, max_queue, wait_histogram=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._rejected = 0
+        self._completed = 0
+        # Temps passé dans la file avant le début de l'exécution
+        self.wait_times = LatencyRecorder()
+        self.wait_histogram = wait_histogram
+
+    def _try_acquire(self):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                return False
+            self._in_flight += 1
+            return True
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+    def submit(self, fn, *args):
+        """Soumet `fn(*args)` au pool et retourne un concurrent.futures.Future.
+        Lève PoolSaturatedError si la file d'attente est pleine."""
+        if not self._try_acquire():
+            raise PoolSaturatedError("Pool d'inférence saturé")
+
+        submitted_at = time.perf_counter()
+        # Le calcul voit les variables de contexte de l'appelant (identifiant de requête des journaux)
+        context = contextvars.copy_context()
+
+        def task():
+            wait = time.perf_counter() - submitted_at
+            self.wait_times.record("queue_wait", wait)
+            if self.wait_histogram is not None:
+                self.wait_histogram.observe(wait)
+            with self._lock:
+                self._running += 1
+            try:
+                return context.run(fn, *args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        try:
+            future = self._executor.submit(task)
+        except Exception:
+            self._release()
+            raise
+        # La place est libérée à la fin réelle du calcul, même si le client s'est déconnecté entre-temps
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args):
+        """Exécute `fn(*args)` dans le pool sans bloquer la boucle d'événements"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self):
+        with self._lock:
+            in_flight, running = self._in_flight, self._running
+            rejected, completed = self._rejected, self._completed
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "running": running,
+            "queue_depth": max(in_flight - running, 0),
+            "rejected": rejected,
+            "completed": completed,
+            "wait": self.wait_times.summary().get("queue_wait"),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,189 @@
+"""
+Configuration des journaux de l'API.
+- niveau fixé par la variable LOG_LEVEL (INFO par défaut), format par LOG_FORMAT (json par défaut, ou text);
+- les requêtes ne font que déposer l'enregistrement dans une file (DeferredQueueHandler): le formatage JSON,
+  celui des traces d'exception et l'écriture sur stderr sont faits par un thread dédié (QueueListener),
+  hors du chemin des requêtes;
+- chaque ligne porte l'identifiant de la requête en cours (en-tête X-Request-ID, ou généré), propagé
+  par une variable de contexte jusque dans le pool d'inférence.
+
+Les appels utilisent le formatage paresseux (`logger.debug("... %s", valeur)`): un niveau désactivé
+ne coûte qu'une comparaison.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+
+# Identifiant de la requête en cours, None hors requête (chargement, rechargement en arrière-plan, ...)
+request_id_var = ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+# Attributs standard d'un LogRecord: les autres proviennent de `extra=` et sont ajoutés à la ligne JSON
+_RESERVED_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+# File et thread d'écriture actifs (voir configure_logging)
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Ajoute l'identifiant de la requête courante à l'enregistrement (dans le thread appelant)"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler qui ne formate pas l'enregistrement dans le thread appelant. `QueueHandler.prepare`
+    applique le formateur par défaut (trace de l'exception copiée dans le message, exc_info effacé):
+    ici seul le message est résolu (msg % args, les arguments pouvant changer ensuite), exc_info est
+    conservé et la trace est formatée par le formateur du thread d'écriture."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement: horodatage, niveau, logger, message, request_id et champs `extra`"""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _start_listener(handler, stream_handler):
+    global _listener
+    log_queue = queue.SimpleQueue()
+    handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def configure_logging(level=None, fmt=None, stream=None):
+    """Configure le logger racine (idempotent): file d'attente + thread d'écriture.
+
+    Sans argument, le niveau et le format sont lus dans LOG_LEVEL et LOG_FORMAT.
+    """
+    level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.environ.get("LOG_FORMAT", "json")).lower()
+
+    stream_handler = logging.StreamHandler(stream or sys.stderr)
+    if fmt == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    if _listener is not None:
+        _listener.stop()
+
+    # La file est créée par _start_listener
+    queue_handler = DeferredQueueHandler(None)
+    queue_handler.addFilter(RequestIdFilter())
+    _start_listener(queue_handler, stream_handler)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    # Le thread d'écriture n'existe pas dans un processus issu d'un fork (workers gunicorn):
+    # une nouvelle file et un nouveau thread y sont créés
+    if hasattr(os, "register_at_fork") and not getattr(configure_logging, "_fork_hook", False):
+        os.register_at_fork(after_in_child=_restart_after_fork)
+        configure_logging._fork_hook = True
+    return queue_handler
+
+
+def _restart_after_fork():
+    if _listener is not None:
+        queue_handler = next(
+            (h for h in logging.getLogger().handlers if isinstance(h, logging.handlers.QueueHandler)), None
+        )
+        if queue_handler is not None:
+            _start_listener(queue_handler, _listener.handlers[0])
+
+
+def shutdown_logging():
+    """Vide la file et arrête le thread d'écriture"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+class RequestLoggingMiddleware:
+    """Middleware ASGI: identifiant de requête (X-Request-ID) et une ligne de journal par requête avec sa durée"""
+
+    def __init__(self, app, logger_name="api.access"):
+        self.app = app
+        self.logger = logging.getLogger(logger_name)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                # Identifiant fourni par le client ou le proxy, borné pour éviter les abus
+                request_id = value.decode("latin-1")[:128]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info(
+                    "%s %s %s", scope["method"], scope["path"], status,
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": round((time.perf_counter() - start) * 1000.0, 3),
+                    },
+                )
+            request_id_var.reset(token)
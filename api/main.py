@@ -1,29 +1,167 @@
+import dataclasses
+import hashlib
 import os
-from fastapi import FastAPI, HTTPException, Request
+import sys
+import uuid
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import List
+from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import pandas as pd
 import logging
 import uvicorn
-import joblib
 from fastapi.middleware.cors import CORSMiddleware
 import numpy as np
+import warnings
 
-# Configuration des logs pour le debugging
-logging.basicConfig(level=logging.DEBUG)
+# Les modules voisins (metrics, ...) sont importables que l'API soit lancée
+# depuis api/ (`python main.py`) ou depuis la racine (`uvicorn api.main:app`)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from decision_policy import CompiledPolicy
+from drift_monitor import DriftMonitor, DriftReference
+from feature_payload import parse_payload
+from feature_store import FeatureProjection, FeatureStore
+from inference_pool import InferencePool, PoolSaturatedError
+from metrics import Counter, Gauge, Histogram, LatencyMiddleware, LatencyRecorder, MetricsRegistry
+from micro_batching import MicroBatcher
+from model_loading import load_decision_policy, load_model, model_feature_order
+from model_registry import InFlightTracker, ModelRegistry
+from prediction_cache import create_cache
+from reference_stats import ReferenceStats
+from responses import response_class
+from score_distribution import DEFAULT_BINS, ScoreDistribution
+from shadow import ShadowStats, routes_to_candidate
+from similarity import SimilarityIndex
+from tree_engine import create_predictor, used_feature_indices
+from worker_sync import SharedState
+from explainer import EXPLAIN_FULL, EXPLAIN_NONE, ExplainOptions, create_explainer, heuristic_contributions, top_contributions
+from logging_config import RequestLoggingMiddleware, configure_logging
+
+# Journaux JSON écrits par un thread dédié; niveau fixé par LOG_LEVEL (INFO par défaut)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Init API FastAPI
-app = FastAPI()
+# Le modèle est interrogé avec la matrice numpy du magasin de features (sans noms de colonnes)
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
 
-# Ajout de CORS pour permettre les requêtes cross-origin
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# Politique de décision (seuils par segment) versionnée avec le modèle; à défaut LGBM_TTS.policy.json
+# à côté du modèle, sinon seuil unique de 0.5
+DECISION_POLICY_PATH = os.environ.get("DECISION_POLICY_PATH")
+
+# Registre des versions du modèle (répertoire local ou arborescence mlruns); sans registre, LGBM_TTS.pkl
+MODEL_REGISTRY_PATH = os.environ.get("MODEL_REGISTRY_PATH")
+# Version chargée au démarrage: identifiant de version, "latest" (défaut avec un registre) ou "legacy" (LGBM_TTS.pkl)
+MODEL_VERSION = os.environ.get("MODEL_VERSION")
+LEGACY_VERSION = "legacy"
+
+# Attente maximale (secondes) de la fin des requêtes en cours sur l'ancien modèle après une activation
+DRAIN_TIMEOUT_S = float(os.environ.get("DRAIN_TIMEOUT_S", 30))
+
+# Nombre de clients scorés pour préchauffer un modèle avant son activation
+WARMUP_ROWS = 64
+
+# Modèle candidat comparé au modèle actif sur le trafic de /predict (version du registre, aucun par défaut)
+SHADOW_MODEL_VERSION = os.environ.get("SHADOW_MODEL_VERSION")
+# Pourcentage des clients servis par le candidat (A/B); 0: le candidat est seulement évalué en shadow
+AB_TRAFFIC_PERCENT = float(os.environ.get("AB_TRAFFIC_PERCENT", 0))
+
+# Intervalle (secondes) entre deux vérifications des opérations d'administration publiées par les autres workers
+WORKER_SYNC_INTERVAL_S = float(os.environ.get("WORKER_SYNC_INTERVAL_S", 1))
+
+# Magasin réduit aux features lues par les arbres du modèle (PRUNE_FEATURES=0 conserve toutes les colonnes)
+PRUNE_FEATURES = os.environ.get("PRUNE_FEATURES", "1").lower() in ("1", "true", "yes")
+
+# Nombre maximal d'identifiants acceptés par /predict/batch
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 10000))
+
+# Pool d'inférence: nombre de threads de calcul et taille maximale de la file d'attente
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", min(4, os.cpu_count() or 1)))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", 64))
+
+# Délai (secondes) conseillé au client dans l'en-tête Retry-After quand le pool est saturé
+RETRY_AFTER_S = int(os.environ.get("RETRY_AFTER_S", 1))
+
+# Moteur d'inférence: sklearn (predict_proba du wrapper), booster (Booster LightGBM) ou numpy (arbres exportés)
+INFERENCE_ENGINE = os.environ.get("INFERENCE_ENGINE", "sklearn")
+
+# Explication des prédictions: shap (TreeSHAP de LightGBM) ou heuristic (écart à la moyenne x importance)
+EXPLANATION_METHOD = os.environ.get("EXPLANATION_METHOD", "shap")
+
+# Nombre de features affichées dans le waterfall (par défaut; paramètre `k` des requêtes, au plus MAX_TOP_K)
+WATERFALL_TOP_K = 10
+MAX_TOP_K = 1000
+
+# Nombre maximal de clients proches renvoyés par /clients/{SK_ID_CURR}/similar
+MAX_NEIGHBORS = 100
+
+# Micro-batching des requêtes /predict concurrentes (désactivé par défaut)
+MICROBATCH_ENABLED = os.environ.get("MICROBATCH_ENABLED", "0").lower() in ("1", "true", "yes")
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", 64))
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get("MICROBATCH_MAX_WAIT_MS", 5))
+
+# Cache des réponses de /predict: memory (défaut), redis ou none
+PREDICTION_CACHE = os.environ.get("PREDICTION_CACHE", "memory")
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 10000))
+PREDICTION_CACHE_TTL_S = float(os.environ.get("PREDICTION_CACHE_TTL_S", 3600))
+
+# Latence de chaque requête, exposée par l'endpoint /stats
+latency_recorder = LatencyRecorder()
+
+# Métriques exposées par l'endpoint /metrics (format texte Prometheus)
+metrics_registry = MetricsRegistry()
+requests_total = metrics_registry.register(Counter(
+    "credit_scoring_requests_total", "Réponses HTTP par méthode, route et code de statut", ("method", "route", "status")
+))
+# Étapes du scoring: lookup (index SK_ID_CURR), features (extraction de la matrice), predict (probabilité)
+# ou predict_contrib (probabilité et TreeSHAP en un passage), explanation / response (construction
+# de la réponse, avec ou sans explication) et serialization (encodage JSON)
+stage_seconds = metrics_registry.register(Histogram(
+    "credit_scoring_stage_seconds", "Durée de chaque étape du scoring en secondes", ("endpoint", "stage")
+))
+
+# Vidé à chaque rechargement des artefacts
+prediction_cache = create_cache(
+    PREDICTION_CACHE,
+    max_size=PREDICTION_CACHE_SIZE,
+    ttl_s=PREDICTION_CACHE_TTL_S,
+    redis_url=os.environ.get("REDIS_URL"),
 )
 
+model_registry = ModelRegistry(MODEL_REGISTRY_PATH)
+
+# Requêtes en cours par version des artefacts (drainage de l'ancienne version après une activation)
+in_flight = InFlightTracker()
+
+# État de la dernière activation de version du modèle, exposé par GET /models
+model_activation = {"version": None, "state": "idle", "error": None, "drained": None}
+_activation_lock = threading.Lock()
+
+# Comparaison du modèle candidat (shadow / A/B) avec le modèle actif, exposée par GET /shadow
+shadow_stats = ShadowStats()
+shadow_config = {"ab_percent": AB_TRAFFIC_PERCENT}
+
+# Opérations d'administration partagées par les workers gunicorn (créé dans le maître, hérité par fork):
+# version active, compteurs de /reload et /policy/reload, modèle candidat
+worker_state = SharedState({
+    "version": None,
+    "reload": 0,
+    "policy": 0,
+    "candidate": {"version": SHADOW_MODEL_VERSION, "ab_percent": AB_TRAFFIC_PERCENT} if SHADOW_MODEL_VERSION else None,
+})
+# État appliqué par ce processus (génération de l'état partagé lue en dernier)
+_applied_state = {"generation": 0, "state": dict(worker_state.initial)}
+_sync_lock = threading.Lock()
+
+# Les threads sont créés à la première tâche, donc après le fork des workers
+inference_pool = InferencePool(INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE, metrics_registry.register(Histogram(
+    "credit_scoring_inference_pool_wait_seconds", "Attente des tâches dans la file du pool d'inférence en secondes",
+)))
+
 # Fonction pour charger le DataFrame
 def load_dataframe():
     try:
@@ -45,185 +183,1159 @@ def load_dataframe():
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Fichier df_test_reduit.csv introuvable.")
             
-        logger.info(f"Chargement du fichier: {file_path}")
+        logger.info("Chargement du fichier: %s", file_path)
         return pd.read_csv(file_path)
     except Exception as e:
-        logger.error(f"Erreur lors du chargement du DataFrame: {str(e)}")
+        logger.error("Erreur lors du chargement du DataFrame: %s", e)
         raise
 
-# Fonction pour charger le modèle
-def load_model():
+# Politique de décision: fichier de DECISION_POLICY_PATH, sinon celle livrée avec la version du modèle,
+# sinon LGBM_TTS.policy.json à côté du modèle
+def load_policy(version_policy_path=None):
+    return load_decision_policy(DECISION_POLICY_PATH or version_policy_path)
+
+# Modèle d'une version du registre, ou LGBM_TTS.pkl pour la version "legacy".
+# Retourne (modèle, identifiant de version, politique livrée avec la version ou None).
+def load_model_version(version=None):
+    if version is None:
+        version = MODEL_VERSION or ("latest" if model_registry.versions() else LEGACY_VERSION)
+    if version == LEGACY_VERSION:
+        return load_model(), LEGACY_VERSION, None
+
     try:
-        # Chemin absolu basé sur le répertoire courant
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_dir, 'LGBM_TTS.pkl')
-        
-        # Si le fichier n'est pas à cet emplacement, essayons d'autres emplacements
-        if not os.path.exists(model_path):
-            model_path = os.path.join(os.path.dirname(base_dir), 'LGBM_TTS.pkl')
-        
-        if not os.path.exists(model_path):
-            # Dernier recours: chercher partout dans le répertoire courant et ses sous-dossiers
-            for root, dirs, files in os.walk(os.path.dirname(base_dir)):
-                if 'LGBM_TTS.pkl' in files:
-                    model_path = os.path.join(root, 'LGBM_TTS.pkl')
-                    break
-        
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Fichier modèle LGBM_TTS.pkl introuvable.")
-            
-        logger.info(f"Chargement du modèle: {model_path}")
-        return joblib.load(model_path)
+        model_version = model_registry.get(version)
+    except KeyError:
+        raise ValueError(f"Version du modèle inconnue: {version}")
+    logger.info("Chargement du modèle %s: %s", model_version.version, model_version.path)
+    return ModelRegistry.load(model_version), model_version.version, model_version.policy_path
+
+# Artefacts partagés par toutes les requêtes: chargés une seule fois, puis remplacés d'un bloc au rechargement
+@dataclass(frozen=True)
+class Artifacts:
+    store: FeatureStore
+    model: object
+    predictor: object
+    explainer: object
+    reference_stats: ReferenceStats
+    decision: CompiledPolicy
+    drift: DriftMonitor
+    similarity: SimilarityIndex
+    distribution: ScoreDistribution
+    projection: FeatureProjection
+    model_version: str
+    model_fingerprint: str
+    loaded_at: float
+    # Politique de décision livrée avec la version du modèle (relue par /policy/reload)
+    version_policy_path: str = None
+    load_durations: dict = field(default_factory=dict)
+
+# Magasin de features: format binaire projeté en mémoire si FEATURE_STORE_PATH est défini, sinon le CSV
+def load_feature_store(model):
+    store_path = os.environ.get("FEATURE_STORE_PATH")
+    if store_path:
+        logger.info("Chargement du magasin de features binaire: %s", store_path)
+        store = FeatureStore.load(store_path)
+        # Magasin réduit à la conversion (feature_store.py --model): colonnes déjà dans l'ordre du modèle
+        if store.model_feature_names is not None:
+            return store
+        feature_order = model_feature_order(model, store.feature_names)
+        return store.reorder(feature_order) if feature_order else store
+
+    df = load_dataframe()
+    return FeatureStore.from_dataframe(df, model_feature_order(model, df.columns))
+
+# Magasin réduit aux features lues par les arbres et à la feature de segmentation de la politique, et
+# correspondance avec l'ordre du modèle (`model_feature_names`). Magasin inchangé et None si toutes les
+# features sont utilisées ou si le modèle n'est pas un modèle LightGBM. Un magasin déjà réduit (à la
+# conversion, ou pour le modèle actif dans le cas d'un candidat) est réutilisé s'il contient toutes les
+# features lues par le modèle; une feature de segmentation absente donne le seuil par défaut.
+def prune_feature_store(store, model, model_feature_names, policy):
+    used = used_feature_indices(model)
+    pruned = store.n_features != len(model_feature_names)
+    if used is None:
+        if pruned:
+            raise ValueError("Le magasin est réduit aux features d'un autre modèle et les features lues par ce modèle sont inconnues.")
+        return store, None
+
+    kept = set(used.tolist())
+    if policy.segment_feature in model_feature_names:
+        kept.add(model_feature_names.index(policy.segment_feature))
+    feature_names = [model_feature_names[i] for i in sorted(kept)]
+
+    if pruned:
+        missing = [model_feature_names[i] for i in used.tolist() if model_feature_names[i] not in store.column_index]
+        if missing:
+            raise ValueError(f"Features utilisées par le modèle absentes du magasin réduit: {missing[:10]}")
+        return store, FeatureProjection(model_feature_names, store.feature_names)
+    if len(feature_names) == len(model_feature_names):
+        return store, None
+    return store.reorder(feature_names), FeatureProjection(model_feature_names, feature_names)
+
+# Taille de la matrice du magasin et mémoire économisée par rapport à la matrice complète du modèle
+def feature_store_summary(artifacts):
+    store = artifacts.store
+    n_model_features = artifacts.projection.n_model_features if artifacts.projection else store.n_features
+    full_bytes = len(store) * n_model_features * store.matrix.itemsize
+    return {
+        "n_clients": len(store),
+        "n_features": store.n_features,
+        "n_model_features": n_model_features,
+        "bytes": store.matrix.nbytes,
+        "mapped": store.mapped,
+        "saved_bytes": full_bytes - store.matrix.nbytes,
+    }
+
+# Empreinte du modèle (contenu des arbres LightGBM); un identifiant unique par chargement à défaut
+def model_fingerprint(model):
+    try:
+        model_string = model.booster_.model_to_string()
+        if isinstance(model_string, str):
+            return hashlib.sha256(model_string.encode("utf-8")).hexdigest()[:16]
+    except Exception:
+        pass
+    return uuid.uuid4().hex[:16]
+
+# Importance globale des features du modèle, ou None si elle n'est pas exploitable
+def model_feature_importances(model, n_features):
+    try:
+        importances = np.asarray(model.feature_importances_, dtype=np.float64)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if importances.shape != (n_features,):
+        logger.warning("Importance des features ignorée: %d valeurs pour %d features", importances.size, n_features)
+        return None
+    return importances
+
+# Charge le modèle et les données et mesure le temps de chaque étape; `base` réutilise le magasin
+# de features d'artefacts déjà chargés (modèle candidat), `previous` fournit les scores des clients
+# inchangés. `before_fork`: chargement dans le processus maître, sans aucune prédiction (le pool de
+# threads OpenMP de LightGBM ne survit pas au fork); les workers scorent le portefeuille après le fork.
+def load_artifacts(version=None, warm_up=False, base=None, previous=None, before_fork=False):
+    start = time.perf_counter()
+    model, model_version, version_policy_path = load_model_version(version)
+    policy = load_policy(version_policy_path)
+    model_done = time.perf_counter()
+
+    if base is None:
+        store = load_feature_store(model)
+        model_feature_names = store.model_feature_names or store.feature_names
+    else:
+        store = base.store
+        model_feature_names = base.projection.model_feature_names if base.projection else store.feature_names
+    n_features = getattr(model, "n_features_in_", None)
+    if isinstance(n_features, (int, np.integer)) and n_features != len(model_feature_names):
+        raise ValueError(f"Le modèle attend {n_features} features, les données en contiennent {len(model_feature_names)}.")
+
+    # Colonnes jamais lues par les arbres retirées du magasin (mêmes prédictions, moins de mémoire). Un magasin
+    # projeté en mémoire n'est pas réduit par copie (pages privées à chaque worker): il l'est à la conversion
+    projection = None
+    if store.n_features != len(model_feature_names) or (PRUNE_FEATURES and not store.mapped):
+        store, projection = prune_feature_store(store, model, model_feature_names, policy)
+    elif PRUNE_FEATURES:
+        logger.info("Magasin projeté en mémoire conservé complet (réduction à la conversion: feature_store.py --model)")
+    store_done = time.perf_counter()
+
+    # Moteur d'inférence (export des arbres pour le moteur numpy)
+    predictor = create_predictor(model, INFERENCE_ENGINE)
+    explainer = create_explainer(model, EXPLANATION_METHOD)
+    predictor_done = time.perf_counter()
+
+    # Moyennes et classement des features, calculés une fois pour toutes les requêtes
+    importances = model_feature_importances(model, len(model_feature_names))
+    if importances is not None and projection is not None:
+        importances = importances[projection.positions]
+    reference_stats = ReferenceStats.compute(store, importances)
+    stats_done = time.perf_counter()
+
+    # Seuil de décision de chaque client, précalculé
+    decision = policy.compile(store)
+    policy_done = time.perf_counter()
+
+    # Distribution de référence des features pour la surveillance de la dérive
+    drift = DriftMonitor(DriftReference.compute(store))
+    drift_done = time.perf_counter()
+
+    # Index des plus proches voisins sur les features les plus importantes, standardisées
+    similarity = SimilarityIndex.build(store, reference_stats.importance)
+    similarity_done = time.perf_counter()
+
+    load_durations = {
+        "model_s": model_done - start,
+        "feature_store_s": store_done - model_done,
+        "predictor_s": predictor_done - store_done,
+        "reference_stats_s": stats_done - predictor_done,
+        "policy_s": policy_done - stats_done,
+        "drift_reference_s": drift_done - policy_done,
+        "similarity_index_s": similarity_done - drift_done,
+    }
+    artifacts = Artifacts(
+        store=store,
+        model=model,
+        predictor=predictor,
+        explainer=explainer,
+        reference_stats=reference_stats,
+        decision=decision,
+        drift=drift,
+        similarity=similarity,
+        distribution=ScoreDistribution(),
+        projection=projection,
+        model_version=model_version,
+        model_fingerprint=model_fingerprint(model),
+        loaded_at=time.time(),
+        version_policy_path=version_policy_path,
+        load_durations=load_durations,
+    )
+
+    # Probabilités de tous les clients, triées: rang centile et distribution du portefeuille
+    if not before_fork:
+        score_population(artifacts, previous)
+    population_done = time.perf_counter()
+    load_durations["population_scores_s"] = population_done - similarity_done
+
+    # Préchauffage avant la mise en service: premières prédictions (allocation, pages du magasin, threads)
+    if warm_up and not before_fork:
+        warm_up_artifacts(artifacts)
+        load_durations["warmup_s"] = time.perf_counter() - population_done
+    load_durations["total_s"] = time.perf_counter() - start
+
+    feature_store = feature_store_summary(artifacts)
+    logger.info(
+        "Artefacts chargés en %.3fs (modèle %s, %d clients, %d features sur %d, %.1f Mo économisés)",
+        load_durations["total_s"], model_version, len(store), feature_store["n_features"],
+        feature_store["n_model_features"], feature_store["saved_bytes"] / 1e6,
+        extra={"load_durations": load_durations, "n_clients": len(store), "model_version": model_version,
+               "feature_store": feature_store},
+    )
+    return artifacts
+
+# Scores de tous les clients du magasin (distribution du portefeuille); ceux des lignes inchangées sont repris
+# des artefacts `previous` s'ils ont été calculés avec le même modèle sur les mêmes colonnes. En cas d'erreur,
+# les artefacts restent utilisables, sans rang centile ni /distribution.
+def score_population(artifacts, previous=None):
+    reusable = (
+        previous is not None and previous.model_fingerprint == artifacts.model_fingerprint
+        and previous.store.feature_names == artifacts.store.feature_names
+    )
+    try:
+        distribution = artifacts.distribution.compute(
+            lambda features: artifacts.predictor.predict(model_input(artifacts, features)),
+            artifacts.store, previous.distribution if reusable else None,
+        )
     except Exception as e:
-        logger.error(f"Erreur lors du chargement du modèle: {str(e)}")
+        logger.error("Erreur lors du scoring du portefeuille (modèle %s): %s", artifacts.model_version, e)
+        return
+    logger.info(
+        "Portefeuille scoré: %d clients, dont %d rescorés (modèle %s)",
+        len(distribution), distribution.n_rescored, artifacts.model_version,
+    )
+
+# Scoring du portefeuille dans un worker issu du fork, en arrière-plan: le worker sert dès son démarrage
+# (sans rang centile jusqu'à la fin du calcul)
+def score_population_in_background(target_app):
+    def run():
+        for artifacts in (target_app.state.artifacts, getattr(target_app.state, "candidate", None)):
+            if artifacts is not None and not artifacts.distribution.ready:
+                score_population(artifacts)
+        # Réponses sans rang centile, qui ne sont plus lues (clé de cache différente): place libérée
+        if prediction_cache is not None:
+            prediction_cache.clear()
+
+    threading.Thread(target=run, name="population-scores", daemon=True).start()
+
+# Scores quelques clients par les mêmes chemins que les requêtes (unitaire, lot, explication)
+def warm_up_artifacts(artifacts):
+    sk_ids = artifacts.store.ids[:WARMUP_ROWS].tolist()
+    if not sk_ids:
+        return
+    score_client(artifacts, sk_ids[0], explain=True)
+    score_batch(artifacts, sk_ids, explain=False)
+
+# Un seul rechargement à la fois; les requêtes en cours gardent leur référence aux anciens artefacts
+_reload_lock = threading.Lock()
+
+# Recharge la version `version` du modèle (par défaut la version active) avec les données et la politique
+def reload_artifacts(target_app, version=None, warm_up=False, before_fork=False):
+    with _reload_lock:
+        current = getattr(target_app.state, "artifacts", None)
+        if version is None and current is not None:
+            version = current.model_version
+        artifacts = load_artifacts(version, warm_up, previous=current, before_fork=before_fork)
+        # Remplacement atomique: une simple réaffectation de référence
+        target_app.state.artifacts = artifacts
+        # Le candidat partage le magasin de features et la projection du modèle actif: reconstruit sur les
+        # nouveaux artefacts, sinon retiré
+        rebuild_candidate(target_app, artifacts, before_fork)
+        # Les réponses en cache ont été calculées avec les anciens artefacts
+        if prediction_cache is not None:
+            prediction_cache.clear()
+    return artifacts
+
+# Recharge le modèle candidat actif sur les artefacts `base` du nouveau modèle actif, avec la même part du
+# trafic; en cas d'erreur, le candidat est retiré et seul le modèle actif est servi
+def rebuild_candidate(target_app, base, before_fork=False):
+    candidate = getattr(target_app.state, "candidate", None)
+    if candidate is None:
+        return
+    try:
+        target_app.state.candidate = load_artifacts(
+            candidate.model_version, warm_up=True, base=base, previous=candidate, before_fork=before_fork,
+        )
+    except Exception as e:
+        logger.error("Erreur lors du rechargement du modèle candidat %s, retiré: %s", candidate.model_version, e)
+        target_app.state.candidate = None
+    # Comparaisons précédentes faites avec l'ancien modèle actif
+    shadow_stats.reset()
+
+# Charge et préchauffe `version` pendant que l'ancienne version continue de servir, l'active,
+# puis attend la fin des requêtes en cours sur l'ancienne version
+def activate_model_version(target_app, version):
+    try:
+        model_activation.update(version=version, state="loading", error=None, drained=None)
+        previous = getattr(target_app.state, "artifacts", None)
+        artifacts = reload_artifacts(target_app, version, warm_up=True)
+        publish_admin_change(version=artifacts.model_version)
+        model_activation.update(version=artifacts.model_version, state="draining")
+
+        drained = previous is None or in_flight.wait_idle(previous, DRAIN_TIMEOUT_S)
+        if not drained:
+            logger.warning(
+                "%d requêtes encore en cours sur le modèle %s après %.0fs",
+                in_flight.count(previous), previous.model_version, DRAIN_TIMEOUT_S,
+            )
+        model_activation.update(state="active", drained=drained)
+        logger.info("Modèle %s actif", artifacts.model_version)
+        return artifacts
+    except Exception as e:
+        logger.error("Erreur lors de l'activation du modèle %s: %s", version, e)
+        model_activation.update(state="failed", error=str(e))
         raise
+    finally:
+        _activation_lock.release()
+
+# Rechargement de la seule politique de décision, sans recharger le modèle ni les données
+def reload_policy(target_app):
+    with _reload_lock:
+        current = target_app.state.artifacts
+        if current is None:
+            raise RuntimeError("Les artefacts ne sont pas chargés.")
+        policy = load_policy(current.version_policy_path)
+        artifacts = dataclasses.replace(current, decision=policy.compile(current.store))
+        target_app.state.artifacts = artifacts
+        # Les décisions en cache ont été prises avec l'ancienne politique
+        if prediction_cache is not None:
+            prediction_cache.clear()
+    return artifacts
+
+# Charge le modèle candidat `version` sur le magasin de features actif et remet à zéro la comparaison
+def load_candidate(target_app, version, ab_percent=0.0, before_fork=False):
+    current = getattr(target_app.state, "artifacts", None)
+    if current is None:
+        raise RuntimeError("Les artefacts ne sont pas chargés.")
+    previous = getattr(target_app.state, "candidate", None)
+    candidate = load_artifacts(version, warm_up=True, base=current, previous=previous, before_fork=before_fork)
+    target_app.state.candidate = candidate
+    shadow_config["ab_percent"] = ab_percent
+    shadow_stats.reset()
+    logger.info("Modèle candidat %s chargé (%.1f %% du trafic)", candidate.model_version, ab_percent)
+    return candidate
+
+# Publie une opération d'administration appliquée par ce worker, pour qu'elle le soit aussi par les autres
+# (`increment`: compteurs d'opérations sans paramètre, comme /reload)
+def publish_admin_change(increment=(), **changes):
+    with _sync_lock:
+        state = worker_state.update(increment, **changes)
+        for key in (*increment, *changes):
+            _applied_state["state"][key] = state[key]
+
+# Applique les opérations d'administration publiées par les autres workers depuis la dernière vérification.
+# Une opération en échec est journalisée et n'est pas retentée (les artefacts précédents restent actifs).
+def sync_worker(target_app):
+    with _sync_lock:
+        generation, state = worker_state.read()
+        if generation == _applied_state["generation"]:
+            return False
+        applied = _applied_state["state"]
+        try:
+            # Le rechargement complet relit aussi la politique de décision
+            if state["version"] != applied["version"] or state["reload"] != applied["reload"]:
+                logger.info("Rechargement publié par un autre worker (modèle %s)", state["version"] or "par défaut")
+                reload_artifacts(target_app, state["version"], warm_up=True)
+            elif state["policy"] != applied["policy"]:
+                logger.info("Rechargement de la politique de décision publié par un autre worker")
+                reload_policy(target_app)
+        except Exception as e:
+            logger.error("Erreur lors de l'application du rechargement publié: %s", e)
+        try:
+            if state["candidate"] != applied["candidate"]:
+                if state["candidate"] is None:
+                    target_app.state.candidate = None
+                else:
+                    load_candidate(target_app, state["candidate"]["version"], state["candidate"]["ab_percent"])
+        except Exception as e:
+            logger.error("Erreur lors du chargement du modèle candidat publié: %s", e)
+        _applied_state.update(generation=generation, state=state)
+        return True
+
+# Vérification périodique des opérations publiées, dans un thread de chaque worker issu du fork
+def watch_admin_changes(target_app, interval_s=WORKER_SYNC_INTERVAL_S):
+    def run():
+        while True:
+            time.sleep(interval_s)
+            try:
+                sync_worker(target_app)
+            except Exception as e:
+                logger.error("Erreur lors de la synchronisation avec les autres workers: %s", e)
+
+    threading.Thread(target=run, name="worker-sync", daemon=True).start()
+
+# Chargement avant le fork des workers (mode multi-processus, voir gunicorn.conf.py)
+def preload_artifacts(target_app):
+    reload_artifacts(target_app, before_fork=True)
+    if SHADOW_MODEL_VERSION:
+        load_candidate(target_app, SHADOW_MODEL_VERSION, AB_TRAFFIC_PERCENT, before_fork=True)
+    target_app.state.preloaded = True
+
+@asynccontextmanager
+async def lifespan(app):
+    # Artefacts déjà chargés par le processus maître et hérités par fork; portefeuille scoré dans le worker,
+    # opérations d'administration reçues par les autres workers appliquées au fil de l'eau
+    if getattr(app.state, "preloaded", False):
+        score_population_in_background(app)
+        watch_admin_changes(app)
+        yield
+        return
+
+    app.state.artifacts = None
+    app.state.candidate = None
+    try:
+        reload_artifacts(app)
+    except Exception as e:
+        # L'API démarre quand même: /predict répondra 503 jusqu'à un rechargement réussi
+        logger.error("Erreur lors du chargement des artefacts au démarrage: %s", e)
+    if SHADOW_MODEL_VERSION and app.state.artifacts is not None:
+        try:
+            load_candidate(app, SHADOW_MODEL_VERSION, AB_TRAFFIC_PERCENT)
+        except Exception as e:
+            # Sans candidat, seul le modèle actif est servi
+            logger.error("Erreur lors du chargement du modèle candidat %s: %s", SHADOW_MODEL_VERSION, e)
+    yield
+
+# Init API FastAPI
+app = FastAPI(lifespan=lifespan)
+
+# Ajout de CORS pour permettre les requêtes cross-origin
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Mesure de la latence de chaque requête et comptage des réponses par code de statut
+app.add_middleware(LatencyMiddleware, recorder=latency_recorder, requests_total=requests_total)
+
+# Identifiant de requête (X-Request-ID) et journal d'accès JSON avec la durée; ajouté en dernier pour
+# envelopper les autres middlewares
+app.add_middleware(RequestLoggingMiddleware)
+
+# Jauges lues au moment de l'exposition (aucun coût sur le chemin des requêtes)
+def artifact_load_samples():
+    artifacts = getattr(app.state, "artifacts", None)
+    if artifacts is None:
+        return []
+    return [({"step": step.removesuffix("_s")}, duration) for step, duration in artifacts.load_durations.items()]
+
+# Une jauge par clé des statistiques; une clé absente ou None (valeur non suivie par le backend, comme la
+# taille du cache Redis) ne donne aucun échantillon
+def register_stats_gauges(prefix, documentation, get_stats, keys):
+    for key in keys:
+        def samples(key=key):
+            stats = get_stats()
+            value = stats.get(key) if stats is not None else None
+            return [({}, value)] if value is not None else []
+        metrics_registry.register(Gauge(f"{prefix}_{key}", f"{documentation}: {key}", callback=samples))
+
+metrics_registry.register(Gauge(
+    "credit_scoring_artifact_load_seconds", "Durée de chargement des artefacts actifs par étape",
+    ("step",), callback=artifact_load_samples,
+))
+metrics_registry.register(Gauge(
+    "credit_scoring_artifacts_clients", "Nombre de clients du magasin de features actif",
+    callback=lambda: [({}, len(app.state.artifacts.store))] if getattr(app.state, "artifacts", None) else [],
+))
+metrics_registry.register(Gauge(
+    "credit_scoring_model_info", "Version du modèle actif", ("version", "fingerprint"),
+    callback=lambda: [
+        ({"version": app.state.artifacts.model_version, "fingerprint": app.state.artifacts.model_fingerprint}, 1)
+    ] if getattr(app.state, "artifacts", None) else [],
+))
+metrics_registry.register(Gauge(
+    "credit_scoring_drift_observations", "Clients comptés par la surveillance de la dérive depuis le chargement",
+    callback=lambda: [({}, app.state.artifacts.drift.n_observed)] if getattr(app.state, "artifacts", None) else [],
+))
+register_stats_gauges(
+    "credit_scoring_inference_pool", "Pool d'inférence", inference_pool.stats,
+    ("max_workers", "max_queue", "in_flight", "running", "queue_depth", "rejected", "completed"),
+)
+register_stats_gauges(
+    "credit_scoring_cache", "Cache des prédictions",
+    lambda: prediction_cache.stats() if prediction_cache is not None else None,
+    ("size", "hits", "misses", "evictions"),
+)
+
+# Réponse encodée immédiatement (sans passer par jsonable_encoder), avec mesure de l'encodage: JSON par orjson
+# (tableaux NumPy encodés directement), ou MessagePack si l'en-tête Accept le demande
+def json_response(content, endpoint, accept=None):
+    with stage_seconds.time(endpoint=endpoint, stage="serialization"):
+        return response_class(accept)(content)
+
+# Artefacts actifs, ou 503 s'ils n'ont pas pu être chargés. La requête est comptée sur cette version
+# jusqu'à sa fin (drainage après une activation).
+async def get_artifacts(request: Request):
+    artifacts = getattr(request.app.state, "artifacts", None)
+    if artifacts is None:
+        raise HTTPException(status_code=503, detail="Les artefacts (données et modèle) ne sont pas chargés.")
+    in_flight.acquire(artifacts)
+    try:
+        yield artifacts
+    finally:
+        in_flight.release(artifacts)
+
+# Protection des endpoints d'administration lorsque ADMIN_TOKEN est défini
+def require_admin(x_admin_token: str = Header(None)):
+    expected = os.environ.get("ADMIN_TOKEN")
+    if expected and x_admin_token != expected:
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide.")
+
+# Options d'explication d'une requête: explain=none|top_k|full (true/false acceptés) et k contributions
+def explain_query(default):
+    def explain_options(explain: str = Query(default, description="none, top_k ou full"),
+                        k: int = Query(WATERFALL_TOP_K, ge=1, le=MAX_TOP_K)):
+        try:
+            return ExplainOptions.parse(explain, k)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    return explain_options
 
 # Structure attendue par l'API
 class InputData(BaseModel):
     SK_ID_CURR: int
 
+class BatchInputData(BaseModel):
+    SK_ID_CURR: List[int]
+
 @app.get("/")
 def home():
     return {"message": "API de scoring crédit connectée !"}
 
-@app.post("/predict")
-async def predict_api(data: InputData):
+@app.post("/reload", dependencies=[Depends(require_admin)])
+def reload_api(request: Request):
     try:
-        logger.debug(f"Requête reçue: {data}")
-        
-        # Chargement du DataFrame
-        df_test_reduit = load_dataframe()
+        artifacts = reload_artifacts(request.app)
+    except Exception as e:
+        logger.error("Erreur lors du rechargement des artefacts: %s", e)
+        raise HTTPException(status_code=500, detail=f"Rechargement impossible, les artefacts précédents restent actifs: {str(e)}")
+    publish_admin_change(increment=("reload",))
+    return {"message": "Artefacts rechargés", "model_version": artifacts.model_version, "load_durations": artifacts.load_durations}
 
-        if 'SK_ID_CURR' not in df_test_reduit.columns:
-            raise HTTPException(status_code=400, detail="La colonne 'SK_ID_CURR' est manquante dans df_test_reduit.csv.")
-        
-        individual = df_test_reduit[df_test_reduit['SK_ID_CURR'] == data.SK_ID_CURR]
-        logger.debug(f"Individu trouvé: {not individual.empty}")
+@app.get("/models")
+def models_api(request: Request):
+    artifacts = getattr(request.app.state, "artifacts", None)
+    active = artifacts.model_version if artifacts else None
+    versions = [{**version.describe(), "active": version.version == active} for version in model_registry.versions()]
+    versions.append({"version": LEGACY_VERSION, "source": "legacy", "active": active == LEGACY_VERSION})
+    return {
+        "active": active,
+        "registry": MODEL_REGISTRY_PATH,
+        "versions": versions,
+        "activation": dict(model_activation),
+    }
 
-        if individual.empty:
-            raise HTTPException(status_code=404, detail=f"Identifiant {data.SK_ID_CURR} non trouvé dans le DataFrame")
+@app.post("/models/{version}/activate", dependencies=[Depends(require_admin)])
+def activate_model_api(version: str, request: Request, wait: bool = False):
+    if version != LEGACY_VERSION:
+        try:
+            model_registry.get(version)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Version du modèle inconnue: {version}")
+    if not _activation_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Une activation est déjà en cours.")
 
-        # Extrait les features
-        features = individual.drop('SK_ID_CURR', axis=1)
-        logger.debug(f"Shape des features avant prédiction: {features.shape}")
-        
-        # Chargement du modèle
-        model = load_model()
-        
-        # Faire la prédiction
-        prediction_proba = model.predict_proba(features)[:, 1][0]
-        logger.debug(f"Probabilité de défaut: {prediction_proba}")
-        
-        # Utiliser le seuil optimal déterminé lors de l'entraînement
-        threshold = 0.5  # à remplacer par votre seuil métier optimisé
-        prediction = 1 if prediction_proba > threshold else 0
-        
-        # Extraction de l'importance des features
-        feature_importance_data = {}
+    # Le verrou d'activation est libéré par activate_model_version
+    if not wait:
+        threading.Thread(target=activate_model_version, args=(request.app, version), daemon=True, name="model-activation").start()
+        return JSONResponse({"message": "Activation lancée", "activation": dict(model_activation)}, status_code=202)
+    try:
+        artifacts = activate_model_version(request.app, version)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Activation impossible, le modèle précédent reste actif: {str(e)}")
+    return {"message": "Modèle activé", "model_version": artifacts.model_version, "activation": dict(model_activation)}
+
+@app.post("/policy/reload", dependencies=[Depends(require_admin)])
+def reload_policy_api(request: Request):
+    try:
+        artifacts = reload_policy(request.app)
+    except Exception as e:
+        logger.error("Erreur lors du rechargement de la politique de décision: %s", e)
+        raise HTTPException(status_code=500, detail=f"Rechargement impossible, la politique précédente reste active: {str(e)}")
+    publish_admin_change(increment=("policy",))
+    return {"message": "Politique de décision rechargée", "policy": artifacts.decision.policy.describe()}
+
+@app.get("/shadow")
+def shadow_api(request: Request):
+    candidate = getattr(request.app.state, "candidate", None)
+    artifacts = getattr(request.app.state, "artifacts", None)
+    return {
+        "primary": artifacts.model_version if artifacts else None,
+        "candidate": candidate.model_version if candidate else None,
+        "ab_percent": shadow_config["ab_percent"] if candidate else 0.0,
+        "stats": shadow_stats.summary(),
+    }
+
+@app.post("/shadow/{version}", dependencies=[Depends(require_admin)])
+def load_candidate_api(version: str, request: Request, ab_percent: float = Query(0.0, ge=0.0, le=100.0)):
+    if version != LEGACY_VERSION:
         try:
-            # Pour LightGBM, l'importance des features est disponible dans feature_importances_
-            feature_importance = model.feature_importances_
-            
-            # Obtention des noms des features
-            feature_names = features.columns.tolist()
-            
-            # Création d'un dictionnaire {feature_name: importance}
-            feature_importance_dict = dict(zip(feature_names, feature_importance))
-            
-            # Tri des features par importance décroissante
-            sorted_feature_importance = sorted(
-                feature_importance_dict.items(), 
-                key=lambda x: x[1], 
-                reverse=True
+            model_registry.get(version)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Version du modèle inconnue: {version}")
+    try:
+        candidate = load_candidate(request.app, version, ab_percent)
+    except Exception as e:
+        logger.error("Erreur lors du chargement du modèle candidat %s: %s", version, e)
+        raise HTTPException(status_code=500, detail=f"Chargement du modèle candidat impossible: {str(e)}")
+    publish_admin_change(candidate={"version": candidate.model_version, "ab_percent": ab_percent})
+    return {"message": "Modèle candidat chargé", "candidate": candidate.model_version, "ab_percent": ab_percent}
+
+@app.delete("/shadow", dependencies=[Depends(require_admin)])
+def unload_candidate_api(request: Request):
+    request.app.state.candidate = None
+    publish_admin_change(candidate=None)
+    return {"message": "Modèle candidat retiré", "stats": shadow_stats.summary()}
+
+@app.get("/drift")
+def drift_api(top: int = Query(10, ge=1, le=1000), artifacts: Artifacts = Depends(get_artifacts)):
+    return {"model_version": artifacts.model_version, **artifacts.drift.report(top)}
+
+@app.get("/clients/{sk_id}/similar")
+async def similar_clients_api(sk_id: int, request: Request, k: int = Query(10, ge=1, le=MAX_NEIGHBORS),
+                              artifacts: Artifacts = Depends(get_artifacts)):
+    result = await run_inference(find_similar_clients, artifacts, sk_id, k)
+    return json_response(result, "similar", request.headers.get("accept"))
+
+@app.get("/distribution")
+def distribution_api(request: Request, bins: int = Query(DEFAULT_BINS, ge=1, le=1000),
+                     artifacts: Artifacts = Depends(get_artifacts)):
+    if not artifacts.distribution.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Distribution des scores en cours de calcul, veuillez réessayer plus tard.",
+            headers={"Retry-After": str(RETRY_AFTER_S)},
+        )
+    content = {"model_version": artifacts.model_version, **artifacts.distribution.summary(bins)}
+    return json_response(content, "distribution", request.headers.get("accept"))
+
+@app.get("/stats")
+def stats_api(request: Request):
+    artifacts = getattr(request.app.state, "artifacts", None)
+    return {
+        "artifacts_loaded": artifacts is not None,
+        "loaded_at": artifacts.loaded_at if artifacts else None,
+        "load_durations": artifacts.load_durations if artifacts else None,
+        "feature_store": feature_store_summary(artifacts) if artifacts else None,
+        "score_distribution": {
+            "ready": artifacts.distribution.ready,
+            "n_clients": len(artifacts.distribution),
+            "n_rescored": artifacts.distribution.n_rescored,
+        } if artifacts else None,
+        "latency": latency_recorder.summary(),
+        "inference_pool": inference_pool.stats(),
+        "micro_batching": micro_batcher.stats() if micro_batcher else None,
+        "cache": prediction_cache.stats() if prediction_cache is not None else None,
+        "model_version": artifacts.model_version if artifacts else None,
+        "model_fingerprint": artifacts.model_fingerprint if artifacts else None,
+        "decision_policy": artifacts.decision.policy.describe() if artifacts else None,
+        "inference_engine": artifacts.predictor.engine if artifacts else None,
+        "explanation_method": (artifacts.explainer.method if artifacts.explainer else "heuristic") if artifacts else None,
+    }
+
+@app.get("/metrics")
+def metrics_api():
+    return Response(metrics_registry.render(), media_type=metrics_registry.content_type)
+
+# Entrée du modèle pour des lignes du magasin: replacées dans l'ordre complet du modèle si le magasin est réduit
+def model_input(artifacts, features):
+    if artifacts.projection is None:
+        return features
+    return artifacts.projection.expand(features)
+
+# Probabilités de défaut pour une matrice de features et, si demandé, contributions TreeSHAP
+# calculées dans le même passage (None pour l'explication heuristique)
+def predict_rows(artifacts, features, explain, endpoint="predict"):
+    if explain and artifacts.explainer is not None:
+        with stage_seconds.time(endpoint=endpoint, stage="predict_contrib"):
+            probas, contributions, base_values = artifacts.explainer.explain(model_input(artifacts, features))
+            # Contributions des colonnes du magasin (celles des features retirées sont nulles)
+            if artifacts.projection is not None:
+                contributions = artifacts.projection.project(contributions)
+            return probas, contributions, base_values
+    with stage_seconds.time(endpoint=endpoint, stage="predict"):
+        return artifacts.predictor.predict(model_input(artifacts, features)), None, None
+
+# Waterfall des k principales contributions d'un client (tableaux NumPy, encodés tels quels dans la réponse)
+def client_waterfall(artifacts, client_features, prediction, contributions=None, base_value=None, k=WATERFALL_TOP_K):
+    store = artifacts.store
+    if contributions is not None:
+        # Contributions TreeSHAP du client (en log-odds), à partir de l'espérance du modèle
+        indices, values = top_contributions(contributions, k)
+        return {
+            "feature_names": [store.feature_names[i] for i in indices[0]],
+            "contribution_values": values[0],
+            "base_value": base_value,
+            "method": "shap"
+        }
+
+    # Pour les modèles sans TreeSHAP, nous simulons l'impact positif/négatif
+    # des principales features en fonction de leur valeur par rapport à la moyenne
+    stats = artifacts.reference_stats
+    top_features = stats.top_features(k)
+    heuristic = heuristic_contributions(
+        client_features[top_features], stats.means[top_features], stats.importance[top_features], prediction
+    )
+
+    # Trier par valeur absolue de contribution
+    order = np.argsort(-np.abs(heuristic), kind='stable')
+
+    return {
+        "feature_names": [store.feature_names[top_features[i]] for i in order],
+        "contribution_values": heuristic[order],
+        "base_value": 0.5,  # Valeur de base
+        "method": "heuristic"
+    }
+
+# Importance globale et waterfall des contributions d'un client
+def explain_client(artifacts, client_features, prediction, contributions=None, base_value=None, k=WATERFALL_TOP_K):
+    store = artifacts.store
+
+    # Extraction de l'importance des features
+    feature_importance_data = {}
+    try:
+        # Importance globale et classement des features précalculés au chargement
+        stats = artifacts.reference_stats
+
+        # Extraction des 10 features les plus importantes
+        top_features = stats.top_features(WATERFALL_TOP_K)
+
+        feature_importance_data = {
+            "feature_names": [store.feature_names[i] for i in top_features],
+            "importance_values": stats.importance[top_features]
+        }
+
+        # Création des données pour le waterfall chart
+        try:
+            feature_importance_data["waterfall"] = client_waterfall(
+                artifacts, client_features, prediction, contributions, base_value, k
             )
-            
-            # Extraction des 10 features les plus importantes
-            top_features = sorted_feature_importance[:10]
-            
-            feature_importance_data = {
-                "feature_names": [feature[0] for feature in top_features],
-                "importance_values": [float(feature[1]) for feature in top_features]  # Conversion en float pour sérialisation JSON
+
+        except Exception as e:
+            logger.error("Erreur lors du calcul des contributions waterfall: %s", e)
+            # Continuer même en cas d'erreur
+
+    except Exception as e:
+        logger.error("Erreur lors de l'extraction de l'importance des features: %s", e)
+        feature_importance_data = {"error": str(e)}
+
+    return feature_importance_data
+
+# Réponse de /predict pour un client dont la probabilité de défaut est connue; `row`, ligne du client
+# dans le magasin (None pour des features fournies par l'appelant)
+def build_client_response(artifacts, client_features, prediction_proba, threshold, explain=True, contributions=None,
+                          base_value=None, row=None):
+    # Seuil du segment du client, défini par la politique de décision
+    prediction = 1 if prediction_proba > threshold else 0
+
+    result = "Crédit refusé" if prediction == 1 else "Crédit accordé"
+
+    response = {
+        "prediction": prediction,
+        "resultat": result,
+        "proba": float(prediction_proba),
+        "model_version": artifacts.model_version,
+    }
+    # Rang de la probabilité dans le portefeuille (absent tant que la distribution n'est pas calculée).
+    # Client du magasin: rang de son score du portefeuille, identique quel que soit le mode d'explication
+    if row is None:
+        percentile = artifacts.distribution.percentile(prediction_proba)
+    else:
+        percentile = artifacts.distribution.percentile_of_row(row)
+    if percentile is not None:
+        response["percentile"] = percentile
+    # Explication complète (importance globale et waterfall) ou seulement les k principales contributions
+    explain = ExplainOptions.parse(explain)
+    if explain.mode == EXPLAIN_FULL:
+        response["feature_importance"] = explain_client(artifacts, client_features, prediction, contributions, base_value, explain.k)
+    elif explain:
+        response["explanation"] = client_waterfall(artifacts, client_features, prediction, contributions, base_value, explain.k)
+    return response
+
+# Prédiction et explication pour un client (exécuté dans le pool d'inférence)
+def score_client(artifacts, sk_id, explain=True):
+    # Recherche du client par l'index SK_ID_CURR -> ligne
+    with stage_seconds.time(endpoint="predict", stage="lookup"):
+        row = artifacts.store.row_of(sk_id)
+    logger.debug("Individu trouvé: %s", row is not None)
+
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Identifiant {sk_id} non trouvé dans le DataFrame")
+
+    # Extrait les features (vue 1 x n_features sur la matrice, sans copie)
+    with stage_seconds.time(endpoint="predict", stage="features"):
+        client_features = artifacts.store.matrix[row]
+        features = client_features[np.newaxis, :]
+
+    # Faire la prédiction avec le modèle chargé au démarrage
+    probas, contributions, base_values = predict_rows(artifacts, features, explain)
+    prediction_proba = probas[0]
+    logger.debug("Probabilité de défaut: %s", prediction_proba)
+
+    threshold = artifacts.decision.threshold_of_row(row)
+    with stage_seconds.time(endpoint="predict", stage="explanation" if explain else "response"):
+        if contributions is None:
+            return build_client_response(artifacts, client_features, prediction_proba, threshold, explain, row=row)
+        return build_client_response(
+            artifacts, client_features, prediction_proba, threshold, explain, contributions[0], base_values[0], row
+        )
+
+# Lignes des clients trouvés (lookup) puis copie contiguë de leurs features (features)
+def gather_features(artifacts, sk_ids, endpoint):
+    with stage_seconds.time(endpoint=endpoint, stage="lookup"):
+        rows = artifacts.store.rows_of(sk_ids)
+        found = rows >= 0
+        rows = rows[found]
+    with stage_seconds.time(endpoint=endpoint, stage="features"):
+        features = artifacts.store.matrix.take(rows, axis=0)
+    return features, found, rows
+
+# Réponses de /predict pour plusieurs clients avec une seule prédiction (micro-batching).
+# Un client inconnu donne une HTTPException 404 à la place de sa réponse.
+def score_clients(artifacts, sk_ids, explain=True):
+    features, found, rows = gather_features(artifacts, sk_ids, "predict")
+    probas, contributions, base_values = predict_rows(artifacts, features, explain) if features.shape[0] else ([], None, None)
+    thresholds = artifacts.decision.thresholds_of_rows(rows)
+
+    results = []
+    with stage_seconds.time(endpoint="predict", stage="explanation" if explain else "response"):
+        position = 0
+        for sk_id, is_found in zip(sk_ids, found.tolist()):
+            if not is_found:
+                results.append(HTTPException(status_code=404, detail=f"Identifiant {sk_id} non trouvé dans le DataFrame"))
+                continue
+            if contributions is None:
+                results.append(build_client_response(
+                    artifacts, features[position], probas[position], thresholds[position], explain, row=rows[position]
+                ))
+            else:
+                results.append(build_client_response(
+                    artifacts, features[position], probas[position], thresholds[position], explain,
+                    contributions[position], base_values[position], rows[position]
+                ))
+            position += 1
+    return results
+
+# Prédictions pour une liste de clients, dans l'ordre de la requête (exécuté dans le pool d'inférence)
+def score_batch(artifacts, sk_ids, explain=False):
+    # Les k principales contributions de chaque client (full et top_k: l'importance globale est la même pour tous)
+    explain = ExplainOptions.parse(explain)
+
+    # Un seul `take` indexé pour tous les clients trouvés, puis une seule prédiction sur la matrice
+    features, found, rows = gather_features(artifacts, sk_ids, "batch")
+    probas = np.full(len(sk_ids), np.nan)
+    contributions = base_values = None
+    if features.shape[0]:
+        probas[found], contributions, base_values = predict_rows(artifacts, features, explain, "batch")
+
+    # Décisions vectorisées avec le seuil précalculé de chaque client
+    predictions = np.zeros(len(sk_ids), dtype=bool)
+    predictions[found] = artifacts.decision.decide(probas[found], rows)
+
+    results = []
+    with stage_seconds.time(endpoint="batch", stage="explanation" if explain else "response"):
+        # Sélection vectorisée des principales contributions de chaque client
+        if contributions is not None:
+            top_indices, top_values = top_contributions(contributions, explain.k)
+
+        position = 0
+        for sk_id, is_found, proba, prediction in zip(sk_ids, found.tolist(), probas.tolist(), predictions.tolist()):
+            if not is_found:
+                results.append({"SK_ID_CURR": sk_id, "found": False, "detail": "Identifiant non trouvé dans le DataFrame"})
+                continue
+            result = {
+                "SK_ID_CURR": sk_id,
+                "found": True,
+                "prediction": int(prediction),
+                "resultat": "Crédit refusé" if prediction else "Crédit accordé",
+                "proba": proba,
             }
-            logger.debug(f"Feature importance extraite: {feature_importance_data}")
-            
-            # Création des données pour le waterfall chart
-            # Pour créer un waterfall efficace, nous simulons l'impact positif/négatif
-            # des principales features en fonction de leur valeur par rapport à la moyenne
-            try:
-                # Sélectionner les 10 features les plus importantes
-                waterfall_features = top_features[:10]
-                
-                # Calculer la moyenne de chaque feature dans le dataset
-                feature_means = df_test_reduit.drop('SK_ID_CURR', axis=1).mean()
-                
-                # Calculer les contributions pour le waterfall
-                contributions = []
-                for feature_name, importance in waterfall_features:
-                    # Obtenir la valeur du client et la moyenne pour cette feature
-                    client_value = features[feature_name].values[0]
-                    mean_value = feature_means[feature_name]
-                    
-                    # Calculer l'écart normalisé
-                    if mean_value != 0:
-                        deviation = (client_value - mean_value) / mean_value
-                    else:
-                        deviation = client_value
-                    
-                    # Limiter les valeurs extrêmes
-                    deviation = max(min(deviation, 2), -2)
-                    
-                    # Calculer la contribution
-                    # Le signe indique si c'est positif ou négatif pour l'acceptation du prêt
-                    # Pour les modèles où 1 = défaut, un écart positif par rapport à la moyenne
-                    # augmente le risque (donc impact négatif sur l'acceptation)
-                    sign = -1 if prediction == 1 else 1
-                    contribution = sign * deviation * importance * 0.05  # Facteur d'échelle
-                    
-                    contributions.append((feature_name, float(contribution)))
-                
-                # Trier par valeur absolue de contribution
-                sorted_contributions = sorted(
-                    contributions, 
-                    key=lambda x: abs(x[1]), 
-                    reverse=True
+            if explain:
+                if contributions is not None:
+                    result["explanation"] = {
+                        "feature_names": [artifacts.store.feature_names[i] for i in top_indices[position]],
+                        "contribution_values": top_values[position],
+                        "base_value": base_values[position],
+                        "method": "shap"
+                    }
+                else:
+                    result["explanation"] = client_waterfall(artifacts, features[position], int(prediction), k=explain.k)
+            results.append(result)
+            position += 1
+
+    return {
+        "model_version": artifacts.model_version,
+        "n_found": int(found.sum()),
+        "n_not_found": int((~found).sum()),
+        "results": results,
+    }
+
+# Probabilité et décision d'un client, sans explication (évaluation shadow); None si le client est inconnu
+def score_probability(artifacts, sk_id):
+    row = artifacts.store.row_of(sk_id)
+    if row is None:
+        return None
+    proba = float(artifacts.predictor.predict(model_input(artifacts, artifacts.store.matrix[row][np.newaxis, :]))[0])
+    return proba, int(proba > artifacts.decision.threshold_of_row(row))
+
+# Clients du magasin les plus proches d'un client, avec leur probabilité de défaut et leur décision
+# (exécuté dans le pool d'inférence)
+def find_similar_clients(artifacts, sk_id, k):
+    with stage_seconds.time(endpoint="similar", stage="lookup"):
+        row = artifacts.store.row_of(sk_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Identifiant {sk_id} non trouvé dans le DataFrame")
+
+    similarity = artifacts.similarity
+    with stage_seconds.time(endpoint="similar", stage="search"):
+        rows, distances = similarity.query(row, k)
+    probas = np.empty(0)
+    if len(rows):
+        probas, _, _ = predict_rows(artifacts, artifacts.store.matrix.take(rows, axis=0), False, "similar")
+    predictions = artifacts.decision.decide(probas, rows)
+
+    with stage_seconds.time(endpoint="similar", stage="response"):
+        neighbors = [
+            {
+                "SK_ID_CURR": sk_id_neighbor,
+                "distance": distance,
+                "proba": proba,
+                "prediction": int(prediction),
+                "resultat": "Crédit refusé" if prediction else "Crédit accordé",
+            }
+            for sk_id_neighbor, distance, proba, prediction in zip(
+                artifacts.store.ids[rows].tolist(), distances.tolist(), probas.tolist(), predictions.tolist()
+            )
+        ]
+    return {
+        "SK_ID_CURR": sk_id,
+        "model_version": artifacts.model_version,
+        "method": similarity.method,
+        "features": similarity.feature_names,
+        "neighbors": neighbors,
+    }
+
+# Compte les features du client dans les histogrammes de la surveillance de la dérive (O(features))
+async def observe_drift(artifacts, sk_id):
+    features = artifacts.store.get(sk_id)
+    if features is not None:
+        artifacts.drift.update(features)
+
+# Évalue le modèle qui n'a pas servi la réponse et compare les deux (tâche exécutée après l'envoi
+# de la réponse). Abandonnée si le pool d'inférence est saturé: les requêtes servies restent prioritaires.
+async def compare_shadow(other, candidate_served, sk_id, result):
+    try:
+        other_result = await inference_pool.run(score_probability, other, sk_id)
+    except PoolSaturatedError:
+        shadow_stats.record_skipped()
+        return
+    except Exception as e:
+        logger.error("Erreur lors de l'évaluation shadow du modèle %s: %s", other.model_version, e)
+        shadow_stats.record_error()
+        return
+    if other_result is None:
+        return
+    served_result = (result["proba"], result["prediction"])
+    primary, candidate = (other_result, served_result) if candidate_served else (served_result, other_result)
+    shadow_stats.record(primary[0], candidate[0], primary[1], candidate[1])
+
+# Prédictions pour des features brutes (nouveaux demandeurs): lecture et alignement du corps de la requête
+# sur l'ordre du modèle, puis même calcul que pour les clients du magasin (exécuté dans le pool d'inférence).
+# Retourne la réponse et la matrice des features (colonnes du magasin).
+def score_payload(artifacts, body, content_type, explain):
+    store = artifacts.store
+    projection = artifacts.projection
+    with stage_seconds.time(endpoint="features", stage="parse"):
+        # Toutes les features du modèle sont acceptées, y compris celles retirées du magasin
+        if projection is None:
+            payload = parse_payload(body, content_type, store.column_index, store.n_features)
+        else:
+            payload = parse_payload(body, content_type, projection.column_index, projection.n_model_features)
+    if len(payload) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Trop de clients: {len(payload)} (maximum {MAX_BATCH_SIZE}).")
+
+    features = payload.features if projection is None else projection.project(payload.features)
+    probas, contributions, base_values = predict_rows(artifacts, features, explain, "features") if len(payload) else ([], None, None)
+    # Seuils de la politique selon la feature de segmentation fournie (seuil par défaut si elle est absente)
+    thresholds = artifacts.decision.policy.thresholds_for_features(features, store.feature_names)
+
+    results = []
+    with stage_seconds.time(endpoint="features", stage="explanation" if explain else "response"):
+        for position in range(len(payload)):
+            if contributions is None:
+                result = build_client_response(artifacts, features[position], probas[position], thresholds[position], explain)
+            else:
+                result = build_client_response(
+                    artifacts, features[position], probas[position], thresholds[position], explain,
+                    contributions[position], base_values[position]
                 )
-                
-                waterfall_data = {
-                    "feature_names": [feature[0] for feature in sorted_contributions],
-                    "contribution_values": [feature[1] for feature in sorted_contributions],
-                    "base_value": 0.5  # Valeur de base
-                }
-                
-                feature_importance_data["waterfall"] = waterfall_data
-                
-            except Exception as e:
-                logger.error(f"Erreur lors du calcul des contributions waterfall: {str(e)}")
-                # Continuer même en cas d'erreur
-                
-        except Exception as e:
-            logger.error(f"Erreur lors de l'extraction de l'importance des features: {str(e)}")
-            feature_importance_data = {"error": str(e)}
-        
-        result = "Crédit refusé" if prediction == 1 else "Crédit accordé"
+            if payload.ids is not None:
+                result = {"SK_ID_CURR": payload.ids[position], **result}
+            results.append(result)
 
-        return {
-            "prediction": int(prediction), 
-            "resultat": result,
-            "proba": float(prediction_proba),
-            "feature_importance": feature_importance_data
-        }
+    if payload.single:
+        return results[0], features
+    return {"model_version": artifacts.model_version, "n_rows": len(results), "results": results}, features
+
+# Exécute un calcul dans le pool d'inférence; 503 avec Retry-After lorsque le pool est saturé
+async def run_inference(fn, *args):
+    try:
+        return await inference_pool.run(fn, *args)
+    except PoolSaturatedError:
+        raise HTTPException(
+            status_code=503,
+            detail="Serveur saturé, veuillez réessayer plus tard.",
+            headers={"Retry-After": str(RETRY_AFTER_S)},
+        )
+
+# Traitement d'un lot de requêtes /predict regroupées: une prédiction par version des artefacts
+# (un rechargement pendant la fenêtre d'attente peut mélanger deux versions dans un même lot)
+async def score_micro_batch(items):
+    groups = {}
+    for position, (artifacts, sk_id, explain) in enumerate(items):
+        groups.setdefault((id(artifacts), explain), (artifacts, explain, []))[2].append((position, sk_id))
+
+    results = [None] * len(items)
+    for artifacts, explain, members in groups.values():
+        group_results = await run_inference(score_clients, artifacts, [sk_id for _, sk_id in members], explain)
+        for (position, _), result in zip(members, group_results):
+            results[position] = result
+    return results
+
+micro_batcher = (
+    MicroBatcher(score_micro_batch, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS / 1000.0)
+    if MICROBATCH_ENABLED else None
+)
+
+@app.post("/predict")
+async def predict_api(data: InputData, request: Request, background_tasks: BackgroundTasks,
+                      explain: ExplainOptions = Depends(explain_query(EXPLAIN_FULL)),
+                      artifacts: Artifacts = Depends(get_artifacts)):
+    try:
+        logger.debug("Requête reçue: %s", data)
+
+        # Modèle candidat éventuel: il sert les clients de son groupe A/B, sinon il est évalué en shadow
+        primary = artifacts
+        candidate = getattr(request.app.state, "candidate", None)
+        candidate_served = candidate is not None and routes_to_candidate(data.SK_ID_CURR, shadow_config["ab_percent"])
+        if candidate_served:
+            artifacts = candidate
+
+        # Réponse déjà calculée pour ce client avec ce modèle et cette politique de décision; une réponse
+        # calculée avant la fin du scoring du portefeuille (sans rang centile) n'est pas resservie ensuite
+        cache_key = (
+            data.SK_ID_CURR, artifacts.model_version, artifacts.model_fingerprint, artifacts.decision.policy.fingerprint,
+            explain, artifacts.distribution.ready,
+        )
+        result = prediction_cache.get(cache_key) if prediction_cache is not None else None
+        if result is None:
+            # Regroupement avec les requêtes concurrentes si le micro-batching est activé
+            if micro_batcher is not None:
+                result = await micro_batcher.submit((artifacts, data.SK_ID_CURR, explain))
+            else:
+                # Calcul hors de la boucle d'événements, qui reste disponible pour les autres requêtes
+                result = await run_inference(score_client, artifacts, data.SK_ID_CURR, explain)
+
+            # Pas de mise en cache si les artefacts ont été rechargés pendant le calcul
+            if prediction_cache is not None and request.app.state.artifacts is primary:
+                prediction_cache.set(cache_key, result)
+
+        # Après l'envoi de la réponse, hors du chemin critique: surveillance de la dérive des données
+        # et comparaison avec l'autre modèle
+        background_tasks.add_task(observe_drift, primary, data.SK_ID_CURR)
+        if candidate is not None:
+            shadow_stats.record_served("candidate" if candidate_served else "primary")
+            other = primary if candidate_served else candidate
+            background_tasks.add_task(compare_shadow, other, candidate_served, data.SK_ID_CURR, result)
+        return json_response(result, "predict", request.headers.get("accept"))
 
     except HTTPException as e:
-        logger.error(f"Erreur HTTP: {e.detail}")
+        logger.error("Erreur HTTP: %s", e.detail)
+        raise
+    except ValueError as e:
+        logger.error("Erreur de validation: %s", e)
+        raise HTTPException(status_code=400, detail=f"Erreur dans les données entrées: {str(e)}")
+    except Exception as e:
+        logger.exception("Erreur inconnue: %s", e)
+        raise HTTPException(status_code=500, detail=f"Une erreur est survenue: {str(e)}")
+
+@app.post("/predict/batch")
+async def predict_batch_api(data: BatchInputData, request: Request,
+                            explain: ExplainOptions = Depends(explain_query(EXPLAIN_NONE)),
+                            artifacts: Artifacts = Depends(get_artifacts)):
+    sk_ids = data.SK_ID_CURR
+    if len(sk_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Trop d'identifiants: {len(sk_ids)} (maximum {MAX_BATCH_SIZE}).")
+
+    try:
+        result = await run_inference(score_batch, artifacts, sk_ids, explain)
+        return json_response(result, "batch", request.headers.get("accept"))
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error("Erreur de validation: %s", e)
+        raise HTTPException(status_code=400, detail=f"Erreur dans les données entrées: {str(e)}")
+    except Exception as e:
+        logger.exception("Erreur inconnue: %s", e)
+        raise HTTPException(status_code=500, detail=f"Une erreur est survenue: {str(e)}")
+
+@app.post("/predict/features")
+async def predict_features_api(request: Request, background_tasks: BackgroundTasks,
+                               explain: ExplainOptions = Depends(explain_query(EXPLAIN_NONE)),
+                               artifacts: Artifacts = Depends(get_artifacts)):
+    try:
+        # Corps lu brut: la validation est faite en bloc par parse_payload, pas champ par champ
+        body = await request.body()
+        result, features = await run_inference(score_payload, artifacts, body, request.headers.get("content-type"), explain)
+        background_tasks.add_task(artifacts.drift.update_many, features)
+        return json_response(result, "features", request.headers.get("accept"))
+
+    except HTTPException:
         raise
     except ValueError as e:
-        logger.error(f"Erreur de validation: {str(e)}")
+        logger.error("Erreur de validation: %s", e)
         raise HTTPException(status_code=400, detail=f"Erreur dans les données entrées: {str(e)}")
+    except ImportError as e:
+        raise HTTPException(status_code=415, detail=str(e))
     except Exception as e:
-        logger.error(f"Erreur inconnue: {str(e)}")
+        logger.exception("Erreur inconnue: %s", e)
         raise HTTPException(status_code=500, detail=f"Une erreur est survenue: {str(e)}")
 
 # Si le script est exécuté directement, lancer l'application sur le bon port
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))  # Port par défaut pour Render
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    if workers > 1:
+        # Plusieurs processus: uvicorn attend l'application sous forme de chaîne d'import
+        # (pour partager les artefacts entre workers, préférer gunicorn avec gunicorn.conf.py)
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
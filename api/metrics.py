@@ -0,0 +1,260 @@
+"""
+Mesures de performance de l'API.
+Ce module conserve les durées de chargement des artefacts et la latence de chaque requête
+afin de pouvoir comparer les performances entre deux versions du service.
+
+Les compteurs, jauges et histogrammes sont exposés au format texte de Prometheus par /metrics.
+Ils sont implémentés ici (sans dépendance) avec un coût de quelques microsecondes par mesure:
+un verrou, une recherche dichotomique de l'intervalle et une addition.
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class LatencyRecorder:
+    """Conserve les dernières durées observées par route et en calcule les percentiles"""
+
+    def __init__(self, window=10000):
+        # Fenêtre glissante: seules les `window` dernières mesures sont conservées par route
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, duration):
+        """Enregistre une durée (en secondes) pour la route `name`"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(duration)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def summary(self):
+        """Retourne, par route, le nombre de requêtes et les percentiles de latence en millisecondes"""
+        with self._lock:
+            snapshot = {name: (self._counts[name], list(samples)) for name, samples in self._samples.items()}
+
+        summary = {}
+        for name, (count, samples) in snapshot.items():
+            values = np.asarray(samples, dtype=np.float64) * 1000.0
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            summary[name] = {
+                "count": count,
+                "mean_ms": float(values.mean()),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(values.max()),
+            }
+        return summary
+
+
+class LatencyMiddleware:
+    """Middleware ASGI mesurant la durée totale de chaque requête HTTP"""
+
+    def __init__(self, app, recorder, requests_total=None):
+        self.app = app
+        self.recorder = recorder
+        # Compteur optionnel des réponses par méthode, route et code de statut
+        self.requests_total = requests_total
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # On regroupe par modèle de route (ex: /clients/{id}) plutôt que par URL brute
+            route = scope.get("route")
+            path = getattr(route, "path", scope["path"])
+            self.recorder.record(f"{scope['method']} {path}", time.perf_counter() - start)
+            if self.requests_total is not None:
+                # Les URL sans route (404) sont regroupées pour borner le nombre de séries
+                self.requests_total.inc(method=scope["method"], route=path if route else "unmatched", status=status)
+
+
+# Bornes (secondes) des histogrammes de durée, de 50 µs à 10 s
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    """Métrique au format d'exposition texte de Prometheus, avec ou sans labels"""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        try:
+            if len(labels) == len(self.labelnames):
+                return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError:
+            pass
+        raise ValueError(f"{self.name}: labels attendus {self.labelnames}, reçus {tuple(labels)}")
+
+    def _labels(self, key):
+        return dict(zip(self.labelnames, key))
+
+    def samples(self):
+        """Liste de (suffixe, labels, valeur) à exposer"""
+        with self._lock:
+            return [("", self._labels(key), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Compteur croissant (ex: nombre de requêtes par code de statut)"""
+
+    type = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Valeur instantanée; avec `callback`, les valeurs sont lues au moment de l'exposition.
+
+    `callback()` retourne une liste de (labels, valeur), ce qui évite de mettre à jour la jauge
+    sur le chemin des requêtes (taille du cache, file du pool, ...).
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.callback is None:
+            return super().samples()
+        return [("", labels, value) for labels, value in self.callback() if value is not None]
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Histogram(_Metric):
+    """Histogramme cumulatif de durées (secondes), par combinaison de labels"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Recherche du premier intervalle contenant la valeur; le dernier compte les dépassements (+Inf)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][position] += 1
+            state[1] += value
+
+    def time(self, **labels):
+        """Contexte mesurant la durée du bloc: `with histogram.time(stage="predict"): ...`"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            snapshot = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+
+        samples = []
+        for key, counts, total in snapshot:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Ensemble des métriques exposées par l'endpoint /metrics"""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
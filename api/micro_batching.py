@@ -0,0 +1,83 @@
+"""
+Regroupement des requêtes concurrentes (micro-batching).
+Les requêtes unitaires arrivant à quelques millisecondes d'intervalle sont accumulées puis traitées
+ensemble par un seul appel (une seule prédiction sur la matrice empilée). Chaque requête attend au plus
+`max_wait_s` avant que son lot ne parte, ou moins si le lot atteint `max_batch_size`.
+"""
+
+import asyncio
+
+
+class MicroBatcher:
+    """Accumule des éléments et les traite par lots avec `process_batch`.
+
+    `process_batch(items)` est une coroutine qui retourne une liste de résultats dans l'ordre des
+    éléments; un résultat qui est une exception est levé pour la requête correspondante uniquement.
+    """
+
+    def __init__(self, process_batch, max_batch_size, max_wait_s):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_s
+        self._pending = []
+        self._timer = None
+        # Références aux lots en cours pour qu'ils ne soient pas détruits avant la fin
+        self._tasks = set()
+        self._batches = 0
+        self._items = 0
+
+    async def submit(self, item):
+        """Ajoute un élément au lot courant et attend son résultat"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_s, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        self._batches += 1
+        self._items += len(batch)
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        try:
+            results = await self.process_batch([item for item, _ in batch])
+        except Exception as e:
+            # Échec du lot entier: chaque requête reçoit l'erreur
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            # Une requête annulée (client déconnecté) n'attend plus son résultat
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch_size": self._items / self._batches if self._batches else None,
+            "pending": len(self._pending),
+        }
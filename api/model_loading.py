@@ -0,0 +1,69 @@
+"""
+Chargement du modèle LGBM_TTS.pkl et de sa politique de décision, sans effet de bord à l'import.
+Partagé par l'API (main.py) et le scoring en masse (score_all.py): les processus de scoring n'importent
+pas l'application FastAPI (journalisation, pool d'inférence, cache, registre des versions).
+"""
+
+import logging
+import os
+
+import joblib
+
+from decision_policy import DecisionPolicy
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = 'LGBM_TTS.pkl'
+POLICY_FILE = 'LGBM_TTS.policy.json'
+
+
+def load_model():
+    """Modèle LGBM_TTS.pkl: dans api/, à la racine du dépôt, sinon recherché dans toute l'arborescence"""
+    try:
+        # Chemin absolu basé sur le répertoire courant
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        model_path = os.path.join(base_dir, MODEL_FILE)
+
+        # Si le fichier n'est pas à cet emplacement, essayons d'autres emplacements
+        if not os.path.exists(model_path):
+            model_path = os.path.join(os.path.dirname(base_dir), MODEL_FILE)
+
+        if not os.path.exists(model_path):
+            # Dernier recours: chercher partout dans le répertoire courant et ses sous-dossiers
+            for root, dirs, files in os.walk(os.path.dirname(base_dir)):
+                if MODEL_FILE in files:
+                    model_path = os.path.join(root, MODEL_FILE)
+                    break
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Fichier modèle {MODEL_FILE} introuvable.")
+
+        logger.info("Chargement du modèle: %s", model_path)
+        return joblib.load(model_path)
+    except Exception as e:
+        logger.error("Erreur lors du chargement du modèle: %s", e)
+        raise
+
+
+def load_decision_policy(policy_path=None):
+    """Politique de décision du fichier `policy_path`, sinon LGBM_TTS.policy.json à côté du modèle,
+    sinon seuil unique de 0.5"""
+    if not policy_path:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        candidates = [os.path.join(directory, POLICY_FILE) for directory in (base_dir, os.path.dirname(base_dir))]
+        policy_path = next((path for path in candidates if os.path.exists(path)), None)
+    if policy_path is None:
+        logger.info("Aucune politique de décision trouvée: seuil unique par défaut")
+        return DecisionPolicy()
+
+    logger.info("Chargement de la politique de décision: %s", policy_path)
+    return DecisionPolicy.load(policy_path)
+
+
+def model_feature_order(model, columns):
+    """Ordre des colonnes attendu par le modèle, s'il a été entraîné avec les noms des colonnes des données"""
+    feature_names = getattr(model, "feature_name_", None)
+    columns = set(columns)
+    if isinstance(feature_names, list) and all(name in columns for name in feature_names):
+        return feature_names
+    return None
@@ -0,0 +1,163 @@
+"""
+Registre des versions du modèle.
+Deux organisations de répertoire sont reconnues:
+- répertoire local: `<racine>/<version>/model.pkl`, avec optionnellement `policy.json` (politique de décision);
+- arborescence MLflow (`mlruns`): modèles enregistrés `models/<nom>/version-<n>/meta.yaml` (version
+  `<nom>-v<n>`) et modèles scikit-learn journalisés dans les runs `<expérience>/<run_id>/artifacts/<chemin>/model.pkl`
+  (version `<run_id>`).
+
+Le registre ne fait que lister les versions et désérialiser le modèle: le préchauffage et l'activation
+sont gérés par l'API (voir main.activate_model_version). InFlightTracker compte les requêtes en cours
+par version des artefacts, pour savoir quand l'ancienne version est drainée après une activation.
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from urllib.parse import unquote, urlparse
+
+import joblib
+
+MODEL_FILE = "model.pkl"
+POLICY_FILE = "policy.json"
+
+
+@dataclass(frozen=True)
+class ModelVersion:
+    version: str
+    path: str
+    source: str
+    created_at: float
+
+    @property
+    def policy_path(self):
+        """Politique de décision livrée avec cette version, ou None"""
+        path = os.path.join(os.path.dirname(self.path), POLICY_FILE)
+        return path if os.path.exists(path) else None
+
+    def describe(self):
+        return {"version": self.version, "source": self.source, "path": self.path, "created_at": self.created_at}
+
+
+def read_meta(path):
+    """Clés de premier niveau d'un meta.yaml MLflow (format `clé: valeur`, sans dépendance YAML)"""
+    meta = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line[:1].isspace() or ":" not in line:
+                continue
+            key, _, value = line.partition(":")
+            meta[key.strip()] = value.strip().strip("'\"")
+    return meta
+
+
+def _local_path(uri):
+    if uri.startswith("file:"):
+        parsed = urlparse(uri)
+        path = unquote(parsed.path)
+        # file:///C:/... sous Windows
+        if len(path) > 2 and path[0] == "/" and path[2] == ":":
+            path = path[1:]
+        return path
+    return uri
+
+
+class ModelRegistry:
+    """Versions du modèle disponibles sous `root` (relues à chaque appel: un nouveau modèle déposé est visible)"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _directory_versions(self):
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name, MODEL_FILE)
+            if os.path.isfile(path):
+                yield ModelVersion(name, path, "directory", os.path.getmtime(path))
+
+    def _mlflow_run_versions(self):
+        for experiment in sorted(os.listdir(self.root)):
+            experiment_dir = os.path.join(self.root, experiment)
+            if experiment == "models" or not os.path.isfile(os.path.join(experiment_dir, "meta.yaml")):
+                continue
+            for run_id in sorted(os.listdir(experiment_dir)):
+                artifacts_dir = os.path.join(experiment_dir, run_id, "artifacts")
+                if not os.path.isdir(artifacts_dir):
+                    continue
+                for directory, _, files in os.walk(artifacts_dir):
+                    if MODEL_FILE in files:
+                        path = os.path.join(directory, MODEL_FILE)
+                        yield ModelVersion(run_id, path, "mlflow_run", os.path.getmtime(path))
+                        break
+
+    def _mlflow_registered_versions(self, runs_by_id):
+        models_dir = os.path.join(self.root, "models")
+        if not os.path.isdir(models_dir):
+            return
+        for name in sorted(os.listdir(models_dir)):
+            for entry in sorted(os.listdir(os.path.join(models_dir, name))):
+                meta_path = os.path.join(models_dir, name, entry, "meta.yaml")
+                if not entry.startswith("version-") or not os.path.isfile(meta_path):
+                    continue
+                meta = read_meta(meta_path)
+                source = meta.get("source", "")
+                if source.startswith("runs:/"):
+                    run = runs_by_id.get(source[len("runs:/"):].split("/", 1)[0])
+                    path = run.path if run else None
+                else:
+                    path = os.path.join(_local_path(source), MODEL_FILE)
+                if not path or not os.path.isfile(path):
+                    continue
+                created_at = float(meta.get("creation_timestamp", 0) or 0) / 1000.0 or os.path.getmtime(path)
+                yield ModelVersion(f"{name}-v{meta.get('version', entry[len('version-'):])}", path, "mlflow_registry", created_at)
+
+    def versions(self):
+        """Versions disponibles, de la plus ancienne à la plus récente"""
+        if not self.root or not os.path.isdir(self.root):
+            return []
+        runs = list(self._mlflow_run_versions())
+        found = list(self._directory_versions()) + runs
+        found += list(self._mlflow_registered_versions({run.version: run for run in runs}))
+        return sorted(found, key=lambda version: (version.created_at, version.version))
+
+    def get(self, version):
+        """Version `version` (ou la plus récente pour "latest"); KeyError si elle n'existe pas"""
+        versions = self.versions()
+        if version == "latest" and versions:
+            return versions[-1]
+        for candidate in versions:
+            if candidate.version == version:
+                return candidate
+        raise KeyError(version)
+
+    @staticmethod
+    def load(model_version):
+        return joblib.load(model_version.path)
+
+
+class InFlightTracker:
+    """Nombre de requêtes en cours par version des artefacts, pour attendre qu'une version remplacée soit drainée"""
+
+    def __init__(self):
+        self._counts = {}
+        self._condition = threading.Condition()
+
+    def acquire(self, artifacts):
+        with self._condition:
+            self._counts[id(artifacts)] = self._counts.get(id(artifacts), 0) + 1
+
+    def release(self, artifacts):
+        with self._condition:
+            key = id(artifacts)
+            self._counts[key] -= 1
+            if not self._counts[key]:
+                del self._counts[key]
+                self._condition.notify_all()
+
+    def count(self, artifacts):
+        with self._condition:
+            return self._counts.get(id(artifacts), 0)
+
+    def wait_idle(self, artifacts, timeout):
+        """Attend la fin des requêtes en cours sur `artifacts`; False si le délai est dépassé"""
+        with self._condition:
+            return self._condition.wait_for(lambda: id(artifacts) not in self._counts, timeout=timeout)
@@ -0,0 +1,128 @@
+"""
+Cache des réponses de /predict.
+Les features d'un client sont statiques entre deux rechargements: la réponse pour un même
+(SK_ID_CURR, empreinte du modèle, seuil) peut donc être réutilisée. Le cache est borné en taille
+(éviction LRU) et en durée de vie (TTL), et vidé à chaque rechargement des artefacts.
+
+Deux implémentations partagent la même interface (get / set / clear / stats):
+- TTLCache: en mémoire, propre à chaque processus (défaut);
+- RedisCache: partagée entre processus via Redis (dépendance optionnelle `redis`).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import orjson
+
+
+class TTLCache:
+    """Cache LRU en mémoire avec expiration des entrées"""
+
+    def __init__(self, max_size=10000, ttl_s=3600.0):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Valeur associée à `key`, ou None si elle est absente ou expirée"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+class RedisCache:
+    """Cache partagé entre processus, stocké dans Redis (valeurs sérialisées en JSON)"""
+
+    def __init__(self, url, ttl_s=3600.0, prefix="credit_scoring:predict:", client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError("Le cache Redis nécessite le paquet `redis` (pip install redis).") from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl_s = ttl_s
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        return self.prefix + ":".join(str(part) for part in key)
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return orjson.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self._key(key), orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY), ex=max(int(self.ttl_s), 1))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+def create_cache(backend, max_size=10000, ttl_s=3600.0, redis_url=None):
+    """Cache selon `backend`: "memory", "redis" ou "none" (pas de cache)"""
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return TTLCache(max_size=max_size, ttl_s=ttl_s)
+    if backend == "redis":
+        return RedisCache(redis_url or "redis://localhost:6379/0", ttl_s=ttl_s)
+    raise ValueError(f"Cache inconnu: {backend} (valeurs possibles: memory, redis, none)")
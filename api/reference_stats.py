@@ -0,0 +1,63 @@
+"""
+Statistiques de référence du jeu de données, calculées une seule fois au chargement des artefacts.
+Le calcul des explications d'une prédiction lit ces valeurs au lieu de réduire le DataFrame complet
+à chaque requête.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+# Les moyennes sont calculées par blocs de lignes pour ne jamais copier toute la matrice (memmap)
+CHUNK_ROWS = 65536
+
+
+def nan_column_means(matrix, chunk_rows=CHUNK_ROWS):
+    """Moyenne de chaque colonne en ignorant les valeurs manquantes, accumulée en float64 bloc par bloc"""
+    sums = np.zeros(matrix.shape[1])
+    counts = np.zeros(matrix.shape[1])
+    for start in range(0, matrix.shape[0], chunk_rows):
+        chunk = np.asarray(matrix[start:start + chunk_rows], dtype=np.float64)
+        valid = ~np.isnan(chunk)
+        sums += np.where(valid, chunk, 0.0).sum(axis=0)
+        counts += valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+
+@dataclass(frozen=True)
+class ReferenceStats:
+    feature_names: list
+    means: np.ndarray
+    importance: np.ndarray
+    importance_order: np.ndarray
+
+    @classmethod
+    def compute(cls, store, feature_importances=None):
+        """Calcule les statistiques sur la matrice du magasin de features.
+        `feature_importances` est l'importance globale de chaque feature, dans l'ordre du magasin."""
+        # Les valeurs manquantes sont ignorées, comme le fait DataFrame.mean()
+        means = nan_column_means(store.matrix)
+
+        importance, importance_order = None, None
+        if feature_importances is not None:
+            importance = np.asarray(feature_importances, dtype=np.float64)
+            if importance.shape != (store.n_features,):
+                raise ValueError(
+                    f"{importance.size} importances de features pour {store.n_features} features."
+                )
+            # Tri stable par importance décroissante: à importance égale, l'ordre des colonnes est conservé
+            importance_order = np.argsort(-importance, kind='stable')
+
+        return cls(
+            feature_names=list(store.feature_names),
+            means=means,
+            importance=importance,
+            importance_order=importance_order,
+        )
+
+    def top_features(self, k):
+        """Indices des k features les plus importantes"""
+        if self.importance_order is None:
+            raise ValueError("L'importance des features n'est pas disponible pour ce modèle.")
+        return self.importance_order[:k]
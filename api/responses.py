@@ -0,0 +1,60 @@
+"""
+Encodage des réponses de l'API.
+- JSON avec orjson: les tableaux et scalaires NumPy (probabilités, contributions) sont encodés
+  directement, sans conversion préalable en listes de float Python;
+- MessagePack (dépendance optionnelle `msgpack`), binaire et compact, pour les appels entre services:
+  choisi lorsque l'en-tête Accept le demande.
+"""
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content):
+    """Encodage JSON (bytes) avec prise en charge des types NumPy"""
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class NumpyJSONResponse(JSONResponse):
+    """Réponse JSON encodée par orjson (NaN encodé en null)"""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def _msgpack_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Type non encodable en MessagePack: {type(value).__name__}")
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content):
+        return msgpack.packb(content, default=_msgpack_default, use_bin_type=True)
+
+
+def msgpack_accepted(accept):
+    """True si l'en-tête Accept demande MessagePack et que le paquet `msgpack` est installé"""
+    if msgpack is None or not accept:
+        return False
+    media_types = [part.split(";")[0].strip().lower() for part in accept.split(",")]
+    return any(media_type in MSGPACK_MEDIA_TYPES for media_type in media_types)
+
+
+def response_class(accept):
+    """Classe de réponse selon l'en-tête Accept (JSON par défaut)"""
+    return MsgpackResponse if msgpack_accepted(accept) else NumpyJSONResponse
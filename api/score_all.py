@@ -0,0 +1,214 @@
+"""
+Scoring en masse de tous les clients (re-scoring nocturne du portefeuille).
+Le fichier des clients (CSV ou magasin de features binaire) est lu par blocs, les blocs sont scorés
+dans un pool de processus et les résultats écrits au fur et à mesure, dans l'ordre, en CSV ou en
+Parquet. Le nombre de blocs en cours est borné: la mémoire ne dépend pas de la taille du fichier.
+
+    python score_all.py ../df_test_reduit.csv scores.csv --workers 4 --explain 5
+    python score_all.py ../features_store scores.parquet --chunksize 50000
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from decision_policy import DecisionPolicy
+from explainer import create_explainer, top_contributions
+from feature_store import ID_COLUMN, FeatureProjection, FeatureStore
+from model_loading import load_decision_policy, load_model, model_feature_order
+from tree_engine import create_predictor
+
+# Artefacts du processus de scoring, initialisés une fois par processus (voir init_worker)
+_worker = {}
+
+
+def load_scoring_model():
+    """Modèle de l'API (même fichier LGBM_TTS.pkl, même recherche que l'API)"""
+    return load_model()
+
+
+def init_worker(engine, explain_k, threads):
+    """Charge le modèle dans le processus de scoring; LightGBM limité à `threads` threads
+    pour ne pas surcharger la machine avec plusieurs processus"""
+    if threads:
+        # Limite OpenMP du processus (Booster.predict n'accepte le nombre de threads qu'en argument)
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads, user_api="openmp")
+
+    model = load_scoring_model()
+    if threads and hasattr(model, "set_params"):
+        model.set_params(n_jobs=threads)
+    _worker["predictor"] = create_predictor(model, engine)
+    _worker["explainer"] = create_explainer(model, "shap") if explain_k else None
+    if explain_k and _worker["explainer"] is None:
+        raise ValueError("Les explications nécessitent un modèle LightGBM binaire (TreeSHAP).")
+    _worker["explain_k"] = explain_k
+
+
+def score_chunk(ids, features, feature_names, policy, model_feature_names=None):
+    """Probabilités, seuils et décisions de la politique, et (optionnellement) principales contributions TreeSHAP d'un bloc.
+    `model_feature_names`: ordre complet du modèle pour un magasin réduit à ses features utilisées (les lignes
+    sont replacées dans la matrice complète, les features retirées valant NaN)."""
+    explain_k = _worker["explain_k"]
+    projection = None
+    model_input = features
+    if model_feature_names is not None:
+        projection = FeatureProjection(model_feature_names, feature_names)
+        model_input = projection.expand(features)
+    if explain_k:
+        probas, contributions, _ = _worker["explainer"].explain(model_input)
+        # Contributions des colonnes du magasin (celles des features retirées sont nulles)
+        if projection is not None:
+            contributions = projection.project(contributions)
+    else:
+        probas = _worker["predictor"].predict(model_input)
+
+    thresholds = policy.thresholds_for_features(features, feature_names)
+    columns = {
+        ID_COLUMN: ids,
+        "proba": probas,
+        "threshold": thresholds,
+        "prediction": (probas > thresholds).astype(np.int8),
+    }
+    if explain_k:
+        indices, values = top_contributions(contributions, explain_k)
+        names = np.asarray(feature_names, dtype=object)
+        for rank in range(indices.shape[1]):
+            columns[f"top{rank + 1}_feature"] = names[indices[:, rank]]
+            columns[f"top{rank + 1}_contribution"] = values[:, rank]
+    return pd.DataFrame(columns)
+
+
+def iter_chunks(source, feature_names, chunksize):
+    """Blocs (identifiants, matrice float32 dans l'ordre `feature_names`) lus depuis un CSV ou un magasin binaire"""
+    if os.path.isdir(source):
+        store = FeatureStore.load(source).reorder(feature_names)
+        for start in range(0, len(store), chunksize):
+            yield store.ids[start:start + chunksize], np.ascontiguousarray(store.matrix[start:start + chunksize])
+        return
+
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        yield chunk[ID_COLUMN].to_numpy(), chunk[feature_names].to_numpy(dtype=np.float32)
+
+
+def source_feature_names(source, model):
+    """Colonnes lues dans la source (ordre d'entraînement si connu, sinon ordre du fichier) et ordre complet
+    du modèle si la source est un magasin réduit à la conversion (`feature_store.py --model`), sinon None"""
+    if os.path.isdir(source):
+        store = FeatureStore.load(source)
+        if store.model_feature_names is not None:
+            return store.feature_names, store.model_feature_names
+        columns = store.feature_names
+    else:
+        columns = [column for column in pd.read_csv(source, nrows=0).columns if column != ID_COLUMN]
+    return model_feature_order(model, columns) or columns, None
+
+
+class ResultWriter:
+    """Écriture incrémentale des résultats en CSV ou en Parquet (dépendance optionnelle `pyarrow`)"""
+
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+        self._parquet = None
+        self._first = True
+        if self.fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                raise ImportError("La sortie Parquet nécessite le paquet `pyarrow` (pip install pyarrow).") from e
+        elif self.fmt != "csv":
+            raise ValueError(f"Format de sortie inconnu: {self.fmt} (valeurs possibles: csv, parquet)")
+
+    def write(self, frame):
+        if self.fmt == "csv":
+            frame.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        self._first = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def score_all(source, output, chunksize=10000, workers=1, explain_k=0, engine="booster", fmt=None,
+              threshold=None, threads=None):
+    """Score tous les clients de `source` et écrit les résultats dans `output`; retourne le nombre de lignes.
+
+    `workers=0` score dans le processus courant (sans pool). Sans `threshold`, la politique de décision
+    de l'API (seuils par segment) est appliquée.
+    """
+    policy_path = os.environ.get("DECISION_POLICY_PATH")
+    policy = load_decision_policy(policy_path) if threshold is None else DecisionPolicy(default_threshold=threshold)
+    feature_names, model_feature_names = source_feature_names(source, load_scoring_model())
+    writer = ResultWriter(output, fmt)
+    n_rows = 0
+
+    try:
+        if workers == 0:
+            init_worker(engine, explain_k, threads)
+            for ids, features in iter_chunks(source, feature_names, chunksize):
+                frame = score_chunk(ids, features, feature_names, policy, model_feature_names)
+                writer.write(frame)
+                n_rows += len(frame)
+            return n_rows
+
+        threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        # Processus démarrés par spawn: un fork après une prédiction LightGBM (pool OpenMP déjà créé)
+        # peut bloquer le processus enfant
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                                 initargs=(engine, explain_k, threads)) as pool:
+            # Au plus deux blocs en cours par processus: la lecture n'avance pas plus vite que le scoring
+            pending = deque()
+            for ids, features in iter_chunks(source, feature_names, chunksize):
+                pending.append(pool.submit(score_chunk, ids, features, feature_names, policy, model_feature_names))
+                if len(pending) >= 2 * workers:
+                    frame = pending.popleft().result()
+                    writer.write(frame)
+                    n_rows += len(frame)
+            while pending:
+                frame = pending.popleft().result()
+                writer.write(frame)
+                n_rows += len(frame)
+        return n_rows
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scoring de tous les clients d'un CSV ou d'un magasin de features binaire")
+    parser.add_argument('source', help="CSV des clients ou répertoire du magasin de features binaire")
+    parser.add_argument('output', help="Fichier de résultats (.csv ou .parquet)")
+    parser.add_argument('--chunksize', type=int, default=10000, help="Nombre de clients par bloc")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus de scoring (0: processus courant)")
+    parser.add_argument('--threads', type=int, default=None, help="Threads LightGBM par processus (défaut: CPU / workers)")
+    parser.add_argument('--explain', type=int, default=0, metavar='K', help="Ajoute les K principales contributions TreeSHAP")
+    parser.add_argument('--engine', default="booster", help="Moteur d'inférence: sklearn, booster ou numpy")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None, help="Format de sortie (défaut: selon l'extension)")
+    parser.add_argument('--threshold', type=float, default=None, help="Seuil unique (défaut: politique de décision de l'API)")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    n_rows = score_all(
+        args.source, args.output, chunksize=args.chunksize, workers=args.workers, explain_k=args.explain,
+        engine=args.engine, fmt=args.format, threshold=args.threshold, threads=args.threads,
+    )
+    elapsed = time.perf_counter() - start_time
+    print(f"{n_rows} clients scorés en {elapsed:.2f}s ({n_rows / elapsed:.0f} lignes/s) dans {args.output}")
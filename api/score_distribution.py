@@ -0,0 +1,135 @@
+"""
+Distribution des probabilités de défaut du portefeuille.
+Tous les clients du magasin de features sont scorés une fois au chargement des artefacts; les scores
+triés permettent ensuite, sans rescorer le portefeuille:
+- le rang centile d'une probabilité par recherche dichotomique (O(log n));
+- l'histogramme des scores, chaque borne étant elle aussi placée par recherche dichotomique.
+
+Au rechargement avec le même modèle, seuls les clients nouveaux ou dont les features ont changé sont
+rescorés: chaque ligne du magasin est résumée par une empreinte de 64 bits comparée à la précédente.
+"""
+
+import threading
+
+import numpy as np
+
+# Lignes scorées par appel au modèle (mémoire bornée pour les grands magasins)
+SCORE_CHUNK_ROWS = 65536
+
+# Lignes par bloc pour le calcul des empreintes (matrice temporaire d'entiers 64 bits)
+DIGEST_CHUNK_ROWS = 4096
+
+# Nombre d'intervalles par défaut de l'histogramme, sur [0, 1]
+DEFAULT_BINS = 20
+
+# Écart en deçà duquel deux probabilités sont de même rang: la probabilité issue des contributions TreeSHAP
+# (sigmoïde de leur somme) diffère de celle du prédicteur de quelques ulp
+SCORE_TOLERANCE = 1e-12
+
+# Quantiles de la distribution renvoyés avec l'histogramme
+SUMMARY_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def row_digests(matrix, chunk_rows=DIGEST_CHUNK_ROWS):
+    """Empreinte de 64 bits de chaque ligne: combinaison linéaire (modulo 2^64) des mots de 32 bits
+    de la ligne par des coefficients impairs pseudo-aléatoires fixes"""
+    n_rows, n_features = matrix.shape
+    coefficients = np.random.default_rng(0).integers(1, 2 ** 63, size=n_features, dtype=np.uint64) | np.uint64(1)
+    digests = np.empty(n_rows, dtype=np.uint64)
+    for start in range(0, n_rows, chunk_rows):
+        words = np.ascontiguousarray(matrix[start:start + chunk_rows], dtype=np.float32).view(np.uint32)
+        # Dépassements modulo 2^64 voulus
+        digests[start:start + chunk_rows] = (words.astype(np.uint64) * coefficients).sum(axis=1, dtype=np.uint64)
+    return digests
+
+
+def score_rows(predict, matrix, rows, scores, chunk_rows=SCORE_CHUNK_ROWS):
+    """Scores des lignes `rows` de la matrice, écrits dans `scores`, par blocs"""
+    for start in range(0, len(rows), chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        scores[chunk] = predict(matrix.take(chunk, axis=0))
+
+
+class ScoreDistribution:
+    """Scores de tous les clients du magasin (ordre du magasin) et leur copie triée.
+    Vide tant que le calcul n'est pas terminé (calcul en arrière-plan dans les workers)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ids = None
+        self.scores = None
+        self.digests = None
+        self.sorted_scores = None
+        self.n_rescored = 0
+
+    @property
+    def ready(self):
+        return self.sorted_scores is not None
+
+    def __len__(self):
+        return 0 if self.sorted_scores is None else len(self.sorted_scores)
+
+    def compute(self, predict, store, previous=None):
+        """Score le magasin avec `predict` (lignes du magasin -> probabilités). `previous`, distribution
+        calculée avec le même modèle et les mêmes colonnes, fournit les scores des lignes inchangées."""
+        ids = store.ids
+        digests = row_digests(store.matrix)
+        scores = np.full(len(ids), np.nan)
+        todo = np.arange(len(ids))
+
+        if previous is not None and previous.ready and len(previous.ids):
+            # Ligne précédente de chaque identifiant (recherche dichotomique dans les identifiants triés)
+            order = np.argsort(previous.ids, kind='stable')
+            positions = np.minimum(np.searchsorted(previous.ids[order], ids), len(order) - 1)
+            previous_rows = order[positions]
+            reuse = (previous.ids[previous_rows] == ids) & (previous.digests[previous_rows] == digests)
+            scores[reuse] = previous.scores[previous_rows[reuse]]
+            todo = np.flatnonzero(~reuse)
+
+        score_rows(predict, store.matrix, todo, scores)
+        sorted_scores = np.sort(scores)
+        with self._lock:
+            self.ids, self.scores, self.digests, self.n_rescored = ids, scores, digests, len(todo)
+            # Affectée en dernier: la distribution est disponible une fois complète
+            self.sorted_scores = sorted_scores
+        return self
+
+    def percentile(self, proba):
+        """Pourcentage des clients du portefeuille dont la probabilité est inférieure ou égale à `proba`,
+        ou None si la distribution n'est pas encore calculée"""
+        sorted_scores = self.sorted_scores
+        if sorted_scores is None or not len(sorted_scores):
+            return None
+        return 100.0 * np.searchsorted(sorted_scores, proba + SCORE_TOLERANCE, side='right') / len(sorted_scores)
+
+    def percentile_of_row(self, row):
+        """Rang centile du score du portefeuille de la ligne `row` du magasin, ou None si la distribution
+        n'est pas encore calculée (même rang quel que soit le chemin de prédiction de la requête)"""
+        scores = self.scores
+        if self.sorted_scores is None or scores is None:
+            return None
+        return self.percentile(scores[row])
+
+    def histogram(self, bins=DEFAULT_BINS):
+        """Bornes et effectifs de `bins` intervalles de même largeur sur [0, 1] (le dernier inclut 1)"""
+        sorted_scores = self.sorted_scores
+        edges = np.linspace(0.0, 1.0, bins + 1)
+        below = np.searchsorted(sorted_scores, edges[:-1], side='left')
+        counts = np.diff(below, append=len(sorted_scores))
+        return edges, counts
+
+    def summary(self, bins=DEFAULT_BINS):
+        """Histogramme, moyenne et quantiles des scores du portefeuille"""
+        sorted_scores = self.sorted_scores
+        edges, counts = self.histogram(bins)
+        n_clients = len(sorted_scores)
+        return {
+            "n_clients": n_clients,
+            "mean": float(sorted_scores.mean()) if n_clients else None,
+            "quantiles": {
+                format(level, "g"): float(np.quantile(sorted_scores, level)) if n_clients else None
+                for level in SUMMARY_QUANTILES
+            },
+            "bin_edges": edges,
+            "counts": counts,
+        }
@@ -0,0 +1,98 @@
+"""
+Comparaison d'un modèle candidat avec le modèle en production sur le trafic réel de /predict.
+- shadow: le candidat est évalué après l'envoi de la réponse (tâche d'arrière-plan), sans effet sur la
+  latence ni sur la réponse;
+- A/B: un pourcentage des clients est servi par le candidat. L'affectation dépend uniquement de
+  SK_ID_CURR (un client voit toujours le même modèle) et l'autre modèle est alors évalué en shadow.
+
+Les statistiques sont cumulées en mémoire, en un passage (algorithme de Welford pour l'écart de
+probabilité candidat - production).
+"""
+
+import math
+import threading
+import zlib
+
+# Précision de l'affectation A/B: 0.01 %
+AB_BUCKETS = 10000
+
+
+def ab_bucket(sk_id):
+    """Groupe stable (0 à AB_BUCKETS - 1) d'un client, identique dans tous les processus"""
+    return zlib.crc32(str(sk_id).encode("ascii")) % AB_BUCKETS
+
+
+def routes_to_candidate(sk_id, ab_percent):
+    """True si le client fait partie des `ab_percent` % servis par le candidat"""
+    return ab_percent > 0 and ab_bucket(sk_id) < ab_percent * AB_BUCKETS / 100.0
+
+
+class ShadowStats:
+    """Accord des décisions et écart des probabilités entre le modèle en production et le candidat"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._count = 0
+            self._agreements = 0
+            # Matrice de confusion des décisions: [production][candidat], 1 = crédit refusé
+            self._decisions = [[0, 0], [0, 0]]
+            self._mean_delta = 0.0
+            self._m2_delta = 0.0
+            self._sum_abs_delta = 0.0
+            self._max_abs_delta = 0.0
+            self._served = {"primary": 0, "candidate": 0}
+            self._skipped = 0
+            self._errors = 0
+
+    def record(self, primary_proba, candidate_proba, primary_decision, candidate_decision):
+        delta = candidate_proba - primary_proba
+        with self._lock:
+            self._count += 1
+            self._agreements += primary_decision == candidate_decision
+            self._decisions[primary_decision][candidate_decision] += 1
+            # Welford: moyenne et somme des carrés des écarts mises à jour en O(1)
+            step = delta - self._mean_delta
+            self._mean_delta += step / self._count
+            self._m2_delta += step * (delta - self._mean_delta)
+            self._sum_abs_delta += abs(delta)
+            self._max_abs_delta = max(self._max_abs_delta, abs(delta))
+
+    def record_served(self, arm):
+        with self._lock:
+            self._served[arm] += 1
+
+    def record_skipped(self):
+        """Évaluation shadow abandonnée (pool d'inférence saturé: la production reste prioritaire)"""
+        with self._lock:
+            self._skipped += 1
+
+    def record_error(self):
+        with self._lock:
+            self._errors += 1
+
+    def summary(self):
+        with self._lock:
+            count = self._count
+            return {
+                "compared": count,
+                "agreement_rate": self._agreements / count if count else None,
+                "decisions": {
+                    "both_accept": self._decisions[0][0],
+                    "both_refuse": self._decisions[1][1],
+                    "only_candidate_refuses": self._decisions[0][1],
+                    "only_primary_refuses": self._decisions[1][0],
+                },
+                "proba_delta": {
+                    "mean": self._mean_delta if count else None,
+                    "std": math.sqrt(self._m2_delta / (count - 1)) if count > 1 else None,
+                    "mean_abs": self._sum_abs_delta / count if count else None,
+                    "max_abs": self._max_abs_delta if count else None,
+                },
+                "served": dict(self._served),
+                "skipped": self._skipped,
+                "errors": self._errors,
+            }
@@ -0,0 +1,111 @@
+"""
+Recherche des clients les plus proches d'un client du magasin de features.
+L'index est construit au chargement des artefacts sur les features les plus importantes du modèle:
+chaque feature est centrée-réduite (une valeur manquante prend la moyenne, soit 0 après réduction)
+puis pondérée par la racine de son importance relative, de sorte que la distance euclidienne au carré
+soit la somme des écarts standardisés au carré pondérés par l'importance.
+
+Deux modes de recherche, tous deux exacts:
+- force brute vectorisée (un produit matrice-vecteur float32) pour les tables de taille modérée;
+- BallTree (scikit-learn) au-delà de `BRUTE_FORCE_MAX_ROWS` lignes: les features d'un portefeuille
+  de crédit sont corrélées, les clients occupent un sous-espace de faible dimension et l'arbre
+  n'explore qu'une petite partie des lignes (quelques ms sur des millions de clients).
+"""
+
+import warnings
+
+import numpy as np
+
+from reference_stats import nan_column_means
+
+# Features (les plus importantes) prises en compte dans la distance
+DEFAULT_FEATURES = 20
+
+# Au-delà, la recherche passe par un BallTree
+BRUTE_FORCE_MAX_ROWS = 200000
+
+# Taille des feuilles du BallTree (compromis entre profondeur de l'arbre et calcul exhaustif dans les feuilles)
+LEAF_SIZE = 40
+
+
+def standardize(values, centers, scales, weights):
+    """Écarts à la moyenne réduits et pondérés (float32); 0 pour une valeur manquante"""
+    vectors = (values - centers) / scales * weights
+    return np.nan_to_num(vectors, nan=0.0).astype(np.float32)
+
+
+class SimilarityIndex:
+    """Vecteurs standardisés et pondérés des clients, et recherche de leurs plus proches voisins"""
+
+    def __init__(self, feature_names, columns, centers, scales, weights, vectors, tree=None):
+        self.feature_names = list(feature_names)
+        self.columns = np.asarray(columns, dtype=np.int64)
+        self.centers = centers
+        self.scales = scales
+        self.weights = weights
+        self.vectors = vectors
+        # Normes au carré, pour la distance par produit scalaire de la force brute
+        self.squared_norms = np.einsum('ij,ij->i', vectors, vectors)
+        self.tree = tree
+
+    @property
+    def method(self):
+        return "ball_tree" if self.tree is not None else "brute_force"
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @classmethod
+    def build(cls, store, importance=None, n_features=DEFAULT_FEATURES, brute_force_max_rows=BRUTE_FORCE_MAX_ROWS):
+        """Index des lignes du magasin; `importance` (ordre du magasin) choisit et pondère les features,
+        à défaut les premières colonnes avec le même poids"""
+        if importance is not None and (np.asarray(importance) > 0).any():
+            importance = np.asarray(importance, dtype=np.float64)
+            columns = np.argsort(-importance, kind='stable')[:n_features]
+            columns = columns[importance[columns] > 0]
+            weights = np.sqrt(importance[columns] / importance[columns].sum())
+        else:
+            columns = np.arange(min(n_features, store.n_features))
+            weights = np.full(len(columns), 1 / np.sqrt(max(len(columns), 1)))
+
+        # Copie des seules colonnes retenues (lecture partielle d'un magasin projeté en mémoire)
+        values = np.asarray(store.matrix[:, columns], dtype=np.float32)
+        centers = nan_column_means(values)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            scales = np.sqrt(nan_column_means(np.square(values - centers.astype(np.float32))))
+        # Colonne vide ou constante: aucune contribution à la distance
+        centers = np.nan_to_num(centers)
+        scales = np.where(np.isfinite(scales) & (scales > 0), scales, np.inf)
+
+        vectors = standardize(values, centers, scales, weights)
+        tree = None
+        if len(vectors) > brute_force_max_rows:
+            from sklearn.neighbors import BallTree
+            tree = BallTree(vectors, leaf_size=LEAF_SIZE)
+        return cls([store.feature_names[i] for i in columns], columns, centers, scales, weights, vectors, tree)
+
+    def query(self, row, k):
+        """Lignes des `k` clients les plus proches de la ligne `row` (elle-même exclue) et leurs distances,
+        par distance croissante"""
+        k = min(k, len(self) - 1)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        vector = self.vectors[row]
+
+        if self.tree is not None:
+            distances, rows = self.tree.query(vector[np.newaxis, :], k=k + 1)
+            rows, distances = rows[0], distances[0]
+        else:
+            # |x - q|² = |x|² - 2 x.q + |q|², en un seul produit matrice-vecteur
+            squared = self.squared_norms - 2 * (self.vectors @ vector) + self.squared_norms[row]
+            candidates = np.argpartition(squared, k)[:k + 1]
+            order = np.lexsort((candidates, squared[candidates]))
+            rows = candidates[order]
+            distances = np.sqrt(np.maximum(squared[rows], 0.0))
+
+        # Le client lui-même est retiré (ou le plus éloigné des candidats si des doublons exacts le devancent)
+        keep = rows != row
+        if keep.all():
+            keep[-1] = False
+        return rows[keep], distances[keep]
@@ -9,8 +9,24 @@ import os
 # Ajouter le chemin du répertoire parent pour importer app.py
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-# Importer la fonction à tester depuis app.py
-from app import get_prediction
+# Importer les fonctions à tester depuis app.py
+from app import API_BASE_URL, API_TIMEOUT, fetch_batch, fetch_prediction, get_model_version, get_prediction, get_predictions, parse_ids
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Vider les caches Streamlit entre les tests"""
+    for cached in (fetch_prediction, fetch_batch, get_model_version):
+        cached.clear()
+    yield
+
+@pytest.fixture
+def mock_session():
+    """Session HTTP simulée; /models indique la version v1"""
+    session = MagicMock()
+    session.get.return_value.status_code = 200
+    session.get.return_value.json.return_value = {"active": "v1"}
+    with patch('app.get_session', return_value=session):
+        yield session
 
 class TestAppFunctions:
     
@@ -24,8 +40,7 @@ class TestAppFunctions:
         result = get_prediction('abc')
         assert result == "Erreur : L'ID du client doit être un entier valide."
     
-    @patch('requests.post')
-    def test_get_prediction_successful_request(self, mock_post):
+    def test_get_prediction_successful_request(self, mock_session):
         """Tester une requête API réussie avec un ID valide"""
         # Configurer le mock pour simuler une réponse réussie
         mock_response = MagicMock()
@@ -35,30 +50,28 @@ class TestAppFunctions:
             'resultat': 'Crédit accordé'
         }
         mock_response.text = json.dumps(mock_response.json.return_value)
-        mock_post.return_value = mock_response
+        mock_session.post.return_value = mock_response
         
         # Appeler la fonction avec un ID valide
         result = get_prediction('123456')
         
         # Vérifier que la fonction a appelé l'API avec les bons paramètres
-        mock_post.assert_called_once_with(
-            'https://credit-scoring-api-8lkh.onrender.com/predict',
+        mock_session.post.assert_called_once_with(
+            f'{API_BASE_URL}/predict',
             json={'SK_ID_CURR': 123456},
-            headers={'Content-Type': 'application/json'},
-            timeout=30
+            timeout=API_TIMEOUT
         )
         
         # Vérifier le résultat
         assert result == {'prediction': 0, 'resultat': 'Crédit accordé'}
     
-    @patch('requests.post')
-    def test_get_prediction_api_error(self, mock_post):
+    def test_get_prediction_api_error(self, mock_session):
         """Tester la gestion d'une erreur de l'API"""
         # Configurer le mock pour simuler une erreur de l'API
         mock_response = MagicMock()
         mock_response.status_code = 404
         mock_response.text = "Not Found"
-        mock_post.return_value = mock_response
+        mock_session.post.return_value = mock_response
         
         # Appeler la fonction avec un ID valide
         result = get_prediction('123456')
@@ -66,11 +79,10 @@ class TestAppFunctions:
         # Vérifier que le message d'erreur est correct
         assert "Erreur dans la prédiction : Code 404" in result
     
-    @patch('requests.post')
-    def test_get_prediction_connection_error(self, mock_post):
+    def test_get_prediction_connection_error(self, mock_session):
         """Tester la gestion d'une erreur de connexion à l'API"""
         # Configurer le mock pour simuler une erreur de connexion
-        mock_post.side_effect = requests.exceptions.ConnectionError("Impossible de se connecter au serveur")
+        mock_session.post.side_effect = requests.exceptions.ConnectionError("Impossible de se connecter au serveur")
         
         # Appeler la fonction avec un ID valide
         result = get_prediction('123456')
@@ -78,18 +90,73 @@ class TestAppFunctions:
         # Vérifier que le message d'erreur est correct
         assert "Erreur de connexion à l'API : " in result
     
-    @patch('requests.post')
-    def test_get_prediction_malformed_response(self, mock_post):
+    def test_get_prediction_malformed_response(self, mock_session):
         """Tester la gestion d'une réponse mal formée de l'API"""
         # Configurer le mock pour simuler une réponse mal formée
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = {"some_other_key": "value"}
         mock_response.text = json.dumps(mock_response.json.return_value)
-        mock_post.return_value = mock_response
+        mock_session.post.return_value = mock_response
         
         # Appeler la fonction avec un ID valide
         result = get_prediction('123456')
         
         # Vérifier que le message d'erreur est correct
-        assert result == "Erreur : La réponse de l'API est mal formée."
\ No newline at end of file
+        assert result == "Erreur : La réponse de l'API est mal formée."
+    
+    def test_default_api_url(self):
+        """Tester que l'API déployée sur Render est utilisée par défaut"""
+        if "API_BASE_URL" not in os.environ:
+            assert API_BASE_URL == 'https://credit-scoring-api-8lkh.onrender.com'
+    
+    def test_get_prediction_cached_by_model_version(self, mock_session):
+        """Tester la mise en cache par client et version du modèle"""
+        mock_session.post.return_value.status_code = 200
+        mock_session.post.return_value.json.return_value = {'prediction': 1, 'resultat': 'Crédit refusé'}
+        
+        get_prediction('123456')
+        get_prediction('123456')
+        assert mock_session.post.call_count == 1
+        
+        # Nouvelle version du modèle: la prédiction est redemandée
+        get_model_version.clear()
+        mock_session.get.return_value.json.return_value = {"active": "v2"}
+        get_prediction('123456')
+        assert mock_session.post.call_count == 2
+    
+    def test_errors_not_cached(self, mock_session):
+        """Tester qu'une erreur n'est pas conservée en cache"""
+        mock_session.post.side_effect = requests.exceptions.ConnectionError("hors ligne")
+        assert "Erreur de connexion" in get_prediction('123456')
+        mock_session.post.side_effect = None
+        mock_session.post.return_value.status_code = 200
+        mock_session.post.return_value.json.return_value = {'prediction': 0, 'resultat': 'Crédit accordé'}
+        assert get_prediction('123456') == {'prediction': 0, 'resultat': 'Crédit accordé'}
+
+
+class TestBatchLookup:
+    
+    def test_parse_ids(self):
+        """Tester la lecture d'une liste d'ID (séparateurs variés, doublons retirés)"""
+        assert parse_ids("100001, 100002\n100003 100001") == (100001, 100002, 100003)
+        with pytest.raises(ValueError, match="entier"):
+            parse_ids("100001, abc")
+        with pytest.raises(ValueError, match="vide"):
+            parse_ids(" ")
+    
+    def test_get_predictions_single_batch_call(self, mock_session):
+        """Tester qu'une liste d'ID est envoyée en un seul appel à /predict/batch"""
+        batch = {"n_found": 2, "n_not_found": 0, "results": [{"SK_ID_CURR": 1}, {"SK_ID_CURR": 2}]}
+        mock_session.post.return_value.status_code = 200
+        mock_session.post.return_value.json.return_value = batch
+        
+        assert get_predictions("1, 2") == batch
+        assert get_predictions("1 2") == batch
+        mock_session.post.assert_called_once_with(f'{API_BASE_URL}/predict/batch', json={'SK_ID_CURR': [1, 2]}, timeout=API_TIMEOUT)
+    
+    def test_get_predictions_api_error(self, mock_session):
+        """Tester la gestion d'une erreur de l'API pour une liste"""
+        mock_session.post.return_value.status_code = 413
+        mock_session.post.return_value.text = "Trop d'identifiants"
+        assert "Code 413" in get_predictions("1, 2")
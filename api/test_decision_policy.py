@@ -0,0 +1,74 @@
+# test_decision_policy.py
+import pytest
+import json
+import numpy as np
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer decision_policy.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from decision_policy import DecisionPolicy
+from feature_store import FeatureStore
+
+POLICY = {
+    "version": "test",
+    "default_threshold": 0.5,
+    "segment_feature": "FLAG_OWN_CAR",
+    "segments": {"0": 0.3, "1": 0.7},
+}
+
+class TestDecisionPolicy:
+    
+    def test_default_policy(self):
+        """Tester la politique par défaut (seuil unique de 0.5)"""
+        policy = DecisionPolicy()
+        
+        assert policy.thresholds_for([0.0, 1.0]).tolist() == [0.5, 0.5]
+    
+    def test_segment_thresholds_vectorized(self):
+        """Tester le seuil de chaque segment et le seuil par défaut hors segments"""
+        policy = DecisionPolicy.from_dict(POLICY)
+        
+        thresholds = policy.thresholds_for(np.array([1.0, 0.0, 2.0, np.nan, -1.0], dtype=np.float32))
+        assert thresholds.tolist() == [0.7, 0.3, 0.5, 0.5, 0.5]
+    
+    def test_invalid_policies(self):
+        """Tester le refus des seuils hors de [0, 1] et des segments sans feature"""
+        with pytest.raises(ValueError):
+            DecisionPolicy.from_dict({"default_threshold": 1.5})
+        with pytest.raises(ValueError):
+            DecisionPolicy.from_dict({"segments": {"0": 0.4}})
+        with pytest.raises(ValueError):
+            DecisionPolicy.from_dict({"segment_feature": "X", "segments": {"cash": 0.4}})
+    
+    def test_fingerprint_changes_with_content(self, tmp_path):
+        """Tester que l'empreinte change avec le contenu du fichier"""
+        path = tmp_path / "policy.json"
+        path.write_text(json.dumps(POLICY))
+        first = DecisionPolicy.load(str(path))
+        path.write_text(json.dumps({**POLICY, "segments": {"0": 0.3, "1": 0.6}}))
+        second = DecisionPolicy.load(str(path))
+        
+        assert first.fingerprint != second.fingerprint
+        assert second.describe()["segments"] == {"0": 0.3, "1": 0.6}
+    
+    def test_compile_row_thresholds(self, synthetic_df):
+        """Tester le seuil précalculé de chaque ligne du magasin et les décisions vectorisées"""
+        store = FeatureStore.from_dataframe(synthetic_df)
+        compiled = DecisionPolicy.from_dict(POLICY).compile(store)
+        
+        expected = np.where(synthetic_df['FLAG_OWN_CAR'] == 1, 0.7, 0.3)
+        np.testing.assert_array_equal(compiled.row_thresholds, expected)
+        assert compiled.threshold_of_row(0) == expected[0]
+        
+        rows = np.array([0, 1, 2])
+        probas = np.array([0.5, 0.5, 0.5])
+        np.testing.assert_array_equal(compiled.decide(probas, rows), probas > expected[rows])
+    
+    def test_compile_without_segment_column(self, sample_df):
+        """Tester le seuil par défaut lorsque la feature de segmentation est absente"""
+        compiled = DecisionPolicy.from_dict(POLICY).compile(FeatureStore.from_dataframe(sample_df))
+        
+        assert compiled.row_thresholds is None
+        assert compiled.thresholds_of_rows(np.array([0, 2])).tolist() == [0.5, 0.5]
@@ -0,0 +1,93 @@
+import pytest
+import numpy as np
+import sys
+import os
+
+# Ajout du répertoire parent au chemin de recherche Python
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from drift_monitor import PSI_SIGNIFICANT, DriftMonitor, DriftReference, bin_rows, sorted_quantiles
+from feature_store import FeatureStore
+
+
+@pytest.fixture
+def reference_store():
+    """Magasin de référence: une feature normale, une feature avec valeurs manquantes, une constante"""
+    rng = np.random.default_rng(0)
+    matrix = np.column_stack([
+        rng.normal(size=2000),
+        np.where(rng.uniform(size=2000) < 0.2, np.nan, rng.uniform(size=2000)),
+        np.ones(2000),
+    ])
+    return FeatureStore(np.arange(2000), matrix, ["normal", "missing", "constant"])
+
+
+class TestDriftReference:
+    
+    def test_quantiles_match_numpy(self):
+        """Tester les quantiles calculés sur les lignes triées contre np.nanquantile"""
+        rng = np.random.default_rng(1)
+        matrix = rng.normal(size=(20, 300))
+        matrix[rng.uniform(size=matrix.shape) < 0.3] = np.nan
+        matrix[4] = np.nan
+        levels = np.arange(1, 10) / 10
+        ordered = np.sort(matrix, axis=1)
+        n_valid = (~np.isnan(matrix)).sum(axis=1)
+        with pytest.warns(RuntimeWarning):
+            expected = np.nanquantile(matrix, levels, axis=1).T
+        np.testing.assert_allclose(sorted_quantiles(ordered, n_valid, levels), expected)
+    
+    def test_reference_proportions(self, reference_store):
+        """Tester que les proportions de référence correspondent au découpage des lignes du magasin"""
+        reference = DriftReference.compute(reference_store)
+        bins = bin_rows(reference.edges, reference_store.matrix.astype(np.float64))
+        for column in range(reference_store.n_features):
+            counts = np.bincount(bins[:, column], minlength=reference.n_bins + 1)
+            np.testing.assert_allclose(reference.proportions[column], counts / len(reference_store))
+        assert reference.proportions[1, -1] == pytest.approx(np.isnan(reference_store.matrix[:, 1]).mean())
+        assert reference.proportions.sum(axis=1) == pytest.approx(np.ones(3))
+
+
+class TestDriftMonitor:
+    
+    def test_no_drift_on_reference_rows(self, reference_store):
+        """Tester l'absence de dérive quand les clients observés suivent la référence"""
+        monitor = DriftMonitor(DriftReference.compute(reference_store))
+        for row in reference_store.matrix[:500]:
+            monitor.update(row)
+        report = monitor.report(top_k=3)
+        assert report["n_observed"] == 500
+        assert report["significant"] is True
+        assert report["n_features_significant"] == 0
+        assert all(feature["psi"] < 0.1 for feature in report["top_features"])
+    
+    def test_update_matches_update_many(self, reference_store):
+        """Tester que la mise à jour ligne par ligne et la mise à jour groupée donnent les mêmes compteurs"""
+        reference = DriftReference.compute(reference_store)
+        one_by_one, grouped = DriftMonitor(reference), DriftMonitor(reference)
+        for row in reference_store.matrix[:300]:
+            one_by_one.update(row)
+        grouped.update_many(reference_store.matrix[:300])
+        np.testing.assert_array_equal(one_by_one.scores()[2], grouped.scores()[2])
+    
+    def test_detects_shift_and_missing_values(self, reference_store):
+        """Tester la détection d'une feature décalée et d'une hausse des valeurs manquantes"""
+        monitor = DriftMonitor(DriftReference.compute(reference_store))
+        shifted = reference_store.matrix[:500].copy()
+        shifted[:, 0] += 2.0
+        shifted[:, 1] = np.nan
+        monitor.update_many(shifted)
+        report = monitor.report(top_k=2)
+        top = {feature["feature"]: feature for feature in report["top_features"]}
+        assert set(top) == {"normal", "missing"}
+        assert top["normal"]["psi"] > PSI_SIGNIFICANT
+        assert top["normal"]["ks"] > 0.5
+        assert top["missing"]["missing_rate"] == 1.0
+        assert report["n_features_significant"] == 2
+    
+    def test_empty_report(self, reference_store):
+        """Tester le rapport avant toute observation"""
+        report = DriftMonitor(DriftReference.compute(reference_store)).report()
+        assert report["n_observed"] == 0
+        assert report["significant"] is False
+        assert report["top_features"] == []
@@ -0,0 +1,77 @@
+# test_explainer.py
+import pytest
+from unittest.mock import MagicMock
+import numpy as np
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer explainer.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from explainer import ShapExplainer, create_explainer, heuristic_contributions, top_contributions
+
+class TestShapExplainer:
+    
+    def test_contributions_sum_to_prediction(self, synthetic_df, lgbm_model):
+        """Tester que valeur de base + contributions redonnent le score brut et la probabilité du modèle"""
+        X = synthetic_df.drop('SK_ID_CURR', axis=1).to_numpy(dtype=np.float32)
+        
+        probas, contributions, base_values = ShapExplainer(lgbm_model).explain(X)
+        
+        assert contributions.shape == X.shape
+        raw_scores = lgbm_model.predict_proba(X, raw_score=True)
+        np.testing.assert_allclose(contributions.sum(axis=1) + base_values, raw_scores, atol=1e-10)
+        np.testing.assert_allclose(probas, lgbm_model.predict_proba(X)[:, 1], atol=1e-12)
+        # La valeur de base est l'espérance du modèle, identique pour tous les clients
+        assert np.ptp(base_values) == 0
+    
+    def test_unused_feature_has_no_contribution(self, synthetic_df, lgbm_model):
+        """Tester qu'une feature constante (jamais utilisée) a une contribution nulle"""
+        X = synthetic_df.drop('SK_ID_CURR', axis=1).to_numpy(dtype=np.float32)
+        constant = synthetic_df.columns.drop('SK_ID_CURR').get_loc('CONSTANT')
+        
+        _, contributions, _ = ShapExplainer(lgbm_model).explain(X)
+        
+        assert np.all(contributions[:, constant] == 0)
+
+class TestCreateExplainer:
+    
+    def test_shap_for_lightgbm(self, lgbm_model):
+        """Tester le choix de TreeSHAP pour un modèle LightGBM binaire"""
+        assert isinstance(create_explainer(lgbm_model, "shap"), ShapExplainer)
+        assert create_explainer(lgbm_model, "heuristic") is None
+    
+    def test_heuristic_for_other_models(self):
+        """Tester le repli sur l'heuristique pour un modèle sans Booster LightGBM"""
+        assert create_explainer(MagicMock(), "shap") is None
+    
+    def test_unknown_method(self, lgbm_model):
+        """Tester le refus d'une méthode inconnue"""
+        with pytest.raises(ValueError):
+            create_explainer(lgbm_model, "lime")
+
+class TestContributionHelpers:
+    
+    def test_top_contributions_sorted_by_magnitude(self):
+        """Tester la sélection des k plus fortes contributions en valeur absolue, ligne par ligne"""
+        contributions = np.array([[0.1, -0.5, 0.3, 0.0], [2.0, 0.0, -3.0, 1.0]])
+        
+        indices, values = top_contributions(contributions, 2)
+        
+        np.testing.assert_array_equal(indices, [[1, 2], [2, 0]])
+        np.testing.assert_array_equal(values, [[-0.5, 0.3], [-3.0, 2.0]])
+    
+    def test_top_contributions_k_larger_than_features(self):
+        """Tester que k est borné par le nombre de features"""
+        indices, _ = top_contributions(np.array([0.2, -0.1]), 10)
+        assert indices.shape == (1, 2)
+    
+    def test_heuristic_contributions(self):
+        """Tester l'heuristique: écart relatif à la moyenne borné à [-2, 2], signe selon la décision"""
+        contributions = heuristic_contributions(
+            np.array([4.0, 1.0, np.nan]), np.array([2.0, 0.0, 1.0]), np.array([10.0, 10.0, 10.0]), prediction=0
+        )
+        np.testing.assert_allclose(contributions, [0.5, 0.5, 0.0])
+        
+        refused = heuristic_contributions(np.array([10.0]), np.array([1.0]), np.array([10.0]), prediction=1)
+        np.testing.assert_allclose(refused, [-1.0])
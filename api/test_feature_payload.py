@@ -0,0 +1,70 @@
+import pytest
+import json
+import numpy as np
+import sys
+import os
+
+# Ajout du répertoire parent au chemin de recherche Python
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from feature_payload import ARROW_CONTENT_TYPE, parse_payload
+
+FEATURES = ["A", "B", "C"]
+COLUMN_INDEX = {name: i for i, name in enumerate(FEATURES)}
+
+
+def parse(payload, content_type="application/json"):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    return parse_payload(body, content_type, COLUMN_INDEX, len(FEATURES))
+
+
+class TestJsonPayloads:
+    
+    def test_sparse_vector(self):
+        """Tester qu'un vecteur creux est aligné sur l'ordre du modèle et complété par des NaN"""
+        payload = parse({"features": {"C": 3, "A": 1, "B": None}})
+        assert payload.single is True
+        assert payload.features.dtype == np.float32
+        np.testing.assert_array_equal(payload.features, [[1, np.nan, 3]])
+    
+    def test_full_vector(self):
+        """Tester un vecteur complet dans l'ordre du modèle"""
+        payload = parse({"features": [1, 2, 3]})
+        np.testing.assert_array_equal(payload.features, [[1, 2, 3]])
+        with pytest.raises(ValueError, match="Vecteur"):
+            parse({"features": [1, 2]})
+    
+    def test_records_and_columns(self):
+        """Tester qu'un lot par ligne et le même lot par colonne donnent la même matrice"""
+        records = parse({"features": [{"SK_ID_CURR": 10, "A": 1}, {"SK_ID_CURR": 11, "B": 2, "C": 3}]})
+        columns = parse({"columns": {"SK_ID_CURR": [10, 11], "A": [1, None], "B": [None, 2], "C": [None, 3]}})
+        assert records.single is False
+        assert records.ids == columns.ids == [10, 11]
+        np.testing.assert_array_equal(records.features, columns.features)
+    
+    @pytest.mark.parametrize("payload, message", [
+        ({"features": {"D": 1}}, "inconnues"),
+        ({"features": {"A": "x"}}, "non numériques"),
+        ({"columns": {"A": [1, 2], "B": [1]}}, "longueurs"),
+        ({"columns": {"A": 1}}, "liste"),
+        ({"SK_ID_CURR": 1}, "features"),
+        (b"{", "JSON invalide"),
+    ])
+    def test_invalid_payloads(self, payload, message):
+        """Tester les erreurs de validation"""
+        with pytest.raises(ValueError, match=message):
+            parse(payload)
+
+
+class TestArrowPayload:
+    
+    def test_arrow_stream(self):
+        """Tester la lecture d'un lot au format Arrow IPC (valeurs nulles converties en NaN)"""
+        pa = pytest.importorskip("pyarrow")
+        table = pa.table({"SK_ID_CURR": [10, 11], "B": [2.0, None], "A": [1, 4]})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        payload = parse(sink.getvalue().to_pybytes(), ARROW_CONTENT_TYPE)
+        assert payload.ids == [10, 11]
+        np.testing.assert_array_equal(payload.features, [[1, 2, np.nan], [4, np.nan, np.nan]])
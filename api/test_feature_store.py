@@ -0,0 +1,158 @@
+# test_feature_store.py
+import pytest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer feature_store.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from feature_store import FeatureProjection, FeatureStore, convert_csv
+
+class TestFeatureStore:
+    
+    def test_get_returns_float32_row_view(self, sample_df):
+        """Tester que la ligne retournée est une vue float32 contiguë dans l'ordre des colonnes"""
+        store = FeatureStore.from_dataframe(sample_df)
+        
+        row = store.get(100002)
+        
+        assert row.dtype == np.float32
+        assert row.flags['C_CONTIGUOUS']
+        assert np.shares_memory(row, store.matrix)
+        np.testing.assert_array_equal(row, [2, 5, 8])
+        assert store.feature_names == ['Feature1', 'Feature2', 'Feature3']
+    
+    def test_get_unknown_id(self, sample_df):
+        """Tester qu'un identifiant inconnu retourne None"""
+        store = FeatureStore.from_dataframe(sample_df)
+        
+        assert store.get(999999) is None
+        assert 999999 not in store
+        assert 100001 in store
+    
+    def test_feature_order_follows_model(self, sample_df):
+        """Tester que l'ordre des colonnes imposé par le modèle est respecté"""
+        store = FeatureStore.from_dataframe(sample_df, ['Feature3', 'Feature1', 'Feature2'])
+        
+        np.testing.assert_array_equal(store.get(100001), [7, 1, 4])
+        assert store.column_index['Feature3'] == 0
+    
+    def test_missing_id_column(self):
+        """Tester l'erreur quand la colonne SK_ID_CURR est absente"""
+        with pytest.raises(ValueError, match="SK_ID_CURR"):
+            FeatureStore.from_dataframe(pd.DataFrame({'Feature1': [1, 2]}))
+    
+    def test_missing_model_feature(self, sample_df):
+        """Tester l'erreur quand une feature attendue par le modèle est absente"""
+        with pytest.raises(ValueError, match="absentes"):
+            FeatureStore.from_dataframe(sample_df, ['Feature1', 'Inconnue'])
+    
+    def test_duplicate_ids_keep_first(self):
+        """Tester qu'en cas de doublon la première occurrence est conservée"""
+        df = pd.DataFrame({'SK_ID_CURR': [1, 2, 1], 'Feature1': [10, 20, 30]})
+        store = FeatureStore.from_dataframe(df)
+        
+        assert store.row_of(1) == 0
+        assert store.get(1)[0] == 10
+    
+    def test_take_preserves_request_order(self, sample_df):
+        """Tester que `take` retourne les lignes trouvées dans l'ordre demandé"""
+        store = FeatureStore.from_dataframe(sample_df)
+        
+        matrix, found = store.take([100003, 42, 100001])
+        
+        np.testing.assert_array_equal(found, [True, False, True])
+        np.testing.assert_array_equal(matrix[:, 0], [3, 1])
+        assert matrix.dtype == np.float32
+
+class TestBinaryFeatureStore:
+    
+    def test_convert_csv_and_load_memmap(self, sample_df, tmp_path):
+        """Tester la conversion du CSV par blocs puis le chargement par projection mémoire"""
+        csv_path = tmp_path / 'clients.csv'
+        sample_df.to_csv(csv_path, index=False)
+        
+        n_rows, n_features = convert_csv(csv_path, tmp_path / 'store', chunksize=2)
+        store = FeatureStore.load(tmp_path / 'store')
+        
+        assert (n_rows, n_features) == (3, 3)
+        assert isinstance(store.matrix.base, np.memmap) or isinstance(store.matrix, np.memmap)
+        assert store.feature_names == ['Feature1', 'Feature2', 'Feature3']
+        np.testing.assert_array_equal(store.get(100003), [3, 6, 9])
+        np.testing.assert_array_equal(store.matrix, FeatureStore.from_dataframe(sample_df).matrix)
+    
+    def test_convert_csv_pruned_to_model_features(self, synthetic_df, lgbm_model, tmp_path):
+        """Tester la conversion réduite aux features lues par le modèle et à la feature de segmentation"""
+        csv_path = tmp_path / 'clients.csv'
+        synthetic_df.to_csv(csv_path, index=False)
+        
+        n_rows, n_features = convert_csv(csv_path, tmp_path / 'store', model=lgbm_model, segment_feature='FLAG_OWN_CAR')
+        store = FeatureStore.load(tmp_path / 'store')
+        
+        assert (n_rows, n_features) == (len(synthetic_df), 4)
+        assert store.mapped
+        assert store.feature_names == ['EXT_SOURCE_1', 'EXT_SOURCE_2', 'AMT_CREDIT', 'FLAG_OWN_CAR']
+        assert store.model_feature_names == [column for column in synthetic_df.columns if column != 'SK_ID_CURR']
+        np.testing.assert_array_equal(store.matrix, FeatureStore.from_dataframe(synthetic_df).reorder(store.feature_names).matrix)
+        
+        # Reconversion complète dans le même répertoire: plus d'ordre du modèle
+        convert_csv(csv_path, tmp_path / 'store')
+        assert FeatureStore.load(tmp_path / 'store').model_feature_names is None
+    
+    def test_save_and_load_roundtrip(self, sample_df, tmp_path):
+        """Tester qu'un magasin sauvegardé se recharge à l'identique"""
+        store = FeatureStore.from_dataframe(sample_df)
+        store.save(tmp_path)
+        
+        loaded = FeatureStore.load(tmp_path, mmap=False)
+        
+        np.testing.assert_array_equal(loaded.ids, store.ids)
+        np.testing.assert_array_equal(loaded.matrix, store.matrix)
+    
+    def test_reorder(self, sample_df):
+        """Tester la réorganisation des colonnes dans l'ordre du modèle"""
+        store = FeatureStore.from_dataframe(sample_df)
+        
+        assert store.reorder(store.feature_names) is store
+        reordered = store.reorder(['Feature2', 'Feature1', 'Feature3'])
+        np.testing.assert_array_equal(reordered.get(100001), [4, 1, 7])
+
+
+class TestFeatureProjection:
+    
+    def test_expand_and_project(self, sample_df):
+        """Tester le passage des colonnes d'un magasin réduit à l'ordre complet du modèle et inversement"""
+        store = FeatureStore.from_dataframe(sample_df).reorder(['Feature1', 'Feature3'])
+        projection = FeatureProjection(['Feature1', 'Feature2', 'Feature3'], store.feature_names)
+        
+        full = projection.expand(store.matrix)
+        
+        assert projection.n_model_features == 3
+        assert full.dtype == np.float32
+        np.testing.assert_array_equal(full[:, [0, 2]], store.matrix)
+        assert np.isnan(full[:, 1]).all()
+        np.testing.assert_array_equal(projection.project(full), store.matrix)
+    
+    def test_expand_reuses_thread_buffer(self, sample_df):
+        """Tester que la matrice complète est réutilisée d'un appel à l'autre sans perdre les NaN des colonnes retirées"""
+        from feature_store import EXPAND_BUFFER_ROWS
+        store = FeatureStore.from_dataframe(sample_df).reorder(['Feature1', 'Feature3'])
+        projection = FeatureProjection(['Feature1', 'Feature2', 'Feature3'], store.feature_names)
+        
+        first = projection.expand(store.matrix)
+        second = projection.expand(store.matrix[1:])
+        large = projection.expand(np.zeros((EXPAND_BUFFER_ROWS + 1, 2), dtype=np.float32))
+        
+        assert np.shares_memory(first, second)
+        assert second.flags.c_contiguous
+        np.testing.assert_array_equal(second[:, [0, 2]], store.matrix[1:])
+        assert np.isnan(second[:, 1]).all()
+        assert large.shape == (EXPAND_BUFFER_ROWS + 1, 3)
+        assert not np.shares_memory(large, first)
+    
+    def test_unknown_store_feature(self):
+        """Tester le refus d'une colonne du magasin inconnue du modèle"""
+        with pytest.raises(ValueError, match="inconnues du modèle"):
+            FeatureProjection(['Feature1', 'Feature2'], ['Feature1', 'Other'])
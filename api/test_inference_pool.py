@@ -0,0 +1,67 @@
+# test_inference_pool.py
+import pytest
+import asyncio
+import threading
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer inference_pool.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from inference_pool import InferencePool, PoolSaturatedError
+from metrics import Histogram
+
+class TestInferencePool:
+    
+    def test_run_returns_result(self):
+        """Tester qu'une tâche exécutée dans le pool retourne son résultat"""
+        pool = InferencePool(max_workers=2, max_queue=2)
+        
+        assert asyncio.run(pool.run(sum, [1, 2, 3])) == 6
+        assert pool.stats()["completed"] == 1
+        pool.shutdown()
+    
+    def test_run_propagates_exception(self):
+        """Tester que l'exception levée dans le pool est propagée à l'appelant"""
+        pool = InferencePool(max_workers=1, max_queue=0)
+        
+        def fail():
+            raise ValueError("données invalides")
+        
+        with pytest.raises(ValueError, match="données invalides"):
+            asyncio.run(pool.run(fail))
+        assert pool.stats()["in_flight"] == 0
+        pool.shutdown()
+    
+    def test_saturation_rejects_and_recovers(self):
+        """Tester le refus immédiat quand le pool et la file sont pleins, puis la libération des places"""
+        pool = InferencePool(max_workers=1, max_queue=1)
+        release = threading.Event()
+        
+        running = pool.submit(release.wait)
+        queued = pool.submit(release.wait)
+        with pytest.raises(PoolSaturatedError):
+            pool.submit(release.wait)
+        
+        stats = pool.stats()
+        assert stats["in_flight"] == 2
+        assert stats["rejected"] == 1
+        
+        release.set()
+        running.result(timeout=5)
+        queued.result(timeout=5)
+        pool.shutdown()
+        
+        assert pool.stats()["in_flight"] == 0
+        assert pool.stats()["wait"]["count"] == 2
+    
+    def test_wait_histogram_observes_each_task(self):
+        """Tester l'export du temps d'attente dans la file vers l'histogramme des métriques"""
+        histogram = Histogram("pool_wait_seconds", "Attente")
+        pool = InferencePool(max_workers=1, max_queue=2, wait_histogram=histogram)
+        
+        for value in range(3):
+            pool.submit(abs, value).result(timeout=5)
+        pool.shutdown()
+        
+        assert "pool_wait_seconds_count 3" in histogram.render()
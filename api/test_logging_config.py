@@ -0,0 +1,102 @@
+# test_logging_config.py
+import pytest
+import io
+import json
+import logging
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer logging_config.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import logging_config
+from logging_config import JsonFormatter, RequestLoggingMiddleware, configure_logging, request_id_var
+
+@pytest.fixture
+def log_stream():
+    """Journaux écrits dans un tampon, configuration par défaut restaurée ensuite"""
+    stream = io.StringIO()
+    configure_logging(level="INFO", fmt="json", stream=stream)
+    yield stream
+    configure_logging()
+
+def read_lines(stream):
+    # Arrêt du thread d'écriture: la file est vidée avant de lire le tampon
+    logging_config.shutdown_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+class TestLoggingConfig:
+    
+    def test_json_lines_with_request_id_and_extra(self, log_stream):
+        """Tester une ligne JSON avec l'identifiant de requête et les champs supplémentaires"""
+        token = request_id_var.set("abc123")
+        try:
+            logging.getLogger("test").info("Client %s trouvé", 100001, extra={"duration_ms": 1.5})
+        finally:
+            request_id_var.reset(token)
+        
+        entry = read_lines(log_stream)[0]
+        assert entry["message"] == "Client 100001 trouvé"
+        assert entry["level"] == "INFO"
+        assert entry["request_id"] == "abc123"
+        assert entry["duration_ms"] == 1.5
+    
+    def test_disabled_level_not_formatted(self, log_stream):
+        """Tester qu'un niveau désactivé n'évalue pas les arguments"""
+        class Exploding:
+            def __str__(self):
+                raise AssertionError("formaté alors que DEBUG est désactivé")
+        
+        logging.getLogger("test").debug("Valeur: %s", Exploding())
+        
+        assert read_lines(log_stream) == []
+    
+    def test_exception_logged_through_queue(self, log_stream):
+        """Tester la trace d'une exception journalisée par la file et le thread d'écriture"""
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("test").exception("Erreur pour le client %s", 100001)
+        
+        entry = read_lines(log_stream)[0]
+        assert entry["message"] == "Erreur pour le client 100001"
+        assert "ValueError: boom" in entry["exception"]
+        assert "Traceback" not in entry["message"]
+    
+    def test_json_formatter_exception(self):
+        """Tester la présence de la trace d'une exception"""
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.getLogger("test").makeRecord("test", logging.ERROR, __file__, 1, "Erreur", None, sys.exc_info())
+        
+        entry = json.loads(JsonFormatter().format(record))
+        assert "ValueError: boom" in entry["exception"]
+
+class TestRequestLoggingMiddleware:
+    
+    def test_request_id_header_and_access_log(self, log_stream):
+        """Tester la propagation de X-Request-ID et la ligne d'accès avec la durée"""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        
+        app = FastAPI()
+        
+        @app.get("/ping")
+        def ping():
+            logging.getLogger("test").info("Dans la requête")
+            return {"ok": True}
+        
+        app.add_middleware(RequestLoggingMiddleware)
+        
+        with TestClient(app) as client:
+            provided = client.get("/ping", headers={"X-Request-ID": "client-42"})
+            generated = client.get("/ping")
+        
+        assert provided.headers["x-request-id"] == "client-42"
+        assert len(generated.headers["x-request-id"]) == 32
+        
+        entries = [entry for entry in read_lines(log_stream) if entry.get("request_id") == "client-42"]
+        assert [entry["message"] for entry in entries] == ["Dans la requête", "GET /ping 200"]
+        assert entries[1]["status"] == 200
+        assert entries[1]["duration_ms"] >= 0
@@ -1,5 +1,6 @@
 # test_main.py
 import pytest
+import json
 from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
 import pandas as pd
@@ -12,7 +13,14 @@ import joblib
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 # Importer l'application FastAPI et les fonctions à tester
-from main import app, load_dataframe, load_model
+from main import (
+    app, load_artifacts, load_dataframe, load_model, preload_artifacts,
+    score_client, score_clients, score_micro_batch,
+)
+from feature_store import FeatureStore
+from inference_pool import PoolSaturatedError
+from micro_batching import MicroBatcher
+from responses import dumps
 
 # Créer un client de test
 client = TestClient(app)
@@ -117,8 +125,9 @@ class TestAPIEndpoints:
         mock_load_dataframe.return_value = test_df
         mock_load_model.return_value = test_model
         
-        # Faire la requête de test
-        response = client.post("/predict", json={"SK_ID_CURR": 100001})
+        # Faire la requête de test (le contexte déclenche le chargement au démarrage)
+        with TestClient(app) as client:
+            response = client.post("/predict", json={"SK_ID_CURR": 100001})
         
         # Vérifier la réponse
         assert response.status_code == 200
@@ -129,7 +138,8 @@ class TestAPIEndpoints:
         assert "feature_importance" in response_json
     
     @patch('main.load_dataframe')
-    def test_predict_api_id_not_found(self, mock_load_dataframe):
+    @patch('main.load_model')
+    def test_predict_api_id_not_found(self, mock_load_model, mock_load_dataframe):
         """Tester l'endpoint de prédiction quand l'ID n'est pas trouvé"""
         # Créer un DataFrame de test sans l'ID demandé
         test_df = pd.DataFrame({
@@ -138,31 +148,975 @@ class TestAPIEndpoints:
             'Feature2': [3, 4]
         })
         
-        # Configurer le mock
+        # Configurer les mocks
         mock_load_dataframe.return_value = test_df
+        mock_load_model.return_value = MagicMock()
         
         # Faire la requête de test avec un ID non présent
-        response = client.post("/predict", json={"SK_ID_CURR": 999999})
+        with TestClient(app) as client:
+            response = client.post("/predict", json={"SK_ID_CURR": 999999})
         
         # Vérifier la réponse
         assert response.status_code == 404
         assert "non trouvé dans le DataFrame" in response.json()["detail"]
     
     @patch('main.load_dataframe')
-    def test_predict_api_missing_column(self, mock_load_dataframe):
-        """Tester l'endpoint de prédiction quand la colonne SK_ID_CURR est manquante"""
+    @patch('main.load_model')
+    def test_predict_api_missing_column(self, mock_load_model, mock_load_dataframe):
+        """Tester le chargement quand la colonne SK_ID_CURR est manquante"""
         # Créer un DataFrame de test sans la colonne SK_ID_CURR
         test_df = pd.DataFrame({
             'Feature1': [1, 2],
             'Feature2': [3, 4]
         })
         
-        # Configurer le mock
+        # Configurer les mocks
         mock_load_dataframe.return_value = test_df
+        mock_load_model.return_value = MagicMock()
         
-        # Faire la requête de test
-        response = client.post("/predict", json={"SK_ID_CURR": 100001})
+        # Le chargement échoue avec un message explicite
+        with pytest.raises(ValueError, match="La colonne 'SK_ID_CURR' est manquante"):
+            load_artifacts()
         
-        # Vérifier la réponse
-        assert response.status_code == 400
-        assert "La colonne 'SK_ID_CURR' est manquante" in response.json()["detail"]
\ No newline at end of file
+        # L'API démarre quand même mais refuse les prédictions
+        with TestClient(app) as client:
+            response = client.post("/predict", json={"SK_ID_CURR": 100001})
+        assert response.status_code == 503
+
+class TestArtifactsLifecycle:
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_artifacts_loaded_once(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester que les artefacts sont chargés au démarrage et non à chaque requête"""
+        mock_load_dataframe.return_value = sample_df
+        mock_model.predict_proba.return_value = np.array([[0.7, 0.3]])
+        mock_model.feature_importances_ = np.array([1, 2, 3])
+        mock_load_model.return_value = mock_model
+        
+        with TestClient(app) as client:
+            for sk_id in [100001, 100002, 100003]:
+                response = client.post("/predict", json={"SK_ID_CURR": sk_id})
+                assert response.status_code == 200
+        
+        assert mock_load_dataframe.call_count == 1
+        assert mock_load_model.call_count == 1
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_reload_swaps_artifacts(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester que /reload remplace les artefacts actifs"""
+        mock_load_dataframe.return_value = sample_df
+        mock_model.predict_proba.return_value = np.array([[0.7, 0.3]])
+        mock_model.feature_importances_ = np.array([1, 2, 3])
+        mock_load_model.return_value = mock_model
+        
+        with TestClient(app) as client:
+            assert client.post("/predict", json={"SK_ID_CURR": 100004}).status_code == 404
+            
+            # Nouveau fichier de données contenant un client supplémentaire
+            new_df = pd.concat([sample_df, pd.DataFrame({
+                'SK_ID_CURR': [100004], 'Feature1': [4], 'Feature2': [7], 'Feature3': [10]
+            })], ignore_index=True)
+            mock_load_dataframe.return_value = new_df
+            
+            response = client.post("/reload")
+            assert response.status_code == 200
+            assert "total_s" in response.json()["load_durations"]
+            assert client.post("/predict", json={"SK_ID_CURR": 100004}).status_code == 200
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_reload_failure_keeps_previous_artifacts(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester qu'un rechargement en échec laisse les anciens artefacts actifs"""
+        mock_load_dataframe.return_value = sample_df
+        mock_model.predict_proba.return_value = np.array([[0.7, 0.3]])
+        mock_model.feature_importances_ = np.array([1, 2, 3])
+        mock_load_model.return_value = mock_model
+        
+        with TestClient(app) as client:
+            mock_load_dataframe.side_effect = FileNotFoundError("Fichier df_test_reduit.csv introuvable.")
+            response = client.post("/reload")
+            assert response.status_code == 500
+            assert client.post("/predict", json={"SK_ID_CURR": 100001}).status_code == 200
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_load_binary_feature_store(self, mock_load_model, mock_load_dataframe, sample_df, mock_model, tmp_path):
+        """Tester le chargement depuis le magasin binaire lorsque FEATURE_STORE_PATH est défini"""
+        FeatureStore.from_dataframe(sample_df).save(tmp_path)
+        mock_model.predict_proba.return_value = np.array([[0.7, 0.3]])
+        mock_model.feature_importances_ = np.array([1, 2, 3])
+        mock_load_model.return_value = mock_model
+        
+        with patch.dict(os.environ, {"FEATURE_STORE_PATH": str(tmp_path)}):
+            with TestClient(app) as client:
+                response = client.post("/predict", json={"SK_ID_CURR": 100002})
+        
+        assert response.status_code == 200
+        mock_load_dataframe.assert_not_called()
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_preloaded_artifacts_not_reloaded_by_workers(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester que des artefacts préchargés avant le fork ne sont pas rechargés au démarrage d'un worker"""
+        mock_load_dataframe.return_value = sample_df
+        mock_load_model.return_value = mock_model
+        
+        try:
+            preload_artifacts(app)
+            with TestClient(app):
+                pass
+            assert mock_load_dataframe.call_count == 1
+            assert app.state.artifacts is not None
+        finally:
+            app.state.preloaded = False
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_population_scored_after_fork(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester qu'aucune prédiction n'est faite avant le fork et que le worker score le portefeuille en arrière-plan"""
+        import threading
+        mock_load_dataframe.return_value = sample_df
+        mock_load_model.return_value = mock_model
+        
+        try:
+            preload_artifacts(app)
+            assert mock_model.predict_proba.call_count == 0
+            assert not app.state.artifacts.distribution.ready
+            with TestClient(app):
+                for thread in threading.enumerate():
+                    if thread.name == "population-scores":
+                        thread.join(timeout=10)
+                assert app.state.artifacts.distribution.ready
+            assert mock_model.predict_proba.call_count == 1
+        finally:
+            app.state.preloaded = False
+    
+    @patch.dict(os.environ, {"ADMIN_TOKEN": "secret"})
+    def test_reload_requires_admin_token(self):
+        """Tester que /reload est protégé lorsque ADMIN_TOKEN est défini"""
+        response = client.post("/reload")
+        assert response.status_code == 403
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_stats_endpoint(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester que /stats expose les temps de chargement et la latence par route"""
+        mock_load_dataframe.return_value = sample_df
+        mock_model.predict_proba.return_value = np.array([[0.7, 0.3]])
+        mock_model.feature_importances_ = np.array([1, 2, 3])
+        mock_load_model.return_value = mock_model
+        
+        with TestClient(app) as client:
+            client.post("/predict", json={"SK_ID_CURR": 100001})
+            response = client.get("/stats")
+        
+        assert response.status_code == 200
+        stats = response.json()
+        assert stats["artifacts_loaded"] is True
+        assert "total_s" in stats["load_durations"]
+        assert stats["latency"]["POST /predict"]["count"] >= 1
+        assert "p99_ms" in stats["latency"]["POST /predict"]
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_metrics_endpoint(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester que /metrics expose les étapes du scoring, les codes de statut et les jauges"""
+        mock_load_dataframe.return_value = sample_df
+        mock_model.predict_proba.return_value = np.array([[0.7, 0.3]])
+        mock_model.feature_importances_ = np.array([1, 2, 3])
+        mock_load_model.return_value = mock_model
+        
+        with TestClient(app) as client:
+            client.post("/predict?explain=false", json={"SK_ID_CURR": 100002})
+            client.post("/predict", json={"SK_ID_CURR": 999999})
+            response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        for stage in ("lookup", "features", "predict", "response", "serialization"):
+            assert f'credit_scoring_stage_seconds_count{{endpoint="predict",stage="{stage}"}}' in text
+        assert 'credit_scoring_requests_total{method="POST",route="/predict",status="200"}' in text
+        assert 'credit_scoring_requests_total{method="POST",route="/predict",status="404"}' in text
+        assert 'credit_scoring_artifact_load_seconds{step="total"}' in text
+        assert "credit_scoring_inference_pool_queue_depth" in text
+        assert "credit_scoring_inference_pool_wait_seconds_count" in text
+        assert "credit_scoring_drift_observations 1" in text
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_metrics_with_redis_cache(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester /metrics avec le cache Redis, qui ne suit ni sa taille ni ses évictions"""
+        from prediction_cache import RedisCache
+        mock_load_dataframe.return_value = sample_df
+        mock_load_model.return_value = mock_model
+        redis_client = MagicMock()
+        redis_client.get.return_value = None
+        redis_client.scan_iter.return_value = []
+        
+        with patch('main.prediction_cache', RedisCache(url=None, client=redis_client)):
+            with TestClient(app) as client:
+                client.post("/predict?explain=false", json={"SK_ID_CURR": 100002})
+                response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert "credit_scoring_cache_misses 1" in response.text
+        samples = [line for line in response.text.splitlines() if not line.startswith("#")]
+        assert not any(line.startswith(("credit_scoring_cache_size", "credit_scoring_cache_evictions")) for line in samples)
+    
+    @patch('main.load_dataframe')
+    def test_drift_endpoint(self, mock_load_dataframe, synthetic_df, lgbm_model):
+        """Tester que /drift compte les clients scorés (y compris depuis le cache) et classe les features par PSI"""
+        mock_load_dataframe.return_value = synthetic_df
+        # Features surveillées: celles lues par le modèle (magasin réduit), dont AMT_CREDIT
+        largest = synthetic_df.nlargest(50, 'AMT_CREDIT')['SK_ID_CURR'].tolist()
+        
+        with patch('main.load_model', return_value=lgbm_model):
+            with TestClient(app) as client:
+                empty = client.get("/drift").json()
+                for sk_id in largest + largest[:10]:
+                    client.post("/predict?explain=false", json={"SK_ID_CURR": sk_id})
+                client.post("/predict", json={"SK_ID_CURR": 999999})
+                report = client.get("/drift?top=3").json()
+                invalid = client.get("/drift?top=0")
+        
+        assert empty["n_observed"] == 0
+        assert report["n_observed"] == 60
+        assert len(report["top_features"]) == 3
+        assert report["top_features"][0]["feature"] == "AMT_CREDIT"
+        assert report["top_features"][0]["psi"] >= report["top_features"][1]["psi"]
+        assert invalid.status_code == 422
+
+class TestBatchEndpoint:
+    
+    @staticmethod
+    def _model_from_feature1():
+        """Modèle mock dont la probabilité de défaut vaut Feature1 / 10"""
+        model = MagicMock()
+        model.predict_proba.side_effect = lambda X: np.column_stack([1 - X[:, 0] / 10, X[:, 0] / 10])
+        return model
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_predict_batch_order_and_not_found(self, mock_load_model, mock_load_dataframe):
+        """Tester que les résultats suivent l'ordre de la requête, avec les identifiants inconnus signalés"""
+        mock_load_dataframe.return_value = pd.DataFrame({
+            'SK_ID_CURR': [100001, 100002, 100003],
+            'Feature1': [2, 8, 4],
+            'Feature2': [0, 0, 0]
+        })
+        test_model = self._model_from_feature1()
+        mock_load_model.return_value = test_model
+        
+        with TestClient(app) as client:
+            # Appel du scoring du portefeuille au chargement
+            test_model.predict_proba.reset_mock()
+            response = client.post("/predict/batch", json={"SK_ID_CURR": [100003, 999999, 100002, 100001]})
+        
+        assert response.status_code == 200
+        body = response.json()
+        assert body["n_found"] == 3
+        assert body["n_not_found"] == 1
+        results = body["results"]
+        assert [r["SK_ID_CURR"] for r in results] == [100003, 999999, 100002, 100001]
+        assert results[1]["found"] is False
+        assert results[0]["proba"] == pytest.approx(0.4)
+        assert results[2]["prediction"] == 1
+        assert results[2]["resultat"] == "Crédit refusé"
+        assert results[3]["prediction"] == 0
+        
+        # Une seule prédiction vectorisée pour tout le lot
+        assert test_model.predict_proba.call_count == 1
+        assert test_model.predict_proba.call_args[0][0].shape == (3, 2)
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_predict_batch_all_unknown(self, mock_load_model, mock_load_dataframe, sample_df):
+        """Tester un lot sans aucun identifiant connu: aucun appel au modèle"""
+        mock_load_dataframe.return_value = sample_df
+        test_model = self._model_from_feature1()
+        mock_load_model.return_value = test_model
+        
+        with TestClient(app) as client:
+            test_model.predict_proba.reset_mock()
+            response = client.post("/predict/batch", json={"SK_ID_CURR": [1, 2]})
+        
+        assert response.status_code == 200
+        assert response.json()["n_found"] == 0
+        test_model.predict_proba.assert_not_called()
+    
+    @patch('main.MAX_BATCH_SIZE', 2)
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_predict_batch_too_large(self, mock_load_model, mock_load_dataframe, sample_df):
+        """Tester le refus d'un lot dépassant la taille maximale"""
+        mock_load_dataframe.return_value = sample_df
+        mock_load_model.return_value = self._model_from_feature1()
+        
+        with TestClient(app) as client:
+            response = client.post("/predict/batch", json={"SK_ID_CURR": [100001, 100002, 100003]})
+        
+        assert response.status_code == 413
+
+class TestInferencePoolEndpoints:
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_predict_pool_saturated(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester la réponse 503 avec Retry-After lorsque le pool d'inférence est saturé"""
+        mock_load_dataframe.return_value = sample_df
+        mock_load_model.return_value = mock_model
+        saturated_pool = MagicMock()
+        saturated_pool.run.side_effect = PoolSaturatedError("Pool d'inférence saturé")
+        
+        with patch('main.inference_pool', saturated_pool):
+            with TestClient(app) as client:
+                response = client.post("/predict", json={"SK_ID_CURR": 100001})
+                batch_response = client.post("/predict/batch", json={"SK_ID_CURR": [100001]})
+        
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+        assert batch_response.status_code == 503
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_stats_expose_pool(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester que /stats expose la profondeur de file et le temps d'attente du pool"""
+        mock_load_dataframe.return_value = sample_df
+        mock_model.predict_proba.return_value = np.array([[0.7, 0.3]])
+        mock_model.feature_importances_ = np.array([1, 2, 3])
+        mock_load_model.return_value = mock_model
+        
+        with TestClient(app) as client:
+            client.post("/predict", json={"SK_ID_CURR": 100001})
+            pool_stats = client.get("/stats").json()["inference_pool"]
+        
+        assert pool_stats["queue_depth"] == 0
+        assert pool_stats["wait"]["count"] >= 1
+
+class TestMicroBatchingEndpoint:
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_predict_through_micro_batcher(self, mock_load_model, mock_load_dataframe, sample_df):
+        """Tester que /predict passe par le micro-batching lorsqu'il est activé"""
+        mock_load_dataframe.return_value = sample_df
+        test_model = MagicMock()
+        test_model.predict_proba.side_effect = lambda X: np.column_stack([1 - X[:, 0] / 10, X[:, 0] / 10])
+        test_model.feature_importances_ = np.array([1, 2, 3])
+        mock_load_model.return_value = test_model
+        batcher = MicroBatcher(score_micro_batch, max_batch_size=8, max_wait_s=0.001)
+        
+        with patch('main.micro_batcher', batcher):
+            with TestClient(app) as client:
+                response = client.post("/predict", json={"SK_ID_CURR": 100002})
+                not_found = client.post("/predict", json={"SK_ID_CURR": 999999})
+                stats = client.get("/stats").json()["micro_batching"]
+        
+        assert response.status_code == 200
+        assert response.json()["proba"] == pytest.approx(0.2)
+        assert "waterfall" in response.json()["feature_importance"]
+        assert not_found.status_code == 404
+        assert stats["items"] == 2
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_score_clients_matches_score_client(self, mock_load_model, mock_load_dataframe, sample_df):
+        """Tester que la prédiction groupée donne les mêmes réponses que la prédiction unitaire"""
+        mock_load_dataframe.return_value = sample_df
+        test_model = MagicMock()
+        test_model.predict_proba.side_effect = lambda X: np.column_stack([1 - X[:, 0] / 10, X[:, 0] / 10])
+        test_model.feature_importances_ = np.array([1, 2, 3])
+        mock_load_model.return_value = test_model
+        artifacts = load_artifacts()
+        
+        grouped = score_clients(artifacts, [100003, 999999, 100001])
+        
+        # Réponses comparées une fois encodées (les contributions sont des tableaux NumPy)
+        assert dumps(grouped[0]) == dumps(score_client(artifacts, 100003))
+        assert dumps(grouped[2]) == dumps(score_client(artifacts, 100001))
+        assert grouped[1].status_code == 404
+
+class TestPredictionCache:
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_repeated_predict_served_from_cache(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester qu'une requête répétée est servie par le cache, et que le rechargement l'invalide"""
+        mock_load_dataframe.return_value = sample_df
+        mock_model.predict_proba.return_value = np.array([[0.7, 0.3]])
+        mock_model.feature_importances_ = np.array([1, 2, 3])
+        mock_load_model.return_value = mock_model
+        
+        with TestClient(app) as client:
+            # Appels du scoring du portefeuille au chargement
+            mock_model.predict_proba.reset_mock()
+            first = client.post("/predict", json={"SK_ID_CURR": 100001})
+            second = client.post("/predict", json={"SK_ID_CURR": 100001})
+            assert mock_model.predict_proba.call_count == 1
+            assert second.json() == first.json()
+            
+            client.post("/reload")
+            mock_model.predict_proba.reset_mock()
+            client.post("/predict", json={"SK_ID_CURR": 100001})
+            assert mock_model.predict_proba.call_count == 1
+            
+            cache_stats = client.get("/stats").json()["cache"]
+        
+        assert cache_stats["hits"] >= 1
+        assert cache_stats["misses"] >= 2
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_not_found_is_not_cached(self, mock_load_model, mock_load_dataframe, sample_df, mock_model):
+        """Tester qu'un identifiant inconnu n'est pas mis en cache"""
+        mock_load_dataframe.return_value = sample_df
+        mock_load_model.return_value = mock_model
+        
+        with TestClient(app) as client:
+            assert client.post("/predict", json={"SK_ID_CURR": 999999}).status_code == 404
+            assert client.post("/predict", json={"SK_ID_CURR": 999999}).status_code == 404
+
+class TestExplanations:
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_predict_with_shap_waterfall(self, mock_load_model, mock_load_dataframe, synthetic_df, lgbm_model):
+        """Tester que /predict renvoie les contributions TreeSHAP et l'espérance du modèle"""
+        mock_load_dataframe.return_value = synthetic_df
+        mock_load_model.return_value = lgbm_model
+        
+        with TestClient(app) as client:
+            response = client.post("/predict", json={"SK_ID_CURR": 200003})
+        
+        assert response.status_code == 200
+        body = response.json()
+        waterfall = body["feature_importance"]["waterfall"]
+        assert waterfall["method"] == "shap"
+        
+        # Les contributions de toutes les features (ici 6 <= 10) redonnent le score brut
+        X = synthetic_df.drop('SK_ID_CURR', axis=1).to_numpy(dtype=np.float32)[3:4]
+        raw_score = lgbm_model.predict_proba(X, raw_score=True)[0]
+        assert waterfall["base_value"] + sum(waterfall["contribution_values"]) == pytest.approx(raw_score)
+        assert body["proba"] == pytest.approx(lgbm_model.predict_proba(X)[0, 1])
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_predict_without_explanation(self, mock_load_model, mock_load_dataframe, synthetic_df, lgbm_model):
+        """Tester que explain=false ne calcule pas d'explication"""
+        mock_load_dataframe.return_value = synthetic_df
+        mock_load_model.return_value = lgbm_model
+        
+        with TestClient(app) as client:
+            response = client.post("/predict?explain=false", json={"SK_ID_CURR": 200003})
+        
+        assert response.status_code == 200
+        assert "feature_importance" not in response.json()
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_batch_explanations(self, mock_load_model, mock_load_dataframe, synthetic_df, lgbm_model):
+        """Tester les explications vectorisées de /predict/batch, identiques à celles de /predict"""
+        mock_load_dataframe.return_value = synthetic_df
+        mock_load_model.return_value = lgbm_model
+        
+        with TestClient(app) as client:
+            batch = client.post("/predict/batch?explain=true", json={"SK_ID_CURR": [200001, 1, 200002]}).json()
+            single = client.post("/predict", json={"SK_ID_CURR": 200002}).json()
+            without = client.post("/predict/batch", json={"SK_ID_CURR": [200001]}).json()
+        
+        explanation = batch["results"][2]["explanation"]
+        waterfall = single["feature_importance"]["waterfall"]
+        assert explanation["feature_names"] == waterfall["feature_names"]
+        assert explanation["contribution_values"] == pytest.approx(waterfall["contribution_values"])
+        assert batch["results"][1]["found"] is False
+        assert "explanation" not in without["results"][0]
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_explain_modes(self, mock_load_model, mock_load_dataframe, synthetic_df, lgbm_model):
+        """Tester explain=none|top_k|full et le nombre de contributions k"""
+        mock_load_dataframe.return_value = synthetic_df
+        mock_load_model.return_value = lgbm_model
+        
+        with TestClient(app) as client:
+            responses = {
+                mode: client.post(f"/predict?explain={mode}&k=3", json={"SK_ID_CURR": 200002}).json()
+                for mode in ("none", "top_k", "full")
+            }
+            batch = client.post("/predict/batch?explain=top_k&k=2", json={"SK_ID_CURR": [200002]}).json()
+            invalid = client.post("/predict?explain=partial", json={"SK_ID_CURR": 200002})
+            invalid_k = client.post("/predict?explain=top_k&k=0", json={"SK_ID_CURR": 200002})
+        
+        assert set(responses["none"]) == {"prediction", "resultat", "proba", "model_version", "percentile"}
+        explanation = responses["top_k"]["explanation"]
+        waterfall = responses["full"]["feature_importance"]["waterfall"]
+        assert "feature_importance" not in responses["top_k"]
+        assert len(explanation["feature_names"]) == 3
+        assert explanation == waterfall
+        # Importance globale des features lues par le modèle (magasin réduit à EXT_SOURCE_1, EXT_SOURCE_2 et AMT_CREDIT)
+        assert len(responses["full"]["feature_importance"]["feature_names"]) == 3
+        assert batch["results"][0]["explanation"]["feature_names"] == explanation["feature_names"][:2]
+        assert responses["none"]["proba"] == responses["full"]["proba"]
+        assert invalid.status_code == 422
+        assert invalid_k.status_code == 422
+
+
+class TestDecisionPolicy:
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_segment_thresholds_and_hot_reload(self, mock_load_model, mock_load_dataframe, synthetic_df, lgbm_model, tmp_path):
+        """Tester les seuils par segment dans /predict et /predict/batch et le rechargement de la politique"""
+        mock_load_dataframe.return_value = synthetic_df
+        mock_load_model.return_value = lgbm_model
+        policy_path = tmp_path / "policy.json"
+        # Propriétaires d'une voiture jamais refusés, les autres toujours refusés
+        policy_path.write_text(json.dumps({
+            "version": "v1", "default_threshold": 0.5, "segment_feature": "FLAG_OWN_CAR", "segments": {"0": 0.0, "1": 1.0},
+        }))
+        sk_ids = synthetic_df['SK_ID_CURR'].tolist()[:20]
+        owners = synthetic_df['FLAG_OWN_CAR'].tolist()[:20]
+        
+        with patch('main.DECISION_POLICY_PATH', str(policy_path)):
+            with TestClient(app) as client:
+                batch = client.post("/predict/batch", json={"SK_ID_CURR": sk_ids}).json()
+                single = client.post("/predict?explain=false", json={"SK_ID_CURR": sk_ids[0]}).json()
+                
+                # Nouvelle politique: seuil unique, appliqué sans recharger le modèle
+                policy_path.write_text(json.dumps({"version": "v2", "default_threshold": 1.0}))
+                reload_response = client.post("/policy/reload")
+                after = client.post("/predict?explain=false", json={"SK_ID_CURR": sk_ids[0]}).json()
+                stats = client.get("/stats").json()
+        
+        assert [result["prediction"] for result in batch["results"]] == [0 if owner else 1 for owner in owners]
+        assert single["prediction"] == (0 if owners[0] else 1)
+        assert reload_response.status_code == 200
+        assert reload_response.json()["policy"]["version"] == "v2"
+        assert after["prediction"] == 0
+        assert stats["decision_policy"]["version"] == "v2"
+
+class TestModelVersions:
+    
+    @patch('main.load_dataframe')
+    def test_activate_version(self, mock_load_dataframe, synthetic_df, registry):
+        """Tester le chargement de la dernière version puis l'activation d'une autre version"""
+        mock_load_dataframe.return_value = synthetic_df
+        
+        with patch('main.model_registry', registry):
+            with TestClient(app) as client:
+                before = client.post("/predict?explain=false", json={"SK_ID_CURR": 200003}).json()
+                activation = client.post("/models/v1/activate?wait=true")
+                after = client.post("/predict?explain=false", json={"SK_ID_CURR": 200003}).json()
+                batch = client.post("/predict/batch", json={"SK_ID_CURR": [200003]}).json()
+                models = client.get("/models").json()
+                unknown = client.post("/models/v9/activate")
+        
+        assert before["model_version"] == "v2"
+        assert activation.status_code == 200
+        assert activation.json()["activation"]["state"] == "active"
+        assert activation.json()["activation"]["drained"] is True
+        assert after["model_version"] == "v1"
+        assert after["proba"] != before["proba"]
+        assert batch["model_version"] == "v1"
+        assert models["active"] == "v1"
+        assert [version["version"] for version in models["versions"]] == ["v1", "v2", "legacy"]
+        assert unknown.status_code == 404
+    
+    @patch('main.load_dataframe')
+    def test_policy_reload_keeps_version_policy(self, mock_load_dataframe, synthetic_df, registry, tmp_path):
+        """Tester que /policy/reload relit la politique livrée avec la version active"""
+        mock_load_dataframe.return_value = synthetic_df
+        (tmp_path / "v1" / "policy.json").write_text(json.dumps({"version": "v1-policy", "default_threshold": 0.1}))
+        
+        with patch('main.model_registry', registry):
+            with TestClient(app) as client:
+                client.post("/models/v1/activate?wait=true")
+                before = client.get("/stats").json()["decision_policy"]
+                reload_response = client.post("/policy/reload")
+        
+        assert before["default_threshold"] == 0.1
+        assert reload_response.status_code == 200
+        assert reload_response.json()["policy"]["version"] == "v1-policy"
+        assert reload_response.json()["policy"]["default_threshold"] == 0.1
+    
+    @patch('main.load_dataframe')
+    def test_admin_changes_applied_by_other_workers(self, mock_load_dataframe, synthetic_df, registry):
+        """Tester qu'un worker applique l'activation et le modèle candidat publiés par un autre worker"""
+        import main
+        from worker_sync import SharedState
+        mock_load_dataframe.return_value = synthetic_df
+        shared = SharedState({"version": None, "reload": 0, "policy": 0, "candidate": None})
+        applied = {"generation": 0, "state": dict(shared.initial)}
+        
+        with patch('main.model_registry', registry), patch('main.worker_state', shared), patch('main._applied_state', applied):
+            with TestClient(app) as client:
+                # Activation reçue par ce worker: publiée, sans rechargement en double à la synchronisation
+                client.post("/models/v1/activate?wait=true")
+                loaded_at = app.state.artifacts.loaded_at
+                assert main.sync_worker(app) is True
+                assert app.state.artifacts.loaded_at == loaded_at
+                
+                # Opérations reçues par un autre worker
+                shared.update(version="v2", candidate={"version": "v1", "ab_percent": 20.0})
+                assert main.sync_worker(app) is True
+                assert main.sync_worker(app) is False
+                shadow = client.get("/shadow").json()
+                shared.update(candidate=None)
+                main.sync_worker(app)
+                after_unload = client.get("/shadow").json()
+        
+        assert shadow["primary"] == "v2"
+        assert shadow["candidate"] == "v1"
+        assert shadow["ab_percent"] == 20.0
+        assert after_unload["candidate"] is None
+        assert applied["generation"] == 3
+    
+    @patch('main.load_dataframe')
+    def test_background_activation(self, mock_load_dataframe, synthetic_df, registry):
+        """Tester l'activation en arrière-plan pendant que l'ancienne version continue de répondre"""
+        import time
+        mock_load_dataframe.return_value = synthetic_df
+        
+        with patch('main.model_registry', registry):
+            with TestClient(app) as client:
+                response = client.post("/models/v1/activate")
+                for _ in range(200):
+                    status = client.get("/models").json()["activation"]
+                    if status["state"] in ("active", "failed"):
+                        break
+                    assert client.post("/predict?explain=false", json={"SK_ID_CURR": 200003}).status_code == 200
+                    time.sleep(0.01)
+                result = client.post("/predict?explain=false", json={"SK_ID_CURR": 200003}).json()
+        
+        assert response.status_code == 202
+        assert status["state"] == "active"
+        assert result["model_version"] == "v1"
+
+
+class TestShadowScoring:
+    
+    @patch('main.load_dataframe')
+    def test_shadow_comparison(self, mock_load_dataframe, synthetic_df, registry):
+        """Tester l'évaluation shadow du candidat: réponses du modèle actif, statistiques de comparaison"""
+        mock_load_dataframe.return_value = synthetic_df
+        sk_ids = synthetic_df['SK_ID_CURR'].tolist()[:20]
+        
+        with patch('main.model_registry', registry):
+            with TestClient(app) as client:
+                assert client.get("/shadow").json()["candidate"] is None
+                loaded = client.post("/shadow/v1")
+                responses = [client.post("/predict?explain=false", json={"SK_ID_CURR": sk_id}).json() for sk_id in sk_ids]
+                shadow = client.get("/shadow").json()
+                removed = client.delete("/shadow")
+                unknown = client.post("/shadow/v9")
+                invalid = client.post("/shadow/v1?ab_percent=150")
+        
+        assert loaded.status_code == 200
+        assert all(response["model_version"] == "v2" for response in responses)
+        assert shadow["primary"] == "v2"
+        assert shadow["candidate"] == "v1"
+        stats = shadow["stats"]
+        assert stats["compared"] == len(sk_ids)
+        assert stats["served"] == {"primary": len(sk_ids), "candidate": 0}
+        assert sum(stats["decisions"].values()) == len(sk_ids)
+        assert 0.0 <= stats["agreement_rate"] <= 1.0
+        assert stats["proba_delta"]["max_abs"] > 0
+        assert removed.status_code == 200
+        assert unknown.status_code == 404
+        assert invalid.status_code == 422
+    
+    @patch('main.load_dataframe')
+    def test_ab_split(self, mock_load_dataframe, synthetic_df, registry):
+        """Tester la répartition A/B: affectation stable par client et comparaison avec l'autre modèle"""
+        from shadow import routes_to_candidate
+        mock_load_dataframe.return_value = synthetic_df
+        sk_ids = synthetic_df['SK_ID_CURR'].tolist()[:40]
+        
+        with patch('main.model_registry', registry):
+            with TestClient(app) as client:
+                client.post("/shadow/v1?ab_percent=50")
+                first = [client.post("/predict?explain=false", json={"SK_ID_CURR": sk_id}).json() for sk_id in sk_ids]
+                second = [client.post("/predict?explain=false", json={"SK_ID_CURR": sk_id}).json() for sk_id in sk_ids]
+                stats = client.get("/shadow").json()["stats"]
+        
+        expected = ["v1" if routes_to_candidate(sk_id, 50) else "v2" for sk_id in sk_ids]
+        assert [response["model_version"] for response in first] == expected
+        assert [response["model_version"] for response in second] == expected
+        assert stats["served"]["candidate"] == 2 * expected.count("v1")
+        assert stats["compared"] == 2 * len(sk_ids)
+    
+    @patch('main.load_dataframe')
+    def test_reload_rebuilds_candidate(self, mock_load_dataframe, synthetic_df, registry):
+        """Tester la reconstruction du candidat sur le magasin de features du modèle rechargé"""
+        mock_load_dataframe.return_value = synthetic_df
+        
+        with patch('main.model_registry', registry):
+            with TestClient(app) as client:
+                client.post("/shadow/v1?ab_percent=30")
+                before = app.state.candidate
+                reloaded = client.post("/reload")
+                shadow = client.get("/shadow").json()
+                prediction = client.post("/predict?explain=false", json={"SK_ID_CURR": int(synthetic_df['SK_ID_CURR'].iloc[0])})
+                candidate, primary = app.state.candidate, app.state.artifacts
+        
+        assert reloaded.status_code == 200
+        assert candidate is not before
+        assert candidate.store is primary.store
+        assert shadow["candidate"] == "v1"
+        assert shadow["ab_percent"] == 30.0
+        assert prediction.status_code == 200
+
+
+class TestFeaturesEndpoint:
+    
+    @patch('main.load_dataframe')
+    def test_features_match_stored_clients(self, mock_load_dataframe, synthetic_df, lgbm_model):
+        """Tester que les features brutes d'un client donnent la même réponse que son identifiant"""
+        mock_load_dataframe.return_value = synthetic_df
+        rows = synthetic_df.head(5)
+        records = [
+            {name: (None if pd.isna(value) else float(value)) for name, value in row.items() if name != 'SK_ID_CURR'}
+            for _, row in rows.iterrows()
+        ]
+        columns = {name: [record[name] for record in records] for name in records[0]}
+        columns['SK_ID_CURR'] = rows['SK_ID_CURR'].tolist()
+        
+        with patch('main.load_model', return_value=lgbm_model):
+            with TestClient(app) as client:
+                by_id = client.post("/predict", json={"SK_ID_CURR": 200000}).json()
+                by_features = client.post("/predict/features?explain=true", json={"features": records[0]}).json()
+                batch = client.post("/predict/batch", json={"SK_ID_CURR": rows['SK_ID_CURR'].tolist()}).json()
+                columnar = client.post("/predict/features", json={"columns": columns}).json()
+                sparse = client.post("/predict/features", json={"features": {"EXT_SOURCE_2": 0.9}})
+                unknown = client.post("/predict/features", json={"features": {"UNKNOWN": 1.0}})
+                drift = client.get("/drift").json()
+        
+        assert by_features == by_id
+        assert columnar["n_rows"] == 5
+        assert [(r["SK_ID_CURR"], r["proba"], r["prediction"]) for r in columnar["results"]] == [
+            (r["SK_ID_CURR"], r["proba"], r["prediction"]) for r in batch["results"]
+        ]
+        assert sparse.status_code == 200
+        assert 0.0 <= sparse.json()["proba"] <= 1.0
+        assert unknown.status_code == 400
+        assert "UNKNOWN" in unknown.json()["detail"]
+        assert drift["n_observed"] == 1 + 1 + 5 + 1
+    
+    @patch('main.load_dataframe')
+    def test_features_segment_threshold(self, mock_load_dataframe, synthetic_df, lgbm_model, tmp_path):
+        """Tester que le seuil du segment est lu dans les features fournies"""
+        policy_path = tmp_path / "policy.json"
+        policy_path.write_text(json.dumps({
+            "default_threshold": 0.5, "segment_feature": "FLAG_OWN_CAR", "segments": {"0": 1.0, "1": 0.0}
+        }))
+        mock_load_dataframe.return_value = synthetic_df
+        
+        with patch('main.load_model', return_value=lgbm_model), patch('main.DECISION_POLICY_PATH', str(policy_path)):
+            with TestClient(app) as client:
+                results = client.post("/predict/features", json={"features": [
+                    {"EXT_SOURCE_2": 0.5, "FLAG_OWN_CAR": 0}, {"EXT_SOURCE_2": 0.5, "FLAG_OWN_CAR": 1},
+                ]}).json()["results"]
+        
+        assert [result["prediction"] for result in results] == [0, 1]
+
+
+class TestFeaturePruning:
+    
+    @pytest.mark.parametrize("engine", ["sklearn", "booster", "numpy"])
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_pruned_store_bitwise_identical(self, mock_load_model, mock_load_dataframe, engine, synthetic_df, lgbm_model):
+        """Tester que le magasin réduit aux features utilisées donne exactement les mêmes probabilités et contributions"""
+        from main import predict_rows
+        mock_load_dataframe.return_value = synthetic_df
+        mock_load_model.return_value = lgbm_model
+        
+        with patch('main.INFERENCE_ENGINE', engine):
+            with patch('main.PRUNE_FEATURES', False):
+                full = load_artifacts()
+            pruned = load_artifacts()
+        
+        assert full.projection is None
+        assert pruned.store.feature_names == ['EXT_SOURCE_1', 'EXT_SOURCE_2', 'AMT_CREDIT']
+        assert pruned.store.matrix.nbytes < full.store.matrix.nbytes
+        
+        probas, _, _ = predict_rows(full, full.store.matrix, explain=False)
+        pruned_probas, _, _ = predict_rows(pruned, pruned.store.matrix, explain=False)
+        np.testing.assert_array_equal(pruned_probas, probas)
+        
+        probas, contributions, base_values = predict_rows(full, full.store.matrix, explain=True)
+        pruned_probas, pruned_contributions, pruned_base_values = predict_rows(pruned, pruned.store.matrix, explain=True)
+        kept = [full.store.column_index[name] for name in pruned.store.feature_names]
+        np.testing.assert_array_equal(pruned_probas, probas)
+        np.testing.assert_array_equal(pruned_contributions, contributions[:, kept])
+        np.testing.assert_array_equal(pruned_base_values, base_values)
+        # Les features retirées ne contribuent à aucune prédiction
+        assert not np.delete(contributions, kept, axis=1).any()
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_segment_feature_kept_and_stats(self, mock_load_model, mock_load_dataframe, synthetic_df, lgbm_model, tmp_path):
+        """Tester que la feature de segmentation est conservée et que /stats indique la mémoire économisée"""
+        mock_load_dataframe.return_value = synthetic_df
+        mock_load_model.return_value = lgbm_model
+        policy_path = tmp_path / "policy.json"
+        policy_path.write_text(json.dumps({
+            "version": "v1", "default_threshold": 0.5, "segment_feature": "FLAG_OWN_CAR", "segments": {"0": 0.0, "1": 1.0},
+        }))
+        
+        with patch('main.DECISION_POLICY_PATH', str(policy_path)):
+            with TestClient(app) as client:
+                feature_store = client.get("/stats").json()["feature_store"]
+                features = client.post("/predict/features?explain=top_k", json={"features": {"DAYS_BIRTH": -12000.0, "FLAG_OWN_CAR": 1.0}}).json()
+        
+        assert feature_store["n_features"] == 4
+        assert feature_store["n_model_features"] == 6
+        assert feature_store["n_clients"] == len(synthetic_df)
+        assert feature_store["saved_bytes"] == 2 * 4 * len(synthetic_df)
+        # Feature retirée du magasin acceptée dans les features brutes, segment appliqué
+        assert features["prediction"] == 0
+        assert set(features["explanation"]["feature_names"]) <= {'EXT_SOURCE_1', 'EXT_SOURCE_2', 'AMT_CREDIT', 'FLAG_OWN_CAR'}
+
+    
+    @patch('main.load_model')
+    def test_binary_store_stays_memory_mapped(self, mock_load_model, synthetic_df, lgbm_model, tmp_path):
+        """Tester qu'un magasin binaire n'est pas réduit par copie et qu'un magasin réduit à la conversion reste projeté en mémoire"""
+        from feature_store import convert_csv
+        from main import predict_rows
+        mock_load_model.return_value = lgbm_model
+        csv_path = tmp_path / "clients.csv"
+        synthetic_df.to_csv(csv_path, index=False)
+        convert_csv(csv_path, tmp_path / "full")
+        convert_csv(csv_path, tmp_path / "pruned", model=lgbm_model)
+        
+        with patch.dict(os.environ, {"FEATURE_STORE_PATH": str(tmp_path / "full")}):
+            full = load_artifacts()
+        with patch.dict(os.environ, {"FEATURE_STORE_PATH": str(tmp_path / "pruned")}):
+            pruned = load_artifacts()
+        
+        assert full.store.mapped
+        assert full.projection is None
+        assert pruned.store.mapped
+        assert pruned.store.feature_names == ['EXT_SOURCE_1', 'EXT_SOURCE_2', 'AMT_CREDIT']
+        assert pruned.projection.n_model_features == 6
+        probas, _, _ = predict_rows(full, full.store.matrix, explain=False)
+        pruned_probas, _, _ = predict_rows(pruned, pruned.store.matrix, explain=False)
+        np.testing.assert_array_equal(pruned_probas, probas)
+
+
+class TestSimilarClients:
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_similar_clients(self, mock_load_model, mock_load_dataframe, synthetic_df, lgbm_model):
+        """Tester /clients/{SK_ID_CURR}/similar: voisins triés par distance avec leur score et leur décision"""
+        mock_load_dataframe.return_value = synthetic_df
+        mock_load_model.return_value = lgbm_model
+        sk_id = int(synthetic_df['SK_ID_CURR'].iloc[0])
+        
+        with TestClient(app) as client:
+            response = client.get(f"/clients/{sk_id}/similar?k=5")
+            unknown = client.get("/clients/999999/similar")
+            invalid = client.get(f"/clients/{sk_id}/similar?k=0")
+            neighbors = response.json()["neighbors"]
+            batch = client.post("/predict/batch", json={"SK_ID_CURR": [n["SK_ID_CURR"] for n in neighbors]}).json()
+        
+        assert response.status_code == 200
+        assert response.json()["method"] == "brute_force"
+        assert response.json()["features"] == ['EXT_SOURCE_2', 'EXT_SOURCE_1', 'AMT_CREDIT']
+        assert len(neighbors) == 5
+        assert sk_id not in [n["SK_ID_CURR"] for n in neighbors]
+        assert [n["distance"] for n in neighbors] == sorted(n["distance"] for n in neighbors)
+        # Scores et décisions identiques à ceux de /predict/batch
+        assert [n["proba"] for n in neighbors] == [r["proba"] for r in batch["results"]]
+        assert [n["prediction"] for n in neighbors] == [r["prediction"] for r in batch["results"]]
+        assert unknown.status_code == 404
+        assert invalid.status_code == 422
+
+
+class TestScoreDistribution:
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_percentile_and_distribution(self, mock_load_model, mock_load_dataframe, synthetic_df, lgbm_model):
+        """Tester le rang centile de /predict, l'histogramme de /distribution et le rescoring incrémental"""
+        mock_load_dataframe.return_value = synthetic_df
+        mock_load_model.return_value = lgbm_model
+        sk_ids = synthetic_df['SK_ID_CURR'].tolist()
+        
+        with TestClient(app) as client:
+            batch = client.post("/predict/batch", json={"SK_ID_CURR": sk_ids}).json()
+            single = client.post("/predict?explain=none", json={"SK_ID_CURR": sk_ids[0]}).json()
+            distribution = client.get("/distribution?bins=4").json()
+            invalid = client.get("/distribution?bins=0")
+            client.post("/reload")
+            stats = client.get("/stats").json()["score_distribution"]
+        
+        probas = np.array([result["proba"] for result in batch["results"]])
+        assert single["percentile"] == pytest.approx(100 * (probas <= single["proba"]).mean())
+        assert distribution["n_clients"] == len(sk_ids)
+        assert distribution["bin_edges"] == [0.0, 0.25, 0.5, 0.75, 1.0]
+        assert distribution["counts"] == np.histogram(probas, bins=4, range=(0, 1))[0].tolist()
+        assert distribution["quantiles"]["0.5"] == pytest.approx(np.quantile(probas, 0.5))
+        assert invalid.status_code == 422
+        # Même modèle et mêmes données: aucun client rescoré au rechargement
+        assert stats == {"ready": True, "n_clients": len(sk_ids), "n_rescored": 0}
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_percentile_independent_of_explain(self, mock_load_model, mock_load_dataframe, synthetic_df, lgbm_model):
+        """Tester que le rang centile d'un client ne dépend pas du mode d'explication (probabilité TreeSHAP)"""
+        mock_load_dataframe.return_value = synthetic_df
+        mock_load_model.return_value = lgbm_model
+        sk_ids = synthetic_df['SK_ID_CURR'].tolist()
+        
+        with TestClient(app) as client:
+            full = [client.post("/predict", json={"SK_ID_CURR": sk_id}).json() for sk_id in sk_ids]
+            none = [client.post("/predict?explain=none", json={"SK_ID_CURR": sk_id}).json() for sk_id in sk_ids]
+        
+        assert all("feature_importance" in result for result in full)
+        assert [result["percentile"] for result in full] == [result["percentile"] for result in none]
+        # Chaque client est compté dans son propre rang
+        assert min(result["percentile"] for result in full) > 0
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_response_without_percentile_not_served_from_cache(self, mock_load_model, mock_load_dataframe, synthetic_df, lgbm_model):
+        """Tester qu'une réponse mise en cache avant la fin du scoring du portefeuille n'est plus servie ensuite"""
+        import main
+        mock_load_dataframe.return_value = synthetic_df
+        mock_load_model.return_value = lgbm_model
+        sk_id = synthetic_df['SK_ID_CURR'].iloc[0]
+        score_population = main.score_population
+        
+        # Portefeuille scoré après une première requête (comme le calcul en arrière-plan d'un worker)
+        with patch('main.score_population'):
+            with TestClient(app) as client:
+                before = client.post("/predict?explain=none", json={"SK_ID_CURR": int(sk_id)}).json()
+                score_population(app.state.artifacts)
+                after = client.post("/predict?explain=none", json={"SK_ID_CURR": int(sk_id)}).json()
+        
+        assert "percentile" not in before
+        assert "percentile" in after
+    
+    @patch('main.load_dataframe')
+    @patch('main.load_model')
+    def test_distribution_unavailable(self, mock_load_model, mock_load_dataframe, sample_df):
+        """Tester /distribution et /predict lorsque le portefeuille n'a pas pu être scoré"""
+        # Deux probabilités quel que soit le nombre de lignes: le scoring des 3 clients échoue
+        model = MagicMock()
+        model.predict_proba.return_value = np.array([[0.7, 0.3], [0.6, 0.4]])
+        mock_load_dataframe.return_value = sample_df
+        mock_load_model.return_value = model
+        
+        with TestClient(app) as client:
+            distribution = client.get("/distribution")
+            prediction = client.post("/predict?explain=none", json={"SK_ID_CURR": 100001})
+        
+        assert distribution.status_code == 503
+        assert "Retry-After" in distribution.headers
+        assert prediction.status_code == 200
+        assert "percentile" not in prediction.json()
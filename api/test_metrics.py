@@ -0,0 +1,85 @@
+# test_metrics.py
+import pytest
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer metrics.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from metrics import Counter, Gauge, Histogram, LatencyRecorder, MetricsRegistry
+
+class TestLatencyRecorder:
+    
+    def test_summary_percentiles(self):
+        """Tester le calcul des percentiles par route"""
+        recorder = LatencyRecorder(window=100)
+        for duration in (0.001, 0.002, 0.003):
+            recorder.record("POST /predict", duration)
+        
+        summary = recorder.summary()["POST /predict"]
+        assert summary["count"] == 3
+        assert summary["p50_ms"] == pytest.approx(2.0)
+        assert summary["max_ms"] == pytest.approx(3.0)
+
+class TestPrometheusMetrics:
+    
+    def test_counter_by_labels(self):
+        """Tester un compteur par code de statut"""
+        counter = Counter("requests_total", "Requêtes", ("status",))
+        counter.inc(status=200)
+        counter.inc(status=200)
+        counter.inc(status=404)
+        
+        text = counter.render()
+        assert "# TYPE requests_total counter" in text
+        assert 'requests_total{status="200"} 2.0' in text
+        assert 'requests_total{status="404"} 1.0' in text
+    
+    def test_counter_rejects_wrong_labels(self):
+        """Tester le refus de labels inattendus"""
+        counter = Counter("requests_total", "Requêtes", ("status",))
+        with pytest.raises(ValueError):
+            counter.inc(route="/predict")
+    
+    def test_histogram_cumulative_buckets(self):
+        """Tester les intervalles cumulés, la somme et le nombre d'observations"""
+        histogram = Histogram("stage_seconds", "Durées", ("stage",), buckets=(0.001, 0.01))
+        histogram.observe(0.0005, stage="predict")
+        histogram.observe(0.005, stage="predict")
+        histogram.observe(0.5, stage="predict")
+        
+        text = histogram.render()
+        assert 'stage_seconds_bucket{stage="predict",le="0.001"} 1' in text
+        assert 'stage_seconds_bucket{stage="predict",le="0.01"} 2' in text
+        assert 'stage_seconds_bucket{stage="predict",le="+Inf"} 3' in text
+        assert 'stage_seconds_sum{stage="predict"} 0.5055' in text
+        assert 'stage_seconds_count{stage="predict"} 3' in text
+    
+    def test_histogram_timer(self):
+        """Tester la mesure d'un bloc de code"""
+        histogram = Histogram("stage_seconds", "Durées", ("stage",))
+        with histogram.time(stage="lookup"):
+            pass
+        
+        assert 'stage_seconds_count{stage="lookup"} 1' in histogram.render()
+    
+    def test_gauge_callback_and_registry(self):
+        """Tester une jauge lue à l'exposition et le format complet du registre"""
+        registry = MetricsRegistry()
+        registry.register(Gauge("queue_depth", "File", callback=lambda: [({}, 3)]))
+        registry.register(Gauge("cache_size", "Cache", callback=lambda: []))
+        
+        text = registry.render()
+        assert "queue_depth 3.0" in text
+        assert "# TYPE cache_size gauge" in text
+        assert text.endswith("\n")
+        
+        with pytest.raises(ValueError):
+            registry.register(Gauge("queue_depth", "Doublon"))
+    
+    def test_label_escaping(self):
+        """Tester l'échappement des valeurs de labels"""
+        gauge = Gauge("info", "Info", ("path",))
+        gauge.set(1, path='a"b\\c')
+        
+        assert 'info{path="a\\"b\\\\c"} 1.0' in gauge.render()
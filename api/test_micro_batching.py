@@ -0,0 +1,60 @@
+# test_micro_batching.py
+import asyncio
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer micro_batching.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from micro_batching import MicroBatcher
+
+class TestMicroBatcher:
+    
+    def test_concurrent_requests_are_batched(self):
+        """Tester que les requêtes concurrentes sont regroupées en lots de taille maximale"""
+        batches = []
+        
+        async def process(items):
+            batches.append(list(items))
+            return [item * 10 for item in items]
+        
+        async def scenario():
+            batcher = MicroBatcher(process, max_batch_size=3, max_wait_s=0.01)
+            return await asyncio.gather(*[batcher.submit(i) for i in range(5)]), batcher.stats()
+        
+        results, stats = asyncio.run(scenario())
+        
+        assert results == [0, 10, 20, 30, 40]
+        assert batches == [[0, 1, 2], [3, 4]]
+        assert stats["batches"] == 2
+        assert stats["mean_batch_size"] == 2.5
+    
+    def test_single_request_flushed_after_max_wait(self):
+        """Tester qu'une requête isolée part après le délai maximal d'attente"""
+        async def process(items):
+            return items
+        
+        async def scenario():
+            batcher = MicroBatcher(process, max_batch_size=100, max_wait_s=0.005)
+            return await asyncio.wait_for(batcher.submit("seule"), timeout=1)
+        
+        assert asyncio.run(scenario()) == "seule"
+    
+    def test_per_item_and_batch_errors(self):
+        """Tester qu'une erreur propre à un élément n'affecte que sa requête, et qu'un échec du lot touche toutes les requêtes"""
+        async def process(items):
+            if "panne" in items:
+                raise RuntimeError("lot en échec")
+            return [KeyError(item) if item == "inconnu" else item for item in items]
+        
+        async def scenario():
+            batcher = MicroBatcher(process, max_batch_size=2, max_wait_s=0.01)
+            first = await asyncio.gather(batcher.submit("ok"), batcher.submit("inconnu"), return_exceptions=True)
+            second = await asyncio.gather(batcher.submit("ok"), batcher.submit("panne"), return_exceptions=True)
+            return first, second
+        
+        first, second = asyncio.run(scenario())
+        
+        assert first[0] == "ok"
+        assert isinstance(first[1], KeyError)
+        assert all(isinstance(result, RuntimeError) for result in second)
@@ -0,0 +1,88 @@
+# test_model_registry.py
+import pytest
+import os
+import sys
+import threading
+import time
+import joblib
+
+# Ajouter le chemin du répertoire parent pour importer model_registry.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from model_registry import InFlightTracker, ModelRegistry, read_meta
+
+def save_model(path, model, mtime):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(model, path)
+    os.utime(path, (mtime, mtime))
+
+class TestModelRegistry:
+    
+    def test_directory_layout(self, tmp_path):
+        """Tester les versions d'un répertoire local et la politique livrée avec une version"""
+        save_model(str(tmp_path / "v1" / "model.pkl"), {"name": "v1"}, 1000)
+        save_model(str(tmp_path / "v2" / "model.pkl"), {"name": "v2"}, 2000)
+        (tmp_path / "v2" / "policy.json").write_text('{"default_threshold": 0.4}')
+        (tmp_path / "vide").mkdir()
+        registry = ModelRegistry(str(tmp_path))
+        
+        assert [version.version for version in registry.versions()] == ["v1", "v2"]
+        assert registry.get("latest").version == "v2"
+        assert registry.get("v1").policy_path is None
+        assert registry.get("v2").policy_path.endswith("policy.json")
+        assert ModelRegistry.load(registry.get("v1")) == {"name": "v1"}
+        with pytest.raises(KeyError):
+            registry.get("v3")
+    
+    def test_mlflow_layout(self, tmp_path):
+        """Tester les runs MLflow et les modèles enregistrés (sources file:// et runs:/)"""
+        (tmp_path / "0").mkdir()
+        (tmp_path / "0" / "meta.yaml").write_text("experiment_id: '0'\nname: Default\n")
+        save_model(str(tmp_path / "0" / "abc123" / "artifacts" / "model" / "model.pkl"), "run", 1000)
+        save_model(str(tmp_path / "0" / "def456" / "artifacts" / "model" / "model.pkl"), "run2", 1500)
+        
+        registered = tmp_path / "models" / "scoring"
+        (registered / "version-1").mkdir(parents=True)
+        (registered / "version-1" / "meta.yaml").write_text(
+            "creation_timestamp: 3000000\nsource: runs:/abc123/model\nversion: 1\n"
+        )
+        (registered / "version-2").mkdir()
+        source = (tmp_path / "0" / "def456" / "artifacts" / "model").as_uri()
+        (registered / "version-2" / "meta.yaml").write_text(
+            f"creation_timestamp: 4000000\nsource: {source}\nversion: 2\n"
+        )
+        registry = ModelRegistry(str(tmp_path))
+        
+        versions = {version.version: version for version in registry.versions()}
+        assert set(versions) == {"abc123", "def456", "scoring-v1", "scoring-v2"}
+        assert versions["scoring-v1"].path == versions["abc123"].path
+        assert versions["scoring-v2"].path == versions["def456"].path
+        assert registry.get("latest").version == "scoring-v2"
+    
+    def test_missing_root(self, tmp_path):
+        """Tester un registre absent"""
+        assert ModelRegistry(str(tmp_path / "absent")).versions() == []
+        assert ModelRegistry(None).versions() == []
+    
+    def test_read_meta(self, tmp_path):
+        """Tester la lecture des clés de premier niveau d'un meta.yaml"""
+        path = tmp_path / "meta.yaml"
+        path.write_text("name: 'Default'\ntags:\n  key: value\nversion: 3\n")
+        
+        assert read_meta(str(path)) == {"name": "Default", "tags": "", "version": "3"}
+
+class TestInFlightTracker:
+    
+    def test_wait_idle(self):
+        """Tester l'attente de la fin des requêtes en cours sur une version"""
+        tracker = InFlightTracker()
+        old, new = object(), object()
+        tracker.acquire(old)
+        tracker.acquire(new)
+        
+        assert not tracker.wait_idle(old, timeout=0.01)
+        threading.Timer(0.05, tracker.release, args=(old,)).start()
+        start = time.perf_counter()
+        assert tracker.wait_idle(old, timeout=5)
+        assert time.perf_counter() - start < 5
+        assert tracker.count(new) == 1
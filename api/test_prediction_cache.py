@@ -0,0 +1,97 @@
+# test_prediction_cache.py
+import pytest
+from unittest.mock import patch
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer prediction_cache.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from prediction_cache import RedisCache, TTLCache, create_cache
+
+class FakeRedis:
+    """Substitut minimal d'un client Redis"""
+    
+    def __init__(self):
+        self.data = {}
+    
+    def get(self, key):
+        return self.data.get(key)
+    
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+    
+    def scan_iter(self, match):
+        return [key for key in self.data if key.startswith(match.rstrip('*'))]
+    
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+class TestTTLCache:
+    
+    def test_hit_and_miss_counters(self):
+        """Tester les compteurs de succès et d'échecs"""
+        cache = TTLCache(max_size=10, ttl_s=60)
+        
+        assert cache.get((1, 'v1', 0.5)) is None
+        cache.set((1, 'v1', 0.5), {'proba': 0.3})
+        
+        assert cache.get((1, 'v1', 0.5)) == {'proba': 0.3}
+        assert cache.get((1, 'v2', 0.5)) is None
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses']) == (1, 2)
+    
+    def test_lru_eviction(self):
+        """Tester l'éviction de l'entrée la moins récemment utilisée"""
+        cache = TTLCache(max_size=2, ttl_s=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.stats()['evictions'] == 1
+    
+    def test_ttl_expiration(self):
+        """Tester l'expiration des entrées après le TTL"""
+        cache = TTLCache(max_size=10, ttl_s=5)
+        with patch('prediction_cache.time.monotonic', return_value=100.0):
+            cache.set('a', 1)
+        with patch('prediction_cache.time.monotonic', return_value=104.0):
+            assert cache.get('a') == 1
+        with patch('prediction_cache.time.monotonic', return_value=106.0):
+            assert cache.get('a') is None
+        assert len(cache) == 0
+    
+    def test_clear(self):
+        """Tester le vidage du cache"""
+        cache = TTLCache()
+        cache.set('a', 1)
+        cache.clear()
+        assert cache.get('a') is None
+
+class TestRedisCache:
+    
+    def test_roundtrip_and_clear(self):
+        """Tester le stockage JSON dans Redis et le vidage par préfixe"""
+        client = FakeRedis()
+        client.data['autre:cle'] = b'{}'
+        cache = RedisCache(url=None, client=client)
+        
+        cache.set((100001, 'abc', 0.5), {'proba': 0.3})
+        assert cache.get((100001, 'abc', 0.5)) == {'proba': 0.3}
+        
+        cache.clear()
+        assert cache.get((100001, 'abc', 0.5)) is None
+        assert 'autre:cle' in client.data
+
+class TestCreateCache:
+    
+    def test_backends(self):
+        """Tester le choix de l'implémentation du cache"""
+        assert create_cache('none') is None
+        assert isinstance(create_cache('memory', max_size=5), TTLCache)
+        with pytest.raises(ValueError):
+            create_cache('inconnu')
@@ -0,0 +1,45 @@
+# test_reference_stats.py
+import pytest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer reference_stats.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from feature_store import FeatureStore
+from reference_stats import ReferenceStats
+
+class TestReferenceStats:
+    
+    def test_means_ignore_missing_values(self):
+        """Tester que les moyennes ignorent les valeurs manquantes, comme DataFrame.mean()"""
+        df = pd.DataFrame({
+            'SK_ID_CURR': [1, 2, 3],
+            'Feature1': [1.0, np.nan, 3.0],
+            'Feature2': [4.0, 5.0, 9.0]
+        })
+        stats = ReferenceStats.compute(FeatureStore.from_dataframe(df))
+        
+        expected = df.drop('SK_ID_CURR', axis=1).mean().to_numpy()
+        np.testing.assert_allclose(stats.means, expected)
+    
+    def test_importance_order_is_stable(self, sample_df):
+        """Tester le classement par importance décroissante, l'ordre des colonnes départageant les égalités"""
+        stats = ReferenceStats.compute(FeatureStore.from_dataframe(sample_df), [5, 10, 5])
+        
+        np.testing.assert_array_equal(stats.top_features(3), [1, 0, 2])
+        np.testing.assert_array_equal(stats.top_features(1), [1])
+    
+    def test_without_importance(self, sample_df):
+        """Tester qu'un modèle sans importance des features donne une erreur explicite"""
+        stats = ReferenceStats.compute(FeatureStore.from_dataframe(sample_df))
+        
+        with pytest.raises(ValueError, match="importance"):
+            stats.top_features(10)
+    
+    def test_importance_length_mismatch(self, sample_df):
+        """Tester le refus d'un vecteur d'importance de mauvaise taille"""
+        with pytest.raises(ValueError):
+            ReferenceStats.compute(FeatureStore.from_dataframe(sample_df), [1, 2])
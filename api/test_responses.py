@@ -0,0 +1,60 @@
+import pytest
+import json
+import numpy as np
+import sys
+import os
+
+# Ajout du répertoire parent au chemin de recherche Python
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import responses
+from responses import MsgpackResponse, NumpyJSONResponse, msgpack_accepted, response_class
+from explainer import EXPLAIN_FULL, EXPLAIN_NONE, EXPLAIN_TOP_K, ExplainOptions
+
+
+class TestResponses:
+    
+    def test_numpy_json(self):
+        """Tester l'encodage direct des tableaux et scalaires NumPy"""
+        content = {"proba": np.float64(0.25), "values": np.array([0.5, -1.0]), "prediction": np.int64(1), "nan": np.nan}
+        body = NumpyJSONResponse(content).body
+        assert json.loads(body) == {"proba": 0.25, "values": [0.5, -1.0], "prediction": 1, "nan": None}
+    
+    def test_negotiation(self):
+        """Tester le choix de MessagePack selon l'en-tête Accept, si le paquet est installé"""
+        assert response_class(None) is NumpyJSONResponse
+        assert response_class("application/json") is NumpyJSONResponse
+        expected = MsgpackResponse if responses.msgpack is not None else NumpyJSONResponse
+        assert response_class("application/x-msgpack, application/json;q=0.5") is expected
+    
+    def test_msgpack_unavailable(self, monkeypatch):
+        """Tester le repli sur JSON sans le paquet msgpack"""
+        monkeypatch.setattr(responses, "msgpack", None)
+        assert msgpack_accepted("application/msgpack") is False
+    
+    def test_msgpack_roundtrip(self):
+        """Tester l'encodage MessagePack des types NumPy"""
+        msgpack = pytest.importorskip("msgpack")
+        body = MsgpackResponse({"proba": np.float64(0.25), "values": np.array([1.5, 2.0])}).body
+        assert msgpack.unpackb(body) == {"proba": 0.25, "values": [1.5, 2.0]}
+
+
+class TestExplainOptions:
+    
+    @pytest.mark.parametrize("value, mode", [
+        ("none", EXPLAIN_NONE), ("top_k", EXPLAIN_TOP_K), ("FULL", EXPLAIN_FULL),
+        ("true", EXPLAIN_FULL), ("false", EXPLAIN_NONE), (True, EXPLAIN_FULL), (False, EXPLAIN_NONE),
+    ])
+    def test_parse(self, value, mode):
+        """Tester les modes d'explication et les anciennes valeurs booléennes"""
+        options = ExplainOptions.parse(value, k=5)
+        assert options.mode == mode
+        assert options.k == 5
+        assert bool(options) is (mode != EXPLAIN_NONE)
+    
+    def test_parse_invalid(self):
+        """Tester le refus d'un mode ou d'un nombre de contributions invalide"""
+        with pytest.raises(ValueError, match="inconnu"):
+            ExplainOptions.parse("partial")
+        with pytest.raises(ValueError, match="invalide"):
+            ExplainOptions.parse("top_k", k=0)
@@ -0,0 +1,94 @@
+# test_score_all.py
+import pytest
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer score_all.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from feature_store import FeatureStore
+from score_all import ResultWriter, score_all
+
+class TestScoreAll:
+    
+    @patch('score_all.load_model')
+    def test_csv_chunks_match_predict_proba(self, mock_load_model, synthetic_df, lgbm_model, tmp_path):
+        """Tester le scoring par blocs d'un CSV dans le processus courant"""
+        mock_load_model.return_value = lgbm_model
+        source = tmp_path / "clients.csv"
+        synthetic_df.to_csv(source, index=False)
+        output = tmp_path / "scores.csv"
+        
+        n_rows = score_all(str(source), str(output), chunksize=64, workers=0)
+        
+        scores = pd.read_csv(output)
+        expected = lgbm_model.predict_proba(synthetic_df.drop('SK_ID_CURR', axis=1).to_numpy(dtype=np.float32))[:, 1]
+        assert n_rows == len(synthetic_df)
+        assert scores['SK_ID_CURR'].tolist() == synthetic_df['SK_ID_CURR'].tolist()
+        np.testing.assert_allclose(scores['proba'], expected, rtol=1e-12)
+        assert (scores['prediction'] == (expected > 0.5)).all()
+    
+    @patch('score_all.load_model')
+    def test_binary_store_with_explanations(self, mock_load_model, synthetic_df, lgbm_model, tmp_path):
+        """Tester le scoring d'un magasin binaire avec les principales contributions TreeSHAP"""
+        mock_load_model.return_value = lgbm_model
+        FeatureStore.from_dataframe(synthetic_df).save(str(tmp_path / "store"))
+        output = tmp_path / "scores.csv"
+        
+        score_all(str(tmp_path / "store"), str(output), chunksize=100, workers=0, explain_k=2)
+        
+        scores = pd.read_csv(output)
+        assert len(scores) == len(synthetic_df)
+        assert {'top1_feature', 'top1_contribution', 'top2_feature', 'top2_contribution'} <= set(scores.columns)
+        assert (scores['top1_contribution'].abs() >= scores['top2_contribution'].abs()).all()
+    
+    @patch('score_all.load_model')
+    def test_pruned_store_matches_full_store(self, mock_load_model, synthetic_df, lgbm_model, tmp_path):
+        """Tester le scoring d'un magasin réduit aux features du modèle (feature_store.py --model) contre le magasin complet"""
+        from feature_store import convert_csv
+        mock_load_model.return_value = lgbm_model
+        csv_path = tmp_path / "clients.csv"
+        synthetic_df.to_csv(csv_path, index=False)
+        convert_csv(csv_path, tmp_path / "full")
+        convert_csv(csv_path, tmp_path / "pruned", model=lgbm_model)
+        
+        score_all(str(tmp_path / "full"), str(tmp_path / "full.csv"), chunksize=100, workers=0, explain_k=2)
+        score_all(str(tmp_path / "pruned"), str(tmp_path / "pruned.csv"), chunksize=100, workers=0, explain_k=2)
+        
+        full = pd.read_csv(tmp_path / "full.csv")
+        pruned = pd.read_csv(tmp_path / "pruned.csv")
+        np.testing.assert_array_equal(pruned['proba'], full['proba'])
+        assert pruned['top1_feature'].tolist() == full['top1_feature'].tolist()
+        np.testing.assert_array_equal(pruned['top1_contribution'], full['top1_contribution'])
+    
+    def test_does_not_import_api(self):
+        """Tester que le scoring en masse n'importe pas l'application FastAPI (processus de scoring légers)"""
+        import subprocess
+        code = "import sys, score_all; print('main' in sys.modules, 'fastapi' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        )
+        assert result.stdout.split() == ["False", "False"]
+    
+    def test_process_pool_with_real_model(self, tmp_path):
+        """Tester le pool de processus avec le modèle et les données du dépôt"""
+        source = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'df_test_reduit.csv')
+        if not os.path.exists(source):
+            pytest.skip("df_test_reduit.csv absent")
+        output = tmp_path / "scores.csv"
+        
+        n_rows = score_all(source, str(output), chunksize=7, workers=2)
+        
+        scores = pd.read_csv(output)
+        assert n_rows == len(pd.read_csv(source, usecols=['SK_ID_CURR']))
+        assert scores['SK_ID_CURR'].tolist() == pd.read_csv(source, usecols=['SK_ID_CURR'])['SK_ID_CURR'].tolist()
+        assert scores['proba'].between(0, 1).all()
+    
+    def test_unknown_output_format(self, tmp_path):
+        """Tester le refus d'un format de sortie inconnu"""
+        with pytest.raises(ValueError):
+            ResultWriter(str(tmp_path / "scores.json"), fmt="json")
@@ -0,0 +1,85 @@
+# test_score_distribution.py
+import pytest
+import numpy as np
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer score_distribution.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from feature_store import FeatureStore
+from score_distribution import ScoreDistribution, row_digests, score_rows
+
+def predict_first_feature(features):
+    """Modèle factice: probabilité égale à la première feature"""
+    return features[:, 0].astype(np.float64)
+
+class TestRowDigests:
+    
+    def test_changed_rows_detected(self):
+        """Tester que l'empreinte change avec une valeur, une valeur manquante ou l'ordre des valeurs"""
+        matrix = np.array([[0.1, 0.2, 0.3], [0.1, 0.2, 0.3], [0.1, 0.2, np.nan], [0.2, 0.1, 0.3]], dtype=np.float32)
+        digests = row_digests(matrix, chunk_rows=3)
+        
+        assert digests.dtype == np.uint64
+        assert digests[0] == digests[1]
+        assert len(set(digests[1:].tolist())) == 3
+
+class TestScoreDistribution:
+    
+    def _store(self, ids, values):
+        return FeatureStore(ids, np.column_stack([values, np.zeros(len(values))]), ['proba', 'other'])
+    
+    def test_percentile_and_histogram(self):
+        """Tester le rang centile par recherche dichotomique et l'histogramme des scores"""
+        store = self._store(np.arange(10), np.linspace(0.05, 0.95, 10))
+        distribution = ScoreDistribution()
+        assert not distribution.ready
+        assert distribution.percentile(0.5) is None
+        
+        distribution.compute(predict_first_feature, store)
+        edges, counts = distribution.histogram(4)
+        summary = distribution.summary(4)
+        
+        assert distribution.ready
+        assert distribution.percentile(distribution.sorted_scores[0]) == pytest.approx(10.0)
+        assert distribution.percentile(0.5) == pytest.approx(50.0)
+        assert distribution.percentile(0.0) == 0.0
+        assert distribution.percentile(1.0) == 100.0
+        # Score du portefeuille de la ligne, et probabilité qui en diffère de quelques ulp: même rang
+        assert distribution.percentile_of_row(3) == pytest.approx(40.0)
+        assert distribution.percentile(np.nextafter(distribution.scores[3], 0)) == pytest.approx(40.0)
+        np.testing.assert_allclose(edges, [0, 0.25, 0.5, 0.75, 1])
+        assert counts.tolist() == np.histogram(distribution.scores, bins=4, range=(0, 1))[0].tolist()
+        assert summary["n_clients"] == 10
+        assert summary["mean"] == pytest.approx(0.5)
+    
+    def test_incremental_rescoring(self):
+        """Tester que seuls les clients nouveaux ou modifiés sont rescorés"""
+        calls = []
+        def predict(features):
+            calls.append(len(features))
+            return predict_first_feature(features)
+        
+        previous = ScoreDistribution().compute(predict, self._store([1, 2, 3, 4], [0.1, 0.2, 0.3, 0.4]))
+        # Client 2 modifié, client 4 retiré, client 5 ajouté, ordre des lignes changé
+        current = ScoreDistribution().compute(predict, self._store([3, 1, 2, 5], [0.3, 0.1, 0.25, 0.5]), previous)
+        
+        assert calls == [4, 2]
+        assert current.n_rescored == 2
+        np.testing.assert_allclose(current.scores, [0.3, 0.1, 0.25, 0.5], rtol=1e-6)
+        np.testing.assert_allclose(current.sorted_scores, [0.1, 0.25, 0.3, 0.5], rtol=1e-6)
+    
+    def test_chunked_scoring(self):
+        """Tester le scoring par blocs d'un magasin plus grand qu'un bloc"""
+        calls = []
+        def predict(features):
+            calls.append(len(features))
+            return predict_first_feature(features)
+        
+        store = self._store(np.arange(7), np.linspace(0, 1, 7))
+        scores = np.empty(7)
+        score_rows(predict, store.matrix, np.arange(7), scores, chunk_rows=3)
+        
+        assert calls == [3, 3, 1]
+        np.testing.assert_allclose(scores, np.linspace(0, 1, 7), rtol=1e-6)
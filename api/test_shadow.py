@@ -0,0 +1,56 @@
+import pytest
+import sys
+import os
+
+# Ajout du répertoire parent au chemin de recherche Python
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from shadow import AB_BUCKETS, ShadowStats, ab_bucket, routes_to_candidate
+
+
+class TestShadowStats:
+    
+    def test_welford_matches_numpy(self):
+        """Tester la moyenne et l'écart-type de l'écart de probabilité calculés en un passage"""
+        import numpy as np
+        rng = np.random.default_rng(0)
+        primary = rng.uniform(size=500)
+        candidate = np.clip(primary + rng.normal(0, 0.05, size=500), 0, 1)
+        stats = ShadowStats()
+        for p, c in zip(primary, candidate):
+            stats.record(float(p), float(c), int(p > 0.5), int(c > 0.5))
+        summary = stats.summary()
+        delta = candidate - primary
+        assert summary["compared"] == 500
+        assert summary["proba_delta"]["mean"] == pytest.approx(delta.mean())
+        assert summary["proba_delta"]["std"] == pytest.approx(delta.std(ddof=1))
+        assert summary["proba_delta"]["max_abs"] == pytest.approx(np.abs(delta).max())
+        assert summary["agreement_rate"] == pytest.approx(np.mean((primary > 0.5) == (candidate > 0.5)))
+    
+    def test_decisions_and_reset(self):
+        """Tester la matrice des décisions et la remise à zéro"""
+        stats = ShadowStats()
+        stats.record(0.2, 0.7, 0, 1)
+        stats.record(0.8, 0.9, 1, 1)
+        stats.record_skipped()
+        decisions = stats.summary()["decisions"]
+        assert decisions["only_candidate_refuses"] == 1
+        assert decisions["both_refuse"] == 1
+        assert stats.summary()["skipped"] == 1
+        stats.reset()
+        empty = stats.summary()
+        assert empty["compared"] == 0
+        assert empty["agreement_rate"] is None
+        assert empty["proba_delta"]["std"] is None
+
+
+class TestABRouting:
+    
+    def test_stable_assignment(self):
+        """Tester l'affectation stable et proportionnelle des clients au candidat"""
+        sk_ids = range(100000, 120000)
+        assert all(0 <= ab_bucket(sk_id) < AB_BUCKETS for sk_id in sk_ids)
+        share = sum(routes_to_candidate(sk_id, 10) for sk_id in sk_ids) / len(sk_ids)
+        assert share == pytest.approx(0.10, abs=0.01)
+        assert not any(routes_to_candidate(sk_id, 0) for sk_id in sk_ids)
+        assert all(routes_to_candidate(sk_id, 100) for sk_id in sk_ids)
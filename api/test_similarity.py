@@ -0,0 +1,68 @@
+# test_similarity.py
+import numpy as np
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer similarity.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from feature_store import FeatureStore
+from similarity import SimilarityIndex
+
+class TestSimilarityIndex:
+    
+    def test_nearest_neighbors_exclude_client(self, synthetic_df):
+        """Tester que les voisins sont triés par distance croissante, sans le client lui-même"""
+        store = FeatureStore.from_dataframe(synthetic_df)
+        index = SimilarityIndex.build(store)
+        
+        rows, distances = index.query(3, 5)
+        
+        assert index.method == "brute_force"
+        assert len(rows) == 5
+        assert 3 not in rows
+        assert np.all(np.diff(distances) >= 0)
+        # Mêmes distances qu'un calcul direct sur les vecteurs standardisés
+        expected = np.sqrt(((index.vectors - index.vectors[3]) ** 2).sum(axis=1))
+        np.testing.assert_allclose(distances, np.sort(np.delete(expected, 3))[:5], rtol=1e-4, atol=1e-5)
+    
+    def test_ball_tree_matches_brute_force(self, synthetic_df):
+        """Tester que le BallTree des grandes tables renvoie les mêmes voisins que la force brute"""
+        store = FeatureStore.from_dataframe(synthetic_df)
+        brute_force = SimilarityIndex.build(store)
+        ball_tree = SimilarityIndex.build(store, brute_force_max_rows=100)
+        
+        assert ball_tree.method == "ball_tree"
+        for row in (0, 7, 250):
+            expected_rows, expected_distances = brute_force.query(row, 10)
+            rows, distances = ball_tree.query(row, 10)
+            np.testing.assert_array_equal(rows, expected_rows)
+            np.testing.assert_allclose(distances, expected_distances, rtol=1e-4, atol=1e-5)
+    
+    def test_importance_selects_and_weights_features(self, synthetic_df):
+        """Tester que seules les features importantes sont retenues, pondérées par leur importance"""
+        store = FeatureStore.from_dataframe(synthetic_df)
+        importance = np.array([3.0, 1.0, 0.0, 0.0, 0.0, 0.0])
+        index = SimilarityIndex.build(store, importance, n_features=4)
+        
+        assert index.feature_names == ['EXT_SOURCE_1', 'EXT_SOURCE_2']
+        np.testing.assert_allclose(index.weights ** 2, [0.75, 0.25])
+    
+    def test_missing_and_constant_values(self, synthetic_df):
+        """Tester qu'une valeur manquante vaut la moyenne et qu'une colonne constante ne compte pas"""
+        store = FeatureStore.from_dataframe(synthetic_df)
+        index = SimilarityIndex.build(store)
+        
+        assert np.isfinite(index.vectors).all()
+        assert not index.vectors[:, index.feature_names.index('CONSTANT')].any()
+        # EXT_SOURCE_1 manquant toutes les 7 lignes
+        assert index.vectors[0, index.feature_names.index('EXT_SOURCE_1')] == 0.0
+    
+    def test_small_tables(self, sample_df):
+        """Tester une demande de plus de voisins que de clients, et un magasin d'un seul client"""
+        store = FeatureStore.from_dataframe(sample_df)
+        rows, _ = SimilarityIndex.build(store).query(0, 10)
+        single = SimilarityIndex.build(FeatureStore.from_dataframe(sample_df.head(1)))
+        
+        assert sorted(rows.tolist()) == [1, 2]
+        assert len(single.query(0, 10)[0]) == 0
@@ -0,0 +1,75 @@
+# test_tree_engine.py
+import pytest
+import pandas as pd
+import numpy as np
+import joblib
+import sys
+import os
+
+# Ajouter le chemin du répertoire parent pour importer tree_engine.py
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from tree_engine import ENGINES, NumpyTreeEnsemble, create_predictor, used_feature_indices
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class TestInferenceEngines:
+    
+    @pytest.mark.parametrize("engine", ENGINES)
+    def test_engines_match_predict_proba(self, engine, synthetic_df, lgbm_model):
+        """Tester que chaque moteur reproduit predict_proba, valeurs manquantes et nulles comprises"""
+        X = synthetic_df.drop('SK_ID_CURR', axis=1).to_numpy(dtype=np.float32)
+        expected = lgbm_model.predict_proba(X)[:, 1]
+        
+        predictor = create_predictor(lgbm_model, engine)
+        
+        np.testing.assert_allclose(predictor.predict(X), expected, rtol=0, atol=1e-12)
+        np.testing.assert_allclose(predictor.predict(X[:1]), expected[:1], rtol=0, atol=1e-12)
+    
+    def test_numpy_engine_on_missing_values(self, synthetic_df, lgbm_model):
+        """Tester le moteur numpy sur des lignes entièrement manquantes"""
+        X = np.full((3, synthetic_df.shape[1] - 1), np.nan, dtype=np.float32)
+        
+        expected = lgbm_model.predict_proba(X)[:, 1]
+        
+        np.testing.assert_allclose(create_predictor(lgbm_model, "numpy").predict(X), expected, rtol=0, atol=1e-12)
+    
+    def test_production_model(self):
+        """Tester l'équivalence des moteurs sur le modèle et les données du projet"""
+        model = joblib.load(os.path.join(BASE_DIR, 'LGBM_TTS.pkl'))
+        df = pd.read_csv(os.path.join(os.path.dirname(BASE_DIR), 'df_test_reduit.csv'))
+        X = df.drop('SK_ID_CURR', axis=1).to_numpy(dtype=np.float32)
+        expected = model.predict_proba(X)[:, 1]
+        
+        ensemble = NumpyTreeEnsemble.from_booster(model.booster_)
+        
+        assert ensemble.n_trees == model.booster_.num_trees()
+        np.testing.assert_allclose(ensemble.predict_proba(X), expected, rtol=0, atol=1e-12)
+        np.testing.assert_allclose(create_predictor(model, "booster").predict(X), expected, rtol=0, atol=1e-12)
+    
+    def test_used_feature_indices(self, lgbm_model):
+        """Tester la liste des features lues par les arbres (None sans Booster LightGBM)"""
+        from unittest.mock import MagicMock
+        
+        # Ni DAYS_BIRTH, ni FLAG_OWN_CAR, ni la colonne constante ne sont utilisées par le modèle synthétique
+        np.testing.assert_array_equal(used_feature_indices(lgbm_model), [0, 1, 2])
+        assert used_feature_indices(MagicMock()) is None
+    
+    def test_unused_features_do_not_change_production_predictions(self):
+        """Tester que les features jamais lues par les arbres du modèle du projet n'influencent pas les prédictions"""
+        model = joblib.load(os.path.join(BASE_DIR, 'LGBM_TTS.pkl'))
+        df = pd.read_csv(os.path.join(os.path.dirname(BASE_DIR), 'df_test_reduit.csv'))
+        X = df.drop('SK_ID_CURR', axis=1).to_numpy(dtype=np.float32)
+        unused = np.setdiff1d(np.arange(X.shape[1]), used_feature_indices(model))
+        X_pruned = X.copy()
+        X_pruned[:, unused] = np.nan
+        
+        assert len(unused) > 0
+        for engine in ENGINES:
+            predictor = create_predictor(model, engine)
+            np.testing.assert_array_equal(predictor.predict(X_pruned), predictor.predict(X))
+    
+    def test_unknown_engine(self, lgbm_model):
+        """Tester le refus d'un moteur inconnu"""
+        with pytest.raises(ValueError, match="inconnu"):
+            create_predictor(lgbm_model, "gpu")
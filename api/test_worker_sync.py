@@ -0,0 +1,46 @@
+import pytest
+import sys
+import os
+import multiprocessing
+
+# Ajout du répertoire parent au chemin de recherche Python
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from worker_sync import SharedState
+
+
+def publish_reload(state):
+    state.update(increment=("reload",), version="v2")
+
+
+class TestSharedState:
+    
+    def test_update_and_increment(self):
+        """Tester le remplacement des valeurs, l'incrément des compteurs et le numéro de génération"""
+        state = SharedState({"version": None, "reload": 0, "candidate": None})
+        assert state.read() == (0, {"version": None, "reload": 0, "candidate": None})
+        
+        state.update(version="v1")
+        merged = state.update(increment=("reload",), candidate={"version": "v2", "ab_percent": 10.0})
+        
+        assert merged == {"version": "v1", "reload": 1, "candidate": {"version": "v2", "ab_percent": 10.0}}
+        assert state.read() == (2, merged)
+        assert state.initial == {"version": None, "reload": 0, "candidate": None}
+    
+    @pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="fork indisponible")
+    def test_shared_with_forked_process(self):
+        """Tester qu'une modification faite par un processus issu du fork est vue par les autres"""
+        state = SharedState({"version": None, "reload": 0})
+        process = multiprocessing.get_context("fork").Process(target=publish_reload, args=(state,))
+        process.start()
+        process.join(timeout=10)
+        
+        assert process.exitcode == 0
+        assert state.read() == (1, {"version": "v2", "reload": 1})
+    
+    def test_state_too_large(self):
+        """Tester le refus d'un état plus grand que la mémoire partagée"""
+        state = SharedState({"version": None}, size=64)
+        with pytest.raises(ValueError):
+            state.update(version="v" * 100)
+        assert state.read() == (0, {"version": None})
@@ -0,0 +1,173 @@
+"""
+Moteurs d'inférence du modèle LightGBM.
+Trois moteurs calculent la probabilité de défaut à partir d'une matrice de features contiguë:
+- sklearn: `model.predict_proba` (comportement historique, validations du wrapper scikit-learn);
+- booster: `Booster.predict` directement sur la matrice numpy, sans passer par le wrapper;
+- numpy: les arbres sont exportés au chargement en tableaux plats et évalués de façon vectorisée,
+  tous les arbres avancent d'un niveau à chaque itération (nombre d'itérations = profondeur maximale).
+"""
+
+import numpy as np
+from lightgbm import Booster
+
+ENGINES = ("sklearn", "booster", "numpy")
+
+# Seuil sous lequel LightGBM considère une valeur comme nulle (kZeroThreshold)
+ZERO_THRESHOLD = 1e-35
+
+# Types de valeurs manquantes des nœuds LightGBM
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+
+
+class NumpyTreeEnsemble:
+    """Ensemble d'arbres LightGBM (classification binaire) évalué avec numpy"""
+
+    def __init__(self, roots, split_feature, threshold, missing_type, default_left,
+                 left_child, right_child, leaf_value, sigmoid=1.0):
+        # Les nœuds de tous les arbres sont numérotés globalement; un enfant négatif -(i + 1)
+        # désigne la feuille i. `roots` contient la racine de chaque arbre (négative si l'arbre est une feuille).
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.split_feature = np.asarray(split_feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.missing_type = np.asarray(missing_type, dtype=np.int8)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.left_child = np.asarray(left_child, dtype=np.int64)
+        self.right_child = np.asarray(right_child, dtype=np.int64)
+        self.leaf_value = np.asarray(leaf_value, dtype=np.float64)
+        self.sigmoid = sigmoid
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Exporte les arbres d'un Booster LightGBM (objectif binaire, splits numériques)"""
+        dump = booster.dump_model()
+        objective = dump.get("objective", "")
+        if not objective.startswith("binary") or dump.get("num_class", 1) != 1:
+            raise ValueError(f"Objectif non supporté par le moteur numpy: {objective}")
+        if dump.get("average_output"):
+            raise ValueError("Les modèles à sortie moyennée (random forest) ne sont pas supportés par le moteur numpy.")
+
+        sigmoid = 1.0
+        for option in objective.split()[1:]:
+            if option.startswith("sigmoid:"):
+                sigmoid = float(option.split(":", 1)[1])
+
+        nodes = {name: [] for name in ("split_feature", "threshold", "missing_type", "default_left", "left_child", "right_child")}
+        leaf_value = []
+
+        def visit(node):
+            """Ajoute le sous-arbre `node` et retourne son identifiant global"""
+            if "leaf_value" in node:
+                leaf_value.append(node["leaf_value"])
+                return -len(leaf_value)
+
+            if node["decision_type"] != "<=":
+                raise ValueError(f"Split {node['decision_type']} (catégoriel) non supporté par le moteur numpy.")
+
+            node_id = len(nodes["split_feature"])
+            nodes["split_feature"].append(node["split_feature"])
+            nodes["threshold"].append(node["threshold"])
+            nodes["missing_type"].append(MISSING_TYPES[node["missing_type"]])
+            nodes["default_left"].append(node["default_left"])
+            nodes["left_child"].append(0)
+            nodes["right_child"].append(0)
+            nodes["left_child"][node_id] = visit(node["left_child"])
+            nodes["right_child"][node_id] = visit(node["right_child"])
+            return node_id
+
+        roots = [visit(tree["tree_structure"]) for tree in dump["tree_info"]]
+        return cls(roots, leaf_value=leaf_value, sigmoid=sigmoid, **nodes)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def raw_score(self, X):
+        """Somme des valeurs des feuilles atteintes, par ligne"""
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        n_rows = X.shape[0]
+
+        # Position courante de chaque (ligne, arbre); négative une fois la feuille atteinte
+        current = np.tile(self.roots, (n_rows, 1))
+        rows = np.broadcast_to(np.arange(n_rows)[:, np.newaxis], current.shape)
+
+        active = current >= 0
+        while active.any():
+            nodes = current[active]
+            values = X[rows[active], self.split_feature[nodes]].astype(np.float64)
+            missing_type = self.missing_type[nodes]
+
+            # Même règle que LightGBM: NaN vaut 0 sauf pour les nœuds de type NaN
+            is_nan = np.isnan(values)
+            values = np.where(is_nan & (missing_type != MISSING_NAN), 0.0, values)
+            use_default = ((missing_type == MISSING_ZERO) & (np.abs(values) <= ZERO_THRESHOLD)) | \
+                          ((missing_type == MISSING_NAN) & is_nan)
+
+            go_left = np.where(use_default, self.default_left[nodes], values <= self.threshold[nodes])
+            current[active] = np.where(go_left, self.left_child[nodes], self.right_child[nodes])
+            active = current >= 0
+
+        # Feuille i encodée -(i + 1)
+        return self.leaf_value[-current - 1].sum(axis=1)
+
+    def predict_proba(self, X):
+        """Probabilité de la classe positive (défaut)"""
+        return 1.0 / (1.0 + np.exp(-self.sigmoid * self.raw_score(X)))
+
+
+class SklearnPredictor:
+    """Prédiction via le wrapper scikit-learn du modèle"""
+
+    engine = "sklearn"
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, X):
+        return self.model.predict_proba(X)[:, 1]
+
+
+class BoosterPredictor:
+    """Prédiction via le Booster LightGBM, sans le wrapper scikit-learn"""
+
+    engine = "booster"
+
+    def __init__(self, model):
+        self.booster = model.booster_
+
+    def predict(self, X):
+        return self.booster.predict(X)
+
+
+class NumpyTreePredictor:
+    """Prédiction via les arbres exportés en tableaux numpy"""
+
+    engine = "numpy"
+
+    def __init__(self, model):
+        self.ensemble = NumpyTreeEnsemble.from_booster(model.booster_)
+
+    def predict(self, X):
+        return self.ensemble.predict_proba(X)
+
+
+def used_feature_indices(model):
+    """Positions (ordre du modèle) des features lues par au moins un nœud de décision des arbres,
+    ou None si le modèle n'expose pas de Booster LightGBM"""
+    booster = getattr(model, "booster_", None)
+    if not isinstance(booster, Booster):
+        return None
+    return np.flatnonzero(booster.feature_importance(importance_type="split") > 0)
+
+
+def create_predictor(model, engine="sklearn"):
+    """Moteur d'inférence `engine` pour le modèle; chaque moteur expose `predict(X)` -> P(défaut)"""
+    if engine == "sklearn":
+        return SklearnPredictor(model)
+    if engine == "booster":
+        return BoosterPredictor(model)
+    if engine == "numpy":
+        return NumpyTreePredictor(model)
+    raise ValueError(f"Moteur d'inférence inconnu: {engine} (valeurs possibles: {', '.join(ENGINES)})")
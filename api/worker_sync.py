@@ -0,0 +1,53 @@
+"""
+Propagation des opérations d'administration (/reload, /policy/reload, activation d'une version, modèle
+candidat) à tous les workers gunicorn.
+
+Une requête d'administration n'est reçue que par un seul worker: après l'avoir appliquée, il publie le
+nouvel état dans un segment de mémoire partagée créé par le processus maître avant le fork, donc commun
+à tous les workers. Chaque worker compare périodiquement le numéro de génération de cet état au dernier
+qu'il a appliqué et, s'il a changé, applique les différences (voir `sync_worker` dans main.py). Un worker
+redémarré par gunicorn repart des artefacts du maître et rattrape ainsi toutes les opérations publiées.
+"""
+
+import json
+import multiprocessing
+
+# Taille maximale de l'état sérialisé en JSON
+STATE_SIZE = 4096
+
+
+class SharedState:
+    """État d'administration partagé par les processus issus du même maître, avec un numéro de génération
+    incrémenté à chaque modification. `initial` est l'état des artefacts chargés avant le fork."""
+
+    def __init__(self, initial, size=STATE_SIZE):
+        self.initial = dict(initial)
+        self._generation = multiprocessing.Value('q', 0)
+        self._payload = multiprocessing.Array('c', size)
+        self._write(self.initial)
+
+    def _write(self, state):
+        data = json.dumps(state).encode("utf-8")
+        if len(data) >= len(self._payload):
+            raise ValueError(f"État partagé trop grand: {len(data)} octets (maximum {len(self._payload) - 1})")
+        self._payload.value = data
+
+    @property
+    def generation(self):
+        return self._generation.value
+
+    def read(self):
+        """Numéro de génération et état courant, lus ensemble"""
+        with self._generation.get_lock():
+            return self._generation.value, json.loads(self._payload.value)
+
+    def update(self, increment=(), **changes):
+        """Remplace les valeurs `changes` et incrémente les compteurs `increment`; retourne le nouvel état"""
+        with self._generation.get_lock():
+            state = json.loads(self._payload.value)
+            state.update(changes)
+            for key in increment:
+                state[key] = state.get(key, 0) + 1
+            self._write(state)
+            self._generation.value += 1
+            return state
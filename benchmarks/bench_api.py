@@ -0,0 +1,255 @@
+"""
+Benchmark de latence et de débit de l'API de scoring.
+
+Des tables de clients synthétiques (10k, 100k, 1M lignes par défaut) sont générées au format du
+magasin de features binaire, en rééchantillonnant les clients de df_test_reduit.csv avec un bruit
+multiplicatif. Pour chaque taille, l'API est mesurée:
+- en processus (application FastAPI appelée via httpx.ASGITransport, sans réseau);
+- via un vrai serveur uvicorn (requêtes HTTP sur la boucle locale).
+
+Les résultats (p50/p95/p99, requêtes par seconde, RSS) sont écrits dans un fichier JSON pour
+comparer deux commits sur une même machine.
+
+    python benchmarks/bench_api.py --rows 10000 100000 1000000 --requests 2000 --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+from bench_workers import free_port, memory_kb, process_tree, wait_ready
+from feature_store import COLUMNS_FILE, IDS_FILE, MATRIX_FILE, FeatureStore
+
+# Taille des blocs de génération des tables synthétiques (mémoire bornée)
+CHUNK_ROWS = 100000
+
+# Premier identifiant des clients synthétiques
+FIRST_ID = 100000
+
+
+def build_synthetic_store(n_rows, path, seed=0):
+    """Écrit un magasin binaire de `n_rows` clients synthétiques (réutilisé s'il existe déjà)"""
+    if os.path.exists(os.path.join(path, COLUMNS_FILE)):
+        return path
+
+    import pandas as pd
+
+    source = FeatureStore.from_dataframe(pd.read_csv(os.path.join(ROOT_DIR, 'df_test_reduit.csv')))
+    rng = np.random.default_rng(seed)
+
+    os.makedirs(path, exist_ok=True)
+    matrix = np.lib.format.open_memmap(
+        os.path.join(path, MATRIX_FILE), mode='w+', dtype=np.float32, shape=(n_rows, source.n_features)
+    )
+    for start in range(0, n_rows, CHUNK_ROWS):
+        end = min(start + CHUNK_ROWS, n_rows)
+        block = source.matrix[rng.integers(0, len(source), end - start)]
+        matrix[start:end] = block * rng.normal(1.0, 0.05, block.shape).astype(np.float32)
+    matrix.flush()
+    del matrix
+
+    np.save(os.path.join(path, IDS_FILE), np.arange(FIRST_ID, FIRST_ID + n_rows, dtype=np.int64))
+    with open(os.path.join(path, COLUMNS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(source.feature_names, f)
+    return path
+
+
+def rss_mb(pid=None):
+    with open(f"/proc/{pid or 'self'}/status") as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def summarize(latencies, elapsed, errors):
+    values = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+    }
+
+
+def request_plan(endpoint, n_rows, n_requests, batch_size, seed=1):
+    """Liste (chemin, corps JSON) des requêtes à envoyer, sur des clients tirés au hasard"""
+    rng = random.Random(seed)
+    path, _, query = endpoint.partition('?')
+    url = path + ('?' + query if query else '')
+    if path == '/predict/batch':
+        return [
+            (url, {'SK_ID_CURR': [FIRST_ID + rng.randrange(n_rows) for _ in range(batch_size)]})
+            for _ in range(n_requests)
+        ]
+    return [(url, {'SK_ID_CURR': FIRST_ID + rng.randrange(n_rows)}) for _ in range(n_requests)]
+
+
+async def run_in_process(app, plan, concurrency):
+    """Envoie les requêtes à l'application en processus, `concurrency` à la fois"""
+    import httpx
+
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as client:
+        async def send(url, body):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(url, json=body)
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(url, body) for url, body in plan))
+        elapsed = time.perf_counter() - start
+
+    return summarize(latencies, elapsed, errors)
+
+
+def bench_in_process(store_path, n_rows, endpoints, args):
+    os.environ['FEATURE_STORE_PATH'] = store_path
+    import main
+
+    start = time.perf_counter()
+    main.reload_artifacts(main.app)
+    load_s = time.perf_counter() - start
+
+    results = []
+    for endpoint in endpoints:
+        warmup = request_plan(endpoint, n_rows, min(100, args.requests), args.batch_size, seed=0)
+        asyncio.run(run_in_process(main.app, warmup, args.concurrency))
+        plan = request_plan(endpoint, n_rows, args.requests, args.batch_size)
+        result = asyncio.run(run_in_process(main.app, plan, args.concurrency))
+        result.update(mode='in_process', rows=n_rows, endpoint=endpoint, load_s=load_s, rss_mb=rss_mb())
+        results.append(result)
+    return results
+
+
+def bench_server(store_path, n_rows, endpoints, args):
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, FEATURE_STORE_PATH=store_path)
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'api.main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(url)
+        load_s = time.perf_counter() - start
+
+        results = []
+        for endpoint in endpoints:
+            plan = request_plan(endpoint, n_rows, args.requests, args.batch_size)
+            result = send_plan(url, plan, args.concurrency)
+            rss, _ = memory_kb(process_tree(server.pid))
+            result.update(mode='server', rows=n_rows, endpoint=endpoint, load_s=load_s, rss_mb=rss / 1024)
+            results.append(result)
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def send_plan(url, plan, concurrency):
+    """Envoie les requêtes du plan à un serveur HTTP avec `concurrency` clients simultanés"""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    queue = iter(plan)
+
+    def run():
+        nonlocal errors
+        session = requests.Session()
+        while True:
+            with lock:
+                item = next(queue, None)
+            if item is None:
+                return
+            path, body = item
+            start = time.perf_counter()
+            response = session.post(url + path, json=body)
+            duration = time.perf_counter() - start
+            with lock:
+                latencies.append(duration)
+                errors += response.status_code != 200
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(run)
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latence et débit de l'API sur des tables synthétiques")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--modes', nargs='+', choices=['in_process', 'server'], default=['in_process', 'server'])
+    parser.add_argument('--endpoints', nargs='+', default=['/predict', '/predict?explain=false', '/predict/batch'])
+    parser.add_argument('--requests', type=int, default=2000, help="Requêtes mesurées par endpoint")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=100, help="Identifiants par appel à /predict/batch")
+    parser.add_argument('--data-dir', default=os.path.join(ROOT_DIR, 'benchmarks', 'data'),
+                        help="Répertoire des tables synthétiques (réutilisées d'une exécution à l'autre)")
+    parser.add_argument('--cache', action='store_true', help="Garder le cache des prédictions actif")
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    # Les journaux par requête fausseraient les mesures
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    # Sans cache, chaque requête mesure le calcul complet
+    if not args.cache:
+        os.environ['PREDICTION_CACHE'] = 'none'
+
+    results = []
+    for n_rows in args.rows:
+        store_path = build_synthetic_store(n_rows, os.path.join(args.data_dir, f'synthetic_{n_rows}'))
+        for mode in args.modes:
+            bench = bench_in_process if mode == 'in_process' else bench_server
+            for result in bench(store_path, n_rows, args.endpoints, args):
+                results.append(result)
+                print(
+                    f"{mode:10s} {n_rows:>8d} lignes {result['endpoint']:24s} {result['rps']:8.0f} req/s  "
+                    f"p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  "
+                    f"RSS {result['rss_mb']:6.0f} Mo  {result['errors']} erreurs"
+                )
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'data_dir')},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Résultats écrits dans {args.output}")
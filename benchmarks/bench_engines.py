@@ -0,0 +1,79 @@
+"""
+Benchmark des moteurs d'inférence (sklearn, booster, numpy) sur le modèle LGBM_TTS.pkl.
+
+Mesure la latence d'une prédiction unitaire et d'une prédiction par lot, et vérifie que chaque
+moteur reproduit les probabilités de `predict_proba` (écart maximal absolu).
+
+    python benchmarks/bench_engines.py --batch-size 10000 --repeat 500
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+from tree_engine import ENGINES, create_predictor
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+def timed(fn, repeat):
+    """Durées (secondes) de `repeat` appels à `fn`"""
+    durations = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations[i] = time.perf_counter() - start
+    return durations
+
+
+def summary(durations):
+    values = durations * 1000.0
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'mean_ms': float(values.mean()), 'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latence des moteurs d'inférence LightGBM")
+    parser.add_argument('--model', default=os.path.join(ROOT_DIR, 'api', 'LGBM_TTS.pkl'))
+    parser.add_argument('--data', default=os.path.join(ROOT_DIR, 'df_test_reduit.csv'))
+    parser.add_argument('--batch-size', type=int, default=10000, help="Lignes par prédiction groupée")
+    parser.add_argument('--repeat', type=int, default=500, help="Nombre de prédictions unitaires mesurées")
+    parser.add_argument('--output', help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    X = pd.read_csv(args.data).drop(columns='SK_ID_CURR').to_numpy(dtype=np.float32)
+    # Lot construit en répétant les clients disponibles
+    batch = np.ascontiguousarray(np.resize(X, (args.batch_size, X.shape[1])))
+    reference = model.predict_proba(batch)[:, 1]
+
+    results = {}
+    for engine in ENGINES:
+        start = time.perf_counter()
+        predictor = create_predictor(model, engine)
+        build_s = time.perf_counter() - start
+
+        max_abs_diff = float(np.abs(predictor.predict(batch) - reference).max())
+        single = summary(timed(lambda: predictor.predict(X[:1]), args.repeat))
+        batched = summary(timed(lambda: predictor.predict(batch), max(3, args.repeat // 100)))
+        batched['rows_per_s'] = args.batch_size / (batched['mean_ms'] / 1000.0)
+
+        results[engine] = {'build_s': build_s, 'max_abs_diff': max_abs_diff, 'single': single, 'batch': batched}
+        print(
+            f"{engine:8s} unitaire p50 {single['p50_ms']:.3f} ms | lot de {args.batch_size}: "
+            f"{batched['mean_ms']:.1f} ms ({batched['rows_per_s']:.0f} lignes/s) | écart max {max_abs_diff:.2e}"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'batch_size': args.batch_size, 'results': results}, f, indent=2)
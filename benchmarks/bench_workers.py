@@ -0,0 +1,165 @@
+"""
+Benchmark du mode multi-processus: débit de /predict en fonction du nombre de workers gunicorn.
+
+Pour chaque nombre de workers, le script démarre `gunicorn api.main:app` (gunicorn.conf.py),
+envoie des requêtes /predict concurrentes pendant une durée fixe puis mesure le débit,
+la latence et la mémoire totale des processus (RSS, et PSS qui compte une seule fois les pages partagées).
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --duration 15 --concurrency 32
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def client_ids():
+    """Identifiants des clients servis par l'API (magasin binaire si configuré, sinon le CSV)"""
+    store_path = os.environ.get("FEATURE_STORE_PATH")
+    if store_path:
+        return np.load(os.path.join(store_path, 'ids.npy')).tolist()
+    return pd.read_csv(os.path.join(ROOT_DIR, 'df_test_reduit.csv'), usecols=['SK_ID_CURR'])['SK_ID_CURR'].tolist()
+
+
+def process_tree(pid):
+    """pid du processus et de tous ses descendants"""
+    pids = [pid]
+    for task in os.listdir(f'/proc/{pid}/task'):
+        try:
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                for child in f.read().split():
+                    pids.extend(process_tree(int(child)))
+        except FileNotFoundError:
+            pass
+    return pids
+
+
+def memory_kb(pids):
+    """RSS et PSS cumulés (en Ko) d'un ensemble de processus"""
+    rss = pss = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Rss:'):
+                        rss += int(line.split()[1])
+                    elif line.startswith('Pss:'):
+                        pss += int(line.split()[1])
+        except FileNotFoundError:
+            pass
+    return rss, pss
+
+
+def wait_ready(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url + '/stats', timeout=1).json().get('artifacts_loaded'):
+                return
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Le serveur {url} n'a pas démarré à temps")
+
+
+def load_test(url, ids, duration, concurrency):
+    """Envoie des requêtes /predict concurrentes pendant `duration` secondes"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def run():
+        nonlocal errors
+        session = requests.Session()
+        local_latencies, local_errors = [], 0
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = session.post(url + '/predict', json={'SK_ID_CURR': rng.choice(ids)})
+            local_latencies.append(time.perf_counter() - start)
+            local_errors += response.status_code != 200
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(run)
+    elapsed = time.perf_counter() - start
+
+    values = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+    }
+
+
+def bench(n_workers, ids, duration, concurrency):
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(n_workers))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'api.main:app', '-c', 'gunicorn.conf.py', '--log-level', 'warning'],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(url)
+        # Préchauffage: toutes les connexions et tous les workers sont actifs
+        load_test(url, ids, min(2.0, duration), concurrency)
+        result = load_test(url, ids, duration, concurrency)
+        rss, pss = memory_kb(process_tree(server.pid))
+        result.update(workers=n_workers, rss_mb=rss / 1024, pss_mb=pss / 1024)
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Débit de /predict selon le nombre de workers gunicorn")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=10.0, help="Durée de chaque mesure (secondes)")
+    parser.add_argument('--concurrency', type=int, default=32, help="Nombre de clients simultanés")
+    parser.add_argument('--output', help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    ids = client_ids()
+    results = []
+    for n_workers in args.workers:
+        result = bench(n_workers, ids, args.duration, args.concurrency)
+        results.append(result)
+        print(
+            f"{n_workers} worker(s): {result['rps']:.0f} req/s, p50 {result['p50_ms']:.1f} ms, "
+            f"p99 {result['p99_ms']:.1f} ms, RSS {result['rss_mb']:.0f} Mo, PSS {result['pss_mb']:.0f} Mo, "
+            f"{result['errors']} erreurs"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cpu_count': os.cpu_count(), 'results': results}, f, indent=2)
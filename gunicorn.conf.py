@@ -0,0 +1,32 @@
+"""
+Configuration gunicorn du mode multi-processus de l'API:
+
+    gunicorn api.main:app
+
+Les artefacts (données et modèle) sont chargés une seule fois dans le processus maître avant le fork:
+les workers les partagent en copie sur écriture au lieu d'en charger chacun une copie.
+Avec FEATURE_STORE_PATH, la matrice des features est en plus projetée en mémoire (pages partagées).
+Les opérations d'administration reçues par un worker sont propagées aux autres par un état en mémoire
+partagée créé dans le maître à l'import de l'application (voir api/worker_sync.py).
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+
+
+def when_ready(server):
+    # Appelé dans le maître après l'import de l'application et avant la création des workers
+    from api.main import app, preload_artifacts
+
+    preload_artifacts(app)
+
+    # Les objets chargés ne seront plus modifiés: on les sort du ramasse-miettes pour limiter
+    # les copies de pages provoquées par ses parcours dans les workers
+    gc.freeze()